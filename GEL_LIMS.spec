@@ -1,7 +1,13 @@
 # -*- mode: python ; coding: utf-8 -*-
+import sys
+sys.path.insert(0, SPECPATH)
+from static_assets import precompress_dir
+
+# Ship dist/ with .br/.gz next to the text assets (served by PrecompressedStaticFiles)
+precompress_dir('dist')
 from PyInstaller.utils.hooks import collect_all
 
-datas = [('dist', 'dist')]
+datas = [('dist', 'dist'), ('migrations', 'migrations')]
 binaries = []
 hiddenimports = ['asyncio', 'uvicorn', 'psycopg2', 'psycopg2._psycopg']
 tmp_ret = collect_all('uvicorn')
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Form
 from db import get_connection
+import ref_cache
 
 router = APIRouter(tags=["1. Auth"])
 
@@ -7,17 +8,18 @@ router = APIRouter(tags=["1. Auth"])
 def login(username: str = Form(...), password: str = Form(...)):
     conn = get_connection()
     cur = conn.cursor()
-    
-    # FIXED: Get user_role instead of role_id
-    cur.execute("""
-        SELECT user_id, username, password_hash, user_role, full_name
-        FROM users 
-        WHERE username = %s AND is_active = true
-    """, (username,))
-    
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    try:
+        # FIXED: Get user_role instead of role_id
+        cur.execute("""
+            SELECT user_id, username, password_hash, user_role, full_name
+            FROM users 
+            WHERE username = %s AND is_active = true
+        """, (username,))
+
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
 
     if not row or row[2] != password:
         raise HTTPException(status_code=401, detail="Invalid username or password")
@@ -33,18 +35,25 @@ def login(username: str = Form(...), password: str = Form(...)):
 
 @router.get("/users/all")
 def get_all_users():
-    conn = get_connection()
-    cur = conn.cursor()
+    # Active users change rarely; served from ref_cache (no user writes go through this API)
+    def load():
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT user_id, username, full_name, user_role
+                FROM users 
+                WHERE is_active = true
+                ORDER BY username
+            """)
+            return tuple(cur.fetchall())
+        finally:
+            cur.close()
+            conn.close()
+
     try:
-        cur.execute("""
-            SELECT user_id, username, full_name, user_role
-            FROM users 
-            WHERE is_active = true
-            ORDER BY username
-        """)
-        
         users = []
-        for row in cur.fetchall():
+        for row in ref_cache.users.get_or_load("active", load):
             users.append({
                 "user_id": row[0],
                 "username": row[1],
@@ -55,7 +64,4 @@ def get_all_users():
         return users
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
\ No newline at end of file
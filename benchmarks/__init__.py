@@ -0,0 +1,13 @@
+# benchmarks/__init__.py
+"""
+Benchmark harnesses for GEL LIMS.
+
+Run every module from the repository root so the routers and db.py resolve
+exactly like they do for main.py, e.g.:
+
+    python -m benchmarks.synthetic --samples 100000 --schema
+    python -m benchmarks.workflow --iterations 50 --concurrency 4
+
+All harnesses talk to the database named by DATABASE_URL in .env, so point it
+at a disposable local Postgres before running anything here.
+"""
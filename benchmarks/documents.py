@@ -0,0 +1,453 @@
+# benchmarks/documents.py
+"""
+Document-generation micro-benchmarks.
+
+Times the generators behind the download endpoints and reports wall time,
+peak traced allocations and output size for each case:
+
+    quotation      QuotationTemplateProcessor.process_quotation, GEO (categorised) vs flat, 10-500 items
+    test_request   TestRequestExcelGenerator.generate_excel
+    report         populate_report_template_from_url
+    worksheet      populate_worksheet_template, 1-200 samples across the columns      (database)
+    invoice        render_invoice_excel, 5-1000 grouped rows (row insertion)          (database)
+    delivery_note  generate_delivery_note_excel_template                               (database)
+
+Templates come from the local templates/ folder. Code paths that download from
+storage are pointed at an embedded benchmarks.storage_server seeded with the same
+files, so no network is involved. Database cases insert their own fixture rows
+(dated 2000-01-01, so live COUNT-based numbering is untouched) and delete them
+afterwards; they are skipped when DATABASE_URL is unreachable. Usage:
+
+    python -m benchmarks.documents
+    python -m benchmarks.documents --cases quotation,invoice --repeats 10
+    python -m benchmarks.documents --save-baseline
+    python -m benchmarks.documents --compare          # exit 1 on regression
+"""
+import argparse
+import contextlib
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stats import compare_to_baseline, load_baseline, percentile, save_baseline  # noqa: E402
+from benchmarks.storage_server import REPO_ROOT, seed_templates, start_storage_server  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "documents.json")
+TEMPLATES_DIR = os.path.join(REPO_ROOT, "templates")
+
+QUOTATION_SIZES = (10, 50, 100, 250, 500)
+TEST_REQUEST_SIZES = (5, 20)            # the template has 20 item rows
+WORKSHEET_SIZES = (1, 10, 50, 200)
+INVOICE_SIZES = (5, 50, 200, 1000)      # the template has 17 item rows, the rest are inserted
+DELIVERY_NOTE_SIZES = (5, 23)           # the template has 23 report rows
+
+FIXTURE_DAY = datetime(2000, 1, 1, 9, 0)
+
+# One description per bucket of the GEO categoriser in template_processor.py
+GEO_DESCRIPTIONS = [
+    "Geotechnical investigation mobilisation",
+    "Rotary drilling of borehole",
+    "Undisturbed sample collection",
+    "Standard penetration test (in-situ)",
+    "Laboratory moisture content analysis",
+    "Engineering report preparation",
+]
+TEST_NAMES = [
+    "Rebound Hammer Test", "Standard Penetration Test", "Compressive Strength of Cubes",
+    "Sieve Analysis", "Atterberg Limits", "Moisture Content", "Proctor Compaction", "CBR Test",
+]
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def run_case(name, make_output, repeats, results):
+    """
+    Time `make_output` `repeats` times, then once more under tracemalloc.
+
+    `make_output` returns the size of what it produced in bytes. Timing runs are
+    kept separate from the traced run because tracemalloc slows allocation-heavy
+    code down several times.
+    """
+    timings = []
+    size = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeats):
+            gc.collect()
+            start = time.perf_counter()
+            size = make_output()
+            timings.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        make_output()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    results[name] = {
+        "count": repeats,
+        "errors": 0,
+        "error_rate": 0.0,
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_kib": round(current / 1024, 1),
+        "output_bytes": size,
+    }
+    row = results[name]
+    print(f"{name[:44]:<44} {repeats:>5} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+          f"{row['peak_kib']:>10.1f} {row['output_bytes'] / 1024:>10.1f}")
+
+
+def _file_size_and_remove(path):
+    size = os.path.getsize(path)
+    os.remove(path)
+    return size
+
+
+# ----------------------------
+# Template-only cases
+# ----------------------------
+def bench_quotation(repeats, results):
+    from template_processor import QuotationTemplateProcessor
+
+    client = {"name": "BENCH Client", "contact_person": "Bench", "address": "Dubai",
+              "phone": "+97140000000", "email": "bench@example.test"}
+    for division, template in (("GEO", "GEO.docx"), ("MAT", "QT.docx")):
+        template_bytes = _read(os.path.join(TEMPLATES_DIR, template))
+        quotation = {"quotation_no": f"Q{division[0]}-001-00", "division": division, "created_at": FIXTURE_DAY,
+                     "enquiry_date": FIXTURE_DAY, "project_name": "BENCH Project", "location": "Dubai",
+                     "validity_days": 30}
+        for size in QUOTATION_SIZES:
+            items = [{
+                "description": f"{GEO_DESCRIPTIONS[i % len(GEO_DESCRIPTIONS)]} {i}" if division == "GEO"
+                else f"{TEST_NAMES[i % len(TEST_NAMES)]} {i}",
+                "test_standard": "BS EN 12504-2", "unit": "No.", "unit_rate": 150 + i % 7 * 25,
+                "quantity": 1 + i % 4,
+            } for i in range(size)]
+
+            def render():
+                output = QuotationTemplateProcessor(BytesIO(template_bytes)).process_quotation(quotation, client, items)
+                return len(output.getbuffer())
+
+            run_case(f"quotation {division} {size} items", render, repeats, results)
+
+
+def bench_test_request(repeats, results):
+    from tests import TestRequestExcelGenerator
+
+    template_bytes = _read(os.path.join(TEMPLATES_DIR, "test-requests", "ST_Test_Request.xlsx"))
+    request = {"request_no": "GQ-010100-01", "project_name": "BENCH Project", "created_at": "01-01-2000",
+               "project_no": "LP/16732/00/DXB"}
+    project = {"lpo_no": "LPO-1", "location": "Dubai"}
+    client = {"name": "BENCH Client", "address": "Dubai"}
+    for size in TEST_REQUEST_SIZES:
+        items = [{"description": TEST_NAMES[i % len(TEST_NAMES)], "test_standard": "ASTM D2216", "quantity": 1 + i % 3}
+                 for i in range(size)]
+
+        def render():
+            path = TestRequestExcelGenerator(BytesIO(template_bytes)).generate_excel(request, project, client, items)
+            return _file_size_and_remove(path)
+
+        run_case(f"test_request {size} items", render, repeats, results)
+
+
+def bench_report(repeats, results, storage_url):
+    from reports import populate_report_template_from_url
+
+    for code in ("RH", "SPT"):
+        url = f"{storage_url}/storage/v1/object/public/templates/reports/{code}_Report.xlsx"
+        report_data = {"report_no": "GR - 010100 - 001", "report_date": "01-01-2000", "request_no": "GQ-010100-01",
+                       "sample_nos": [f"GS-010100-01-{i}" for i in range(1, 9)], "lp_number": "LP/16732/00/DXB",
+                       "date_of_test": "01-01-2000", "tested_by": "bench", "location": "Dubai",
+                       "client_name": "BENCH Client", "test_standard": "BS EN 12504-2"}
+
+        def render():
+            return _file_size_and_remove(populate_report_template_from_url(url, report_data))
+
+        run_case(f"report {code}", render, repeats, results)
+
+
+# ----------------------------
+# Database fixtures
+# ----------------------------
+class DocumentFixtures:
+    """Creates the rows the database-backed generators read, and removes them again."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.client_ids = []
+        self.project_ids = []
+        self.report_nos = []
+
+    def _one(self, cur, sql, params):
+        cur.execute(sql, params)
+        return cur.fetchone()[0]
+
+    def _project(self, cur, tag, test_names):
+        """Client -> enquiry -> quotation (+ one item per test) -> project -> test request."""
+        client_id = self._one(cur, """
+            INSERT INTO clients (name, contact_person, email, phone, address, created_at)
+            VALUES (%s, 'Bench', 'bench@example.test', '+97140000000', 'Dubai', %s) RETURNING client_id
+        """, (f"BENCH DOC {tag}", FIXTURE_DAY))
+        self.client_ids.append(client_id)
+        enquiry_id = self._one(cur, """
+            INSERT INTO enquiries (client_id, enquiry_ref, enquiry_date, project_name, location, status, created_at)
+            VALUES (%s, %s, %s, %s, 'Dubai', 'QUOTED', %s) RETURNING enquiry_id
+        """, (client_id, f"ENQ-2000-{tag}", FIXTURE_DAY.date(), f"BENCH DOC {tag}", FIXTURE_DAY))
+        quotation_id = self._one(cur, """
+            INSERT INTO quotations (quotation_no, enquiry_id, division, status, created_at)
+            VALUES (%s, %s, 'MAT', 'APPROVED', %s) RETURNING quotation_id
+        """, (f"QL-BENCH-{tag}", enquiry_id, FIXTURE_DAY))
+        item_ids = []
+        for code, name in test_names:
+            item_ids.append(self._one(cur, """
+                INSERT INTO quotation_items (quotation_id, item_code, description, test_standard, unit_rate, quantity, unit)
+                VALUES (%s, %s, %s, 'BS EN 12504-2', 150, 1, 'No.') RETURNING item_id
+            """, (quotation_id, code, name)))
+        project_id = self._one(cur, """
+            INSERT INTO projects (project_no, quotation_id, client_id, project_name, location, lpo_no, lpo_date,
+                                  division, status, created_at)
+            VALUES (%s, %s, %s, %s, 'Dubai', 'LPO-BENCH', %s, 'MAT', 'ACTIVE', %s) RETURNING project_id
+        """, (f"LP/BENCH-{tag}/00/DXB", quotation_id, client_id, f"BENCH DOC {tag}", FIXTURE_DAY.date(), FIXTURE_DAY))
+        self.project_ids.append(project_id)
+        request_id = self._one(cur, """
+            INSERT INTO test_requests (project_id, request_no, requested_by, status, created_at)
+            VALUES (%s, %s, 'bench', 'IN_PROGRESS', %s) RETURNING test_request_id
+        """, (project_id, f"GQ-BENCH-{tag}", FIXTURE_DAY))
+        return project_id, request_id, item_ids
+
+    def _samples(self, cur, tag, request_id, item_ids, count):
+        sample_ids = []
+        for i in range(count):
+            item_id = item_ids[i % len(item_ids)]
+            sample_ids.append(self._one(cur, """
+                INSERT INTO samples (sample_no, request_id, collected_by, received_date, status,
+                                     assigned_quotation_item_id, created_at)
+                VALUES (%s, %s, 'bench', %s, 'RECEIVED', %s, %s) RETURNING sample_id
+            """, (f"GS-BENCH-{tag}-{i + 1}", request_id, FIXTURE_DAY, item_id, FIXTURE_DAY)))
+        return sample_ids
+
+    def _reports(self, cur, tag, sample_ids, count):
+        report_ids = []
+        for i in range(count):
+            report_no = f"GR - BENCH{tag} - {i + 1:04d}"
+            self.report_nos.append(report_no)
+            report_ids.append(self._one(cur, """
+                INSERT INTO reports (report_no, sample_id, status, covers_test_type, covers_samples, created_at)
+                VALUES (%s, %s, 'APPROVED', %s, %s, %s) RETURNING report_id
+            """, (report_no, sample_ids[i % len(sample_ids)], TEST_NAMES[i % len(TEST_NAMES)],
+                  [f"GS-BENCH-{tag}-{i % len(sample_ids) + 1}"], FIXTURE_DAY)))
+        return report_ids
+
+    def worksheet(self, samples):
+        """A worksheet whose test is shared by `samples` samples of one request."""
+        with self.conn.cursor() as cur:
+            tag = f"W{samples}"
+            _, request_id, item_ids = self._project(cur, tag, [("RH", TEST_NAMES[0])])
+            sample_ids = self._samples(cur, tag, request_id, item_ids, samples)
+            worksheet_id = self._one(cur, """
+                INSERT INTO worksheets (worksheet_no, sample_id, quotation_item_id, test_name, technician, status, created_at)
+                VALUES (%s, %s, %s, %s, 'bench', 'GENERATED', %s) RETURNING worksheet_id
+            """, (f"WKS-BENCH-{tag}", sample_ids[0], item_ids[0], TEST_NAMES[0], FIXTURE_DAY))
+        self.conn.commit()
+        return worksheet_id
+
+    def invoice(self, items):
+        """A CASH invoice with `items` lines, each matched to its own approved report."""
+        with self.conn.cursor() as cur:
+            tag = f"I{items}"
+            codes = [(f"T{i}", name) for i, name in enumerate(TEST_NAMES)]
+            project_id, request_id, item_ids = self._project(cur, tag, codes)
+            sample_ids = self._samples(cur, tag, request_id, item_ids, min(items, 100))
+            self._reports(cur, tag, sample_ids, items)
+            # subtotal/vat/total are filled in from the items by the 0005 triggers
+            invoice_id = self._one(cur, """
+                INSERT INTO invoices (invoice_no, project_id, invoice_type, payment_method, invoice_date, lpo_reference,
+                                      amount_in_words, created_at)
+                VALUES (%s, %s, 'CASH', 'CASH', %s, 'LPO-BENCH', 'Bench', %s) RETURNING invoice_id
+            """, (_invoice_no(items), project_id, FIXTURE_DAY.date(), FIXTURE_DAY))
+            for i in range(items):
+                cur.execute("""
+                    INSERT INTO invoice_items (invoice_id, description, test_standard, unit_rate, quantity, amount,
+                                               sample_id, test_request_id)
+                    VALUES (%s, %s, 'BS EN 12504-2', 150, 1, 150, %s, %s)
+                """, (invoice_id, TEST_NAMES[i % len(TEST_NAMES)], sample_ids[i % len(sample_ids)], request_id))
+        self.conn.commit()
+        return invoice_id
+
+    def delivery_note(self, reports):
+        """A project with `reports` approved reports; returns (project_id, report_ids)."""
+        with self.conn.cursor() as cur:
+            tag = f"D{reports}"
+            project_id, request_id, item_ids = self._project(cur, tag, [("RH", TEST_NAMES[0])])
+            sample_ids = self._samples(cur, tag, request_id, item_ids, reports)
+            report_ids = self._reports(cur, tag, sample_ids, reports)
+        self.conn.commit()
+        return project_id, report_ids
+
+    def cleanup(self):
+        self.conn.rollback()
+        with self.conn.cursor() as cur:
+            projects, clients = self.project_ids, self.client_ids
+            cur.execute("DELETE FROM delivery_note_reports WHERE report_no = ANY(%s)", (self.report_nos,))
+            cur.execute("DELETE FROM delivery_notes WHERE project_id = ANY(%s)", (projects,))
+            cur.execute("DELETE FROM invoices WHERE project_id = ANY(%s)", (projects,))
+            cur.execute("""
+                DELETE FROM reports WHERE sample_id IN (
+                    SELECT s.sample_id FROM samples s JOIN test_requests tr ON s.request_id = tr.test_request_id
+                    WHERE tr.project_id = ANY(%s))
+            """, (projects,))
+            cur.execute("""
+                DELETE FROM worksheets WHERE sample_id IN (
+                    SELECT s.sample_id FROM samples s JOIN test_requests tr ON s.request_id = tr.test_request_id
+                    WHERE tr.project_id = ANY(%s))
+            """, (projects,))
+            cur.execute("""
+                DELETE FROM samples WHERE request_id IN (SELECT test_request_id FROM test_requests WHERE project_id = ANY(%s))
+            """, (projects,))
+            cur.execute("DELETE FROM test_requests WHERE project_id = ANY(%s)", (projects,))
+            cur.execute("SELECT quotation_id FROM projects WHERE project_id = ANY(%s)", (projects,))
+            quotation_ids = [row[0] for row in cur.fetchall()]
+            cur.execute("DELETE FROM projects WHERE project_id = ANY(%s)", (projects,))
+            cur.execute("DELETE FROM quotations WHERE quotation_id = ANY(%s)", (quotation_ids,))
+            cur.execute("DELETE FROM enquiries WHERE client_id = ANY(%s)", (clients,))
+            cur.execute("DELETE FROM clients WHERE client_id = ANY(%s)", (clients,))
+        self.conn.commit()
+
+
+# ----------------------------
+# Database cases
+# ----------------------------
+def bench_worksheet(repeats, results, fixtures):
+    from samples_workflow import populate_worksheet_template
+
+    template_path = os.path.join(TEMPLATES_DIR, "worksheets", "RH.xlsx")
+    output_dir = tempfile.mkdtemp(prefix="bench_worksheets_")
+    for size in WORKSHEET_SIZES:
+        worksheet_id = fixtures.worksheet(size)
+        output_path = os.path.join(output_dir, f"worksheet_{size}.xlsx")
+
+        def render():
+            populate_worksheet_template(template_path, worksheet_id, output_path)
+            return _file_size_and_remove(output_path)
+
+        run_case(f"worksheet {size} samples", render, repeats, results)
+    os.rmdir(output_dir)
+
+
+def _invoice_no(items):
+    return f"BENCHI{items}/00"
+
+
+def bench_invoice(repeats, results, fixtures):
+    from invoices import render_invoice_excel
+
+    for size in INVOICE_SIZES:
+        invoice_id = fixtures.invoice(size)
+
+        def render():
+            content, _ = render_invoice_excel(invoice_id)
+            return len(content)
+
+        run_case(f"invoice {size} grouped rows", render, repeats, results)
+        # The render also keeps its copy in generated_invoices/, like the download does
+        _file_size_and_remove(os.path.join("generated_invoices", _invoice_no(size).replace("/", "-") + ".xlsx"))
+
+
+def bench_delivery_note(repeats, results, fixtures):
+    from invoices import DeliveryNoteRequest, generate_delivery_note_excel_template
+
+    for size in DELIVERY_NOTE_SIZES:
+        project_id, report_ids = fixtures.delivery_note(size)
+        payload = DeliveryNoteRequest(project_id=project_id, selected_report_ids=report_ids, include_all_reports=False)
+
+        def render():
+            return _file_size_and_remove(generate_delivery_note_excel_template(payload).path)
+
+        run_case(f"delivery_note {size} reports", render, repeats, results)
+
+
+TEMPLATE_CASES = ("quotation", "test_request", "report")
+DATABASE_CASES = ("worksheet", "invoice", "delivery_note")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GEL LIMS document-generation micro-benchmarks")
+    parser.add_argument("--cases", default=",".join(TEMPLATE_CASES + DATABASE_CASES),
+                        help="comma-separated subset of: " + ", ".join(TEMPLATE_CASES + DATABASE_CASES))
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with --baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50 growth as a fraction")
+    options = parser.parse_args(argv)
+    cases = [c.strip() for c in options.cases.split(",") if c.strip()]
+
+    # Storage stand-in must be configured before the routers import storage.py
+    storage_root = tempfile.mkdtemp(prefix="bench_storage_")
+    seed_templates(storage_root)
+    server = start_storage_server(storage_root, port=0)
+    os.environ["SUPABASE_URL"] = server.base_url
+
+    results = {}
+    print(f"{'case':<44} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>10} {'out KiB':>10}")
+    print("-" * 92)
+    if "quotation" in cases:
+        bench_quotation(options.repeats, results)
+    if "test_request" in cases:
+        bench_test_request(options.repeats, results)
+    if "report" in cases:
+        bench_report(options.repeats, results, server.base_url)
+
+    db_cases = [c for c in cases if c in DATABASE_CASES]
+    if db_cases:
+        from db import get_connection
+        try:
+            conn = get_connection()
+        except Exception as e:
+            print(f"Skipping {', '.join(db_cases)}: database unavailable ({e})")
+            conn = None
+        if conn is not None:
+            fixtures = DocumentFixtures(conn)
+            try:
+                if "worksheet" in cases:
+                    bench_worksheet(options.repeats, results, fixtures)
+                if "invoice" in cases:
+                    bench_invoice(options.repeats, results, fixtures)
+                if "delivery_note" in cases:
+                    bench_delivery_note(options.repeats, results, fixtures)
+            finally:
+                fixtures.cleanup()
+                conn.close()
+    server.shutdown()
+    shutil.rmtree(storage_root, ignore_errors=True)
+
+    meta = {"repeats": options.repeats, "cases": cases, "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    if options.save_baseline:
+        save_baseline(options.baseline, results, meta)
+    if options.compare:
+        regressions = compare_to_baseline(results, load_baseline(options.baseline), options.tolerance, metric="p50_ms")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond tolerance")
+            sys.exit(1)
+        print("\nNo regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# benchmarks/numbering.py
+"""
+Numbering contention benchmark and correctness harness.
+
+Fires concurrent creations at each document-number series, calling the real
+generator inside a transaction followed by a minimal insert, the same shape as
+the create endpoints:
+
+    quotation      quotations._generate_quotation_no   (LOCK TABLE + MAX)
+    request        tests.generate_request_no           (COUNT of today's requests)
+    report         reports.generate_report_no          (COUNT + suffix/timestamp fallback)
+    invoice        invoices.generate_invoice_no CASH   (last invoice_no + 1)
+    proforma       invoices.generate_invoice_no PROFORMA
+    delivery_note  invoices.generate_delivery_note_number (last delivery_note_no + 1)
+
+For every series it reports allocation throughput, allocation/transaction
+latency and lock wait (sessions waiting on a heavyweight lock, sampled from
+pg_stat_activity), then checks the committed numbers:
+
+    duplicates   the same number committed twice, or an insert rejected by a UNIQUE constraint
+    gaps         missing sequence values beyond the transactions that failed after allocating
+    irregular    numbers outside the series format (e.g. suffixed report numbers)
+
+Exits 1 if any series has duplicates, unexplained gaps or irregular numbers.
+Run it against a local benchmark database only: rows are created with today's
+date (the generators count today's rows) and are deleted again afterwards.
+
+    python -m benchmarks.numbering --count 300 --concurrency 32
+    python -m benchmarks.numbering --series report,delivery_note --think-ms 20
+"""
+import argparse
+import contextlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stats import LatencyRecorder, print_summary  # noqa: E402
+from db import get_connection  # noqa: E402
+
+TAG = "bench-numbering"
+
+
+# ----------------------------
+# Series definitions
+# ----------------------------
+class Series:
+    """One number series: how to allocate, how to persist, how to read the sequence back."""
+
+    def __init__(self, name, allocate, insert, pattern):
+        self.name = name
+        self.allocate = allocate   # (cur) -> number
+        self.insert = insert       # (cur, number, fixture) -> None
+        self.pattern = re.compile(pattern)
+
+    def sequence(self, number):
+        """Sequence value of a well-formed number, or None if it is irregular."""
+        match = self.pattern.match(number or "")
+        return int(match.group(1)) if match else None
+
+
+def build_series():
+    from invoices import generate_delivery_note_number, generate_invoice_no
+    from quotations import _generate_quotation_no
+    from reports import generate_report_no
+    from tests import generate_request_no
+
+    def insert_quotation(cur, number, fx):
+        cur.execute("""
+            INSERT INTO quotations (quotation_no, enquiry_id, division, status)
+            VALUES (%s, %s, 'MAT', 'DRAFT')
+        """, (number, fx["enquiry_id"]))
+
+    def insert_request(cur, number, fx):
+        cur.execute("""
+            INSERT INTO test_requests (project_id, request_no, requested_by, status)
+            VALUES (%s, %s, %s, 'PENDING_SAMPLES')
+        """, (fx["project_id"], number, TAG))
+
+    def insert_report(cur, number, fx):
+        cur.execute("""
+            INSERT INTO reports (report_no, sample_id, status, notes)
+            VALUES (%s, %s, 'DRAFT', %s)
+        """, (number, fx["sample_id"], TAG))
+
+    def insert_invoice(invoice_type):
+        def insert(cur, number, fx):
+            cur.execute("""
+                INSERT INTO invoices (invoice_no, project_id, invoice_type, payment_method, invoice_date, remarks)
+                VALUES (%s, %s, %s, 'CASH', CURRENT_DATE, %s)
+            """, (number, fx["project_id"], invoice_type, TAG))
+        return insert
+
+    def insert_delivery_note(cur, number, fx):
+        cur.execute("""
+            INSERT INTO delivery_notes (delivery_note_no, project_id, total_reports)
+            VALUES (%s, %s, 0)
+        """, (number, fx["project_id"]))
+
+    return {
+        "quotation": Series("quotation", lambda cur: _generate_quotation_no(cur, "MAT", None),
+                            insert_quotation, r"^QL-(\d{3,})-\d{2}$"),
+        "request": Series("request", generate_request_no, insert_request, r"^GQ-\d{6}-0(\d+)$"),
+        "report": Series("report", generate_report_no, insert_report, r"^GR - \d{6} - (\d{3,})$"),
+        "invoice": Series("invoice", lambda cur: generate_invoice_no(cur, "CASH"),
+                          insert_invoice("CASH"), r"^(\d+)/\d{2}$"),
+        "proforma": Series("proforma", lambda cur: generate_invoice_no(cur, "PROFORMA"),
+                           insert_invoice("PROFORMA"), r"^(\d{3})/\d{2}$"),
+        "delivery_note": Series("delivery_note", generate_delivery_note_number,
+                                insert_delivery_note, r"^(\d+)/\d{2}$"),
+    }
+
+
+# ----------------------------
+# Fixtures
+# ----------------------------
+def create_fixture(conn):
+    """Parent rows the series hang off. Dated 2000 so they do not count as today's rows."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO clients (name, created_at) VALUES (%s, '2000-01-01') RETURNING client_id
+        """, (TAG,))
+        client_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO enquiries (client_id, enquiry_ref, project_name, created_at)
+            VALUES (%s, %s, %s, '2000-01-01') RETURNING enquiry_id
+        """, (client_id, TAG, TAG))
+        enquiry_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO quotations (quotation_no, enquiry_id, division, status, created_at)
+            VALUES (%s, %s, 'MAT', 'APPROVED', '2000-01-01') RETURNING quotation_id
+        """, (TAG, enquiry_id))
+        quotation_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO projects (project_no, quotation_id, client_id, project_name, created_at)
+            VALUES (%s, %s, %s, %s, '2000-01-01') RETURNING project_id
+        """, (TAG, quotation_id, client_id, TAG))
+        project_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO test_requests (project_id, request_no, requested_by, created_at)
+            VALUES (%s, %s, %s, '2000-01-01') RETURNING test_request_id
+        """, (project_id, TAG, TAG))
+        request_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO samples (sample_no, request_id, created_at)
+            VALUES (%s, %s, '2000-01-01') RETURNING sample_id
+        """, (TAG, request_id))
+        sample_id = cur.fetchone()[0]
+    conn.commit()
+    return {"client_id": client_id, "enquiry_id": enquiry_id, "quotation_id": quotation_id,
+            "project_id": project_id, "request_id": request_id, "sample_id": sample_id}
+
+
+def drop_fixture(conn, fx):
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM delivery_notes WHERE project_id = %s", (fx["project_id"],))
+        cur.execute("DELETE FROM invoices WHERE project_id = %s", (fx["project_id"],))
+        cur.execute("DELETE FROM reports WHERE sample_id = %s", (fx["sample_id"],))
+        cur.execute("DELETE FROM samples WHERE sample_id = %s", (fx["sample_id"],))
+        cur.execute("DELETE FROM test_requests WHERE project_id = %s", (fx["project_id"],))
+        cur.execute("DELETE FROM projects WHERE project_id = %s", (fx["project_id"],))
+        cur.execute("DELETE FROM quotations WHERE enquiry_id = %s", (fx["enquiry_id"],))
+        cur.execute("DELETE FROM enquiries WHERE enquiry_id = %s", (fx["enquiry_id"],))
+        cur.execute("DELETE FROM clients WHERE client_id = %s", (fx["client_id"],))
+    conn.commit()
+
+
+# ----------------------------
+# Lock wait sampling
+# ----------------------------
+class LockWaitMonitor:
+    """Samples how many sessions of this database are waiting on a lock."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lock-wait-monitor", daemon=True)
+
+    def _run(self):
+        conn = get_connection()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._stop.is_set():
+                    cur.execute("""
+                        SELECT COUNT(*) FROM pg_stat_activity
+                        WHERE datname = current_database() AND wait_event_type = 'Lock'
+                    """)
+                    self.samples.append(cur.fetchone()[0])
+                    time.sleep(self.interval)
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, wall):
+        if not self.samples:
+            return {"mean_waiting": 0.0, "max_waiting": 0, "lock_wait_s": 0.0}
+        mean = sum(self.samples) / len(self.samples)
+        # Average number of waiting sessions x wall time = session-seconds spent waiting
+        return {"mean_waiting": round(mean, 2), "max_waiting": max(self.samples), "lock_wait_s": round(mean * wall, 3)}
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def run_series(series, fixture, count, concurrency, think_ms, recorder):
+    """Run `count` creations with `concurrency` connections. Returns the correctness/throughput report."""
+    local = threading.local()
+    connections = []
+    connections_lock = threading.Lock()
+    committed = []
+    committed_lock = threading.Lock()
+    failures = Counter()
+
+    def connection():
+        if not hasattr(local, "conn"):
+            local.conn = get_connection()
+            with connections_lock:
+                connections.append(local.conn)
+        return local.conn
+
+    def create(_):
+        conn = connection()
+        cur = conn.cursor()
+        start = time.perf_counter()
+        try:
+            number = series.allocate(cur)
+            allocated = time.perf_counter()
+            recorder.record(f"{series.name} allocate", allocated - start)
+            if think_ms:
+                # Endpoints run other statements between allocating and inserting
+                time.sleep(think_ms / 1000.0)
+            series.insert(cur, number, fixture)
+            conn.commit()
+            recorder.record(f"{series.name} transaction", time.perf_counter() - start)
+            with committed_lock:
+                committed.append(number)
+        except Exception as e:
+            conn.rollback()
+            recorder.record(f"{series.name} transaction", time.perf_counter() - start, ok=False)
+            failures["unique_violation" if getattr(e, "pgcode", None) == "23505" else type(e).__name__] += 1
+        finally:
+            cur.close()
+
+    started = time.perf_counter()
+    with LockWaitMonitor() as monitor:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(create, range(count)))
+    wall = time.perf_counter() - started
+    for conn in connections:
+        conn.close()
+
+    counts = Counter(committed)
+    duplicates = sum(n - 1 for n in counts.values() if n > 1) + failures["unique_violation"]
+    irregular = sorted(number for number in counts if series.sequence(number) is None)
+    sequences = sorted({series.sequence(number) for number in counts} - {None})
+    missing = (sequences[-1] - sequences[0] + 1 - len(sequences)) if sequences else 0
+    # A transaction that failed after allocating legitimately leaves a hole
+    allowed_gaps = sum(failures.values()) - failures["unique_violation"]
+
+    report = {
+        "series": series.name,
+        "attempted": count,
+        "committed": len(committed),
+        "failed": dict(failures),
+        "duplicates": duplicates,
+        "duplicate_examples": [n for n, c in counts.most_common(3) if c > 1],
+        "gaps": missing,
+        "allowed_gaps": allowed_gaps,
+        "irregular": len(irregular),
+        "irregular_examples": irregular[:3],
+        "throughput_per_s": round(len(committed) / wall, 2) if wall else 0.0,
+        "wall_s": round(wall, 3),
+    }
+    report.update(monitor.summary(wall))
+    report["ok"] = duplicates == 0 and missing <= allowed_gaps and not irregular
+    return report
+
+
+def print_reports(reports):
+    print("\nNumbering correctness")
+    header = (f"{'series':<14} {'done':>6} {'fail':>5} {'dups':>5} {'gaps':>5} {'allow':>5} {'irreg':>5} "
+              f"{'per s':>8} {'lock wait s':>11} {'max wait':>8}  result")
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        print(f"{r['series']:<14} {r['committed']:>6} {sum(r['failed'].values()):>5} {r['duplicates']:>5} "
+              f"{r['gaps']:>5} {r['allowed_gaps']:>5} {r['irregular']:>5} {r['throughput_per_s']:>8.1f} "
+              f"{r['lock_wait_s']:>11.3f} {r['max_waiting']:>8}  {'OK' if r['ok'] else 'FAIL'}")
+        if r["duplicate_examples"]:
+            print(f"    duplicated: {', '.join(r['duplicate_examples'])}")
+        if r["irregular_examples"]:
+            print(f"    irregular:  {', '.join(r['irregular_examples'])}")
+        if r["failed"]:
+            print(f"    failures:   {r['failed']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent numbering benchmark and correctness check")
+    parser.add_argument("--series", default="quotation,request,report,invoice,proforma,delivery_note")
+    parser.add_argument("--count", type=int, default=200, help="creations per series")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent connections per series")
+    parser.add_argument("--think-ms", type=float, default=5.0,
+                        help="pause between allocating a number and inserting it")
+    parser.add_argument("--keep", action="store_true", help="leave the created rows in place")
+    options = parser.parse_args(argv)
+
+    series_map = build_series()
+    names = [s.strip() for s in options.series.split(",") if s.strip()]
+    unknown = [n for n in names if n not in series_map]
+    if unknown:
+        parser.error(f"unknown series: {', '.join(unknown)}")
+
+    conn = get_connection()
+    fixture = create_fixture(conn)
+    recorder = LatencyRecorder()
+    reports = []
+    try:
+        for name in names:
+            print(f"{name}: {options.count} creations over {options.concurrency} connections")
+            # The generators print DEBUG lines on every call
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                reports.append(run_series(series_map[name], fixture, options.count, options.concurrency,
+                                          options.think_ms, recorder))
+    finally:
+        if not options.keep:
+            drop_fixture(conn, fixture)
+        conn.close()
+
+    recorder.stop()
+    print_summary(recorder.summary(), title="Allocation latency")
+    print_reports(reports)
+    if not all(r["ok"] for r in reports):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
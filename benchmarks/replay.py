@@ -0,0 +1,179 @@
+# benchmarks/replay.py
+"""
+Replay captured traffic against a test instance.
+
+Reads the JSONL segments written by traffic_capture.py for one day, rebuilds
+each request (path params and query kept, JSON bodies synthesised from their
+recorded shape) and re-issues them on the original schedule compressed by the
+speed factor. Reports per-route latency percentiles, 4xx/5xx counts and how
+far behind schedule the replayer itself fell (if that grows, the client, not
+the server, is the bottleneck - raise --max-inflight).
+
+    python -m benchmarks.replay --day 2026-10-17 --target http://127.0.0.1:8000 --speed 1,5,20
+    python -m benchmarks.replay --day 2026-10-17 --target http://test-host:8000 --read-only --speed 20
+
+Never point this at production: POST/PUT/DELETE requests are replayed too
+unless --read-only is given.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stats import LatencyRecorder, percentile, print_summary  # noqa: E402
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs", "traffic")
+PATH_PARAM = re.compile(r"{([^}:]+)(?::[^}]+)?}")
+
+
+def load_day(directory, day):
+    """All records captured on `day`, in timestamp order."""
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, f"traffic-{day}-*.jsonl"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def synthesise(shape):
+    """Inverse of traffic_capture.body_shape: build a body with the same structure."""
+    if isinstance(shape, dict):
+        if "$list" in shape:
+            return [synthesise(shape.get("$item")) for _ in range(shape["$list"])]
+        return {k: synthesise(v) for k, v in shape.items()}
+    if shape == "$str":
+        return "replay"
+    if shape == "$date":
+        return date.today().isoformat()
+    return shape
+
+
+def build_request(record):
+    """(method, url path, kwargs for requests) for a captured record."""
+    params = record.get("path_params") or {}
+    path = PATH_PARAM.sub(lambda m: str(params.get(m.group(1), "replay")).replace("$str", "replay"), record["route"])
+    query = {k: ("replay" if v == "$str" else v) for k, v in (record.get("query") or {}).items()}
+    kwargs = {"params": query}
+    content_type = record.get("content_type") or ""
+    if record.get("body") is not None and record["body"] != "$invalid":
+        kwargs["json"] = synthesise(record["body"])
+    elif content_type.startswith("multipart/form-data"):
+        # Uploads are captured by size only
+        kwargs["files"] = {"file": ("replay.bin", b"0" * max(1, record.get("body_bytes", 1)))}
+    return record["method"], path, kwargs
+
+
+def replay(records, target, speed, max_inflight, timeout):
+    """Replay `records` once at `speed`x. Returns (recorder, status counts per route, schedule lag samples)."""
+    import requests
+
+    recorder = LatencyRecorder()
+    statuses = defaultdict(lambda: {"2xx": 0, "3xx": 0, "4xx": 0, "5xx": 0, "failed": 0})
+    statuses_lock = threading.Lock()
+    lags = []
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def issue(record):
+        method, path, kwargs = build_request(record)
+        name = f"{method} {record['route']}"
+        start = time.perf_counter()
+        try:
+            response = session().request(method, target + path, timeout=timeout, **kwargs)
+            bucket = f"{response.status_code // 100}xx"
+            ok = response.status_code < 500
+        except Exception:
+            bucket, ok = "failed", False
+        recorder.record(name, time.perf_counter() - start, ok)
+        with statuses_lock:
+            statuses[name][bucket] += 1
+
+    first = records[0]["ts"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        for record in records:
+            due = (record["ts"] - first) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lags.append(-delay)
+            pool.submit(issue, record)
+    recorder.stop()
+    return recorder, statuses, lags
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured GEL LIMS traffic")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="capture folder (TRAFFIC_CAPTURE_DIR)")
+    parser.add_argument("--day", default=date.today().isoformat(), help="captured day, YYYY-MM-DD")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="base URL of the test instance")
+    parser.add_argument("--speed", default="1", help="comma-separated speed factors, e.g. 1,5,20")
+    parser.add_argument("--read-only", action="store_true", help="replay GET/HEAD requests only")
+    parser.add_argument("--route", help="only replay routes containing this text")
+    parser.add_argument("--limit", type=int, help="replay at most this many requests")
+    parser.add_argument("--max-inflight", type=int, default=64, help="concurrent requests in flight")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    options = parser.parse_args(argv)
+
+    records = load_day(options.dir, options.day)
+    if options.read_only:
+        records = [r for r in records if r["method"] in ("GET", "HEAD")]
+    if options.route:
+        records = [r for r in records if options.route in r["route"]]
+    if options.limit:
+        records = records[:options.limit]
+    if not records:
+        print(f"No captured requests for {options.day} in {options.dir}")
+        sys.exit(1)
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"{len(records)} requests captured over {span / 60:.1f} min on {options.day}")
+
+    results = {}
+    target = options.target.rstrip("/")
+    for speed in [float(s) for s in options.speed.split(",") if s.strip()]:
+        print(f"\nReplaying at {speed:g}x (about {span / speed / 60:.1f} min) against {target}")
+        recorder, statuses, lags = replay(records, target, speed, options.max_inflight, options.timeout)
+        summary = recorder.summary()
+        print_summary(summary, title=f"Replay {speed:g}x")
+
+        print(f"\n{'route':<58} {'2xx':>6} {'3xx':>5} {'4xx':>5} {'5xx':>5} {'fail':>5}")
+        for name in sorted(statuses):
+            s = statuses[name]
+            print(f"{name[:58]:<58} {s['2xx']:>6} {s['3xx']:>5} {s['4xx']:>5} {s['5xx']:>5} {s['failed']:>5}")
+        lag = {"behind_schedule": len(lags), "p95_lag_ms": round(percentile(lags, 95) * 1000, 1),
+               "max_lag_ms": round(max(lags) * 1000, 1) if lags else 0.0}
+        print(f"\nReplayer behind schedule for {lag['behind_schedule']} requests "
+              f"(p95 {lag['p95_lag_ms']} ms, max {lag['max_lag_ms']} ms)")
+        results[f"{speed:g}x"] = {"latency": summary, "statuses": dict(statuses), "schedule": lag}
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump({"day": options.day, "requests": len(records), "target": target, "results": results}, f, indent=2)
+        print(f"Results written to {options.output}")
+
+
+if __name__ == "__main__":
+    main()
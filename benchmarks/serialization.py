@@ -0,0 +1,152 @@
+# benchmarks/serialization.py
+"""
+Response serialisation benchmark: FastAPI's validated path vs fast_json.
+
+For list_invoices, get_all_samples and get_reports the rows are fetched once
+from the database, then rendered both ways:
+
+    standard   response_model validation (if any) + jsonable_encoder + json.dumps,
+               as FastAPI does for a returned list
+    fast       fast_json.fast_response: top-level field projection + orjson
+
+The rows are replicated to the requested sizes so the large-response case can
+be measured on a small database; both renderings are checked to decode to the
+same JSON. With --requests the endpoints are also timed end to end through
+TestClient with FAST_JSON on and off. Usage:
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --sizes 100,1000,5000 --repeats 20 --requests 30
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from benchmarks.stats import LatencyRecorder, percentile, print_summary  # noqa: E402
+import fast_json  # noqa: E402
+
+DEFAULT_SIZES = (100, 1000, 5000)
+
+
+def _plain_request(path):
+    """A bare GET for endpoints that take request/response (conditional-GET ones), no validators sent."""
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+
+def _cases():
+    import invoices
+    import reports
+    import samples_workflow
+    return [
+        # (name, url, endpoint function, kwargs, response_model)
+        ("list_invoices", "/invoices/?limit=500", invoices.list_invoices, {"limit": 500, "offset": 0},
+         list[invoices.InvoiceOut]),
+        ("get_all_samples", "/samples-workflow/all-samples", samples_workflow.get_all_samples, {}, None),
+        ("get_reports", "/reports", reports.get_reports,
+         {"request": _plain_request("/reports"), "response": Response()}, None),
+    ]
+
+
+def standard_render(content, model):
+    """What FastAPI does with a returned list: validate, encode, json.dumps."""
+    if model is not None:
+        adapter = TypeAdapter(model)
+        data = adapter.dump_python(adapter.validate_python(content), mode="json")
+    else:
+        data = jsonable_encoder(content)
+    return JSONResponse(data).body
+
+
+def fast_render(content, model):
+    item_model = model.__args__[0] if model is not None else None
+    return fast_json.fast_response(content, item_model).body
+
+
+def _time(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_serialisation(sizes, repeats):
+    print(f"{'endpoint':<18} {'rows':>6} {'KiB':>8} {'standard p50':>13} {'fast p50':>10} {'speedup':>8}")
+    print("-" * 68)
+    fast_json.ENABLED = False
+    for name, _, endpoint, kwargs, model in _cases():
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = endpoint(**kwargs)
+        if not rows:
+            print(f"{name:<18} no rows in the database, skipped")
+            continue
+        for size in sizes:
+            content = (rows * (size // len(rows) + 1))[:size]
+            fast_json.ENABLED = True
+            before, after = standard_render(content, model), fast_render(content, model)
+            fast_json.ENABLED = False
+            if json.loads(before) != json.loads(after):
+                raise SystemExit(f"{name}: fast rendering differs from the standard one")
+            fast_json.ENABLED = True
+            standard = percentile(_time(lambda: standard_render(content, model), repeats), 50) * 1000
+            fast = percentile(_time(lambda: fast_render(content, model), repeats), 50) * 1000
+            fast_json.ENABLED = False
+            print(f"{name:<18} {size:>6} {len(before) / 1024:>8.1f} {standard:>11.2f}ms {fast:>8.2f}ms "
+                  f"{standard / fast:>7.1f}x")
+    fast_json.ENABLED = True
+
+
+def run_requests(count):
+    import invoices
+    import reports
+    import samples_workflow
+    app = FastAPI()
+    app.include_router(invoices.router)
+    app.include_router(samples_workflow.router)
+    app.include_router(reports.router, prefix="/reports")
+    client = TestClient(app)
+    recorder = LatencyRecorder()
+    for enabled in (False, True):
+        fast_json.ENABLED = enabled
+        label = "fast" if enabled else "standard"
+        for name, url, *_ in _cases():
+            with contextlib.redirect_stdout(io.StringIO()):
+                client.get(url)  # warm up
+            for _ in range(count):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    with recorder.measure(f"{name} [{label}]"):
+                        response = client.get(url)
+                if response.status_code != 200:
+                    raise SystemExit(f"{url} -> {response.status_code}: {response.text[:200]}")
+    recorder.stop()
+    print_summary(recorder.summary(), title="End to end (TestClient, database included)")
+    fast_json.ENABLED = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Response serialisation benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="row counts to render")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=0, help="also time N requests per endpoint end to end")
+    options = parser.parse_args(argv)
+
+    print(f"Encoder: {'orjson ' + fast_json.orjson.__version__ if fast_json.orjson else 'json (orjson not installed)'}\n")
+    run_serialisation([int(s) for s in options.sizes.split(",")], options.repeats)
+    if options.requests:
+        run_requests(options.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/startup.py
+"""
+Cold start benchmark: time from launching the server process to its first
+answered request.
+
+Each run starts a fresh interpreter running main.app under uvicorn on a free
+port and polls GET /api/health until it answers 200. The lifespan (migrations
+check, background jobs) is included, as on the lab PCs; the EXE's unpack step
+is not.
+
+    lazy    the app as shipped: heavy dependencies load on first use
+    eager   the same, but openpyxl, docxtpl, requests and the Supabase client
+            are loaded before main is imported, as the routers used to do
+
+Usage (DATABASE_URL from .env or the environment):
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --modes lazy
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stats import percentile  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EAGER_PRELUDE = (
+    "import openpyxl, openpyxl.styles, docxtpl, requests, supabase; "
+    "import storage; storage.get_supabase(); "
+)
+SERVE = "import uvicorn, main; uvicorn.run(main.app, host='127.0.0.1', port={port}, log_level='warning')"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(mode, timeout=60):
+    port = _free_port()
+    code = (EAGER_PRELUDE if mode == "eager" else "") + SERVE.format(port=port)
+    url = f"http://127.0.0.1:{port}/api/health"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"server exited: {process.stderr.read().decode(errors='replace')[-500:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise SystemExit(f"no response from {url} within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time from process start to first response")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="eager,lazy")
+    options = parser.parse_args(argv)
+
+    results = {}
+    for mode in options.modes.split(","):
+        time_to_first_response(mode)  # warm the OS file cache
+        results[mode] = [time_to_first_response(mode) for _ in range(options.runs)]
+
+    print(f"{'mode':<8} {'p50':>9} {'min':>9} {'max':>9}   ({options.runs} runs)")
+    print("-" * 42)
+    for mode, samples in results.items():
+        print(f"{mode:<8} {percentile(samples, 50) * 1000:>7.0f}ms {min(samples) * 1000:>7.0f}ms "
+              f"{max(samples) * 1000:>7.0f}ms")
+    if "eager" in results and "lazy" in results:
+        saved = percentile(results["eager"], 50) - percentile(results["lazy"], 50)
+        print(f"\nLazy imports save {saved * 1000:.0f} ms at p50")
+
+
+if __name__ == "__main__":
+    main()
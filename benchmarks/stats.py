@@ -0,0 +1,138 @@
+# benchmarks/stats.py
+"""
+Latency bookkeeping shared by the benchmark harnesses: per-endpoint samples,
+p50/p95/p99 summaries, throughput and comparison against a stored baseline.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyRecorder:
+    """Thread-safe collector of (name, seconds, ok) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._started = time.perf_counter()
+        self._finished = None
+
+    def record(self, name, seconds, ok=True):
+        with self._lock:
+            self._samples[name].append(seconds)
+            if not ok:
+                self._errors[name] += 1
+
+    @contextmanager
+    def measure(self, name):
+        """Time the wrapped block; an exception counts as an error and is re-raised."""
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, ok)
+
+    def stop(self):
+        self._finished = time.perf_counter()
+
+    def summary(self):
+        """Return {name: {count, errors, error_rate, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, rps}}."""
+        wall = (self._finished or time.perf_counter()) - self._started
+        result = {}
+        with self._lock:
+            for name, values in self._samples.items():
+                count = len(values)
+                busy = sum(values)
+                result[name] = {
+                    "count": count,
+                    "errors": self._errors[name],
+                    "error_rate": round(self._errors[name] / count, 4) if count else 0.0,
+                    "mean_ms": round(busy / count * 1000, 3) if count else 0.0,
+                    "p50_ms": round(percentile(values, 50) * 1000, 3),
+                    "p95_ms": round(percentile(values, 95) * 1000, 3),
+                    "p99_ms": round(percentile(values, 99) * 1000, 3),
+                    "max_ms": round(max(values) * 1000, 3) if values else 0.0,
+                    # Requests per wall-clock second across the whole run
+                    "rps": round(count / wall, 3) if wall > 0 else 0.0,
+                }
+        return result
+
+
+# ----------------------------
+# Output helpers
+# ----------------------------
+def print_summary(summary, title="Results"):
+    print(f"\n{title}")
+    header = f"{'endpoint':<58} {'count':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>8}"
+    print(header)
+    print("-" * len(header))
+    for name in sorted(summary):
+        row = summary[name]
+        print(
+            f"{name[:58]:<58} {row['count']:>6} {row['errors']:>5} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['rps']:>8.2f}"
+        )
+
+
+def save_baseline(path, summary, meta=None):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta or {}, "results": summary}, f, indent=2, sort_keys=True)
+    print(f"Baseline written to {path}")
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def compare_to_baseline(summary, baseline, tolerance=0.15, metric="p95_ms"):
+    """
+    Compare a run against a stored baseline.
+
+    Returns a list of regression dicts for endpoints whose `metric` grew by more
+    than `tolerance` (fraction) or whose error rate went up.
+    """
+    regressions = []
+    print(f"\nComparison against baseline ({metric}, tolerance {tolerance:.0%})")
+    print(f"{'endpoint':<58} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(set(summary) | set(baseline)):
+        current = summary.get(name)
+        previous = baseline.get(name)
+        if current is None or previous is None:
+            status = "missing now" if current is None else "new"
+            print(f"{name[:58]:<58} {'-':>10} {'-':>10} {status:>8}")
+            continue
+
+        before = previous.get(metric, 0.0)
+        after = current.get(metric, 0.0)
+        change = (after - before) / before if before else 0.0
+        print(f"{name[:58]:<58} {before:>10.2f} {after:>10.2f} {change:>+8.1%}")
+
+        if change > tolerance:
+            regressions.append({"endpoint": name, "metric": metric, "baseline": before, "current": after, "change": change})
+        if current.get("error_rate", 0) > previous.get("error_rate", 0):
+            regressions.append({
+                "endpoint": name, "metric": "error_rate",
+                "baseline": previous.get("error_rate", 0), "current": current.get("error_rate", 0),
+                "change": None,
+            })
+    return regressions
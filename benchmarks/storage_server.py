@@ -0,0 +1,332 @@
+# benchmarks/storage_server.py
+"""
+Local stand-in for the Supabase storage API.
+
+Implements the subset the routers and the Supabase SDK use:
+
+    GET/HEAD /storage/v1/object/public/{bucket}/{path}   public download
+    GET      /storage/v1/object/{bucket}/{path}          authenticated download
+    POST     /storage/v1/object/{bucket}/{path}          upload (409 unless x-upsert: true)
+    PUT      /storage/v1/object/{bucket}/{path}          update / overwrite
+    POST     /storage/v1/object/list/{bucket}            list objects under a prefix
+    GET      /__stats                                    request/fault counters (JSON)
+
+Objects live as plain files under --root/{bucket}/{path}. Latency and failures
+are injected from a seeded RNG, so load tests of template caching and upload
+paths are repeatable:
+
+    python -m benchmarks.storage_server --seed-templates --latency-ms 40 --jitter-ms 10 --failure-rate 0.02
+
+then set SUPABASE_URL=http://127.0.0.1:54321 in .env (see storage.py).
+"""
+import argparse
+import json
+import mimetypes
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".storage")
+PREFIX = "/storage/v1/object"
+
+# Remote layout of the templates bucket -> local files shipped in templates/
+TEMPLATE_SEED = {
+    "quotations/QT.docx": "templates/QT.docx",
+    "quotations/GEO.docx": "templates/GEO.docx",
+    "quotations/SRV.docx": "templates/SRV.docx",
+    "invoices/invoice.xlsx": "templates/excel_templates/invoice.xlsx",
+    "invoices/delivery_note.xlsx": "templates/excel_templates/delivery_note.xlsx",
+    "test-requests/ST_Test_Request.xlsx": "templates/test-requests/ST_Test_Request.xlsx",
+    "worksheets/RH.xlsx": "templates/worksheets/RH.xlsx",
+    "worksheets/SPT.xlsx": "templates/worksheets/SPT.xlsx",
+    "reports/RH_Report.xlsx": "templates/reports/RH_Report.xlsx",
+    "reports/SPT_Report.xlsx": "templates/reports/SPT_Report.xlsx",
+}
+
+
+class FaultInjector:
+    """Seeded latency/failure source shared by all handler threads."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0, seed=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_failures": 0, "not_found": 0, "uploads": 0, "bytes_out": 0}
+
+    def draw(self):
+        """Return (delay_seconds, fail) for the next request, in arrival order."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency_ms
+            if self.jitter_ms:
+                delay += self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if fail:
+                self.stats["injected_failures"] += 1
+            return max(0.0, delay) / 1000.0, fail
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+
+class StorageHandler(BaseHTTPRequestHandler):
+    server_version = "GELStorageStandIn/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # ----------------------------
+    # Helpers
+    # ----------------------------
+    @property
+    def root(self):
+        return self.server.storage_root
+
+    @property
+    def faults(self):
+        return self.server.faults
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status, payload, head_only=False):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _error(self, status, error, message, head_only=False):
+        if status == 404:
+            self.faults.count("not_found")
+        self._send_json(status, {"statusCode": str(status), "error": error, "message": message}, head_only)
+
+    def _object_path(self, bucket, key):
+        full = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not full.startswith(os.path.normpath(self.root) + os.sep):
+            return None
+        return full
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _inject(self, head_only=False):
+        """Apply latency/failure; returns True if the request was failed."""
+        delay, fail = self.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._error(503, "ServiceUnavailable", "Injected failure", head_only)
+        return fail
+
+    def _route(self):
+        """Split the URL into (kind, bucket, key) or None."""
+        path = unquote(urlparse(self.path).path)
+        if not path.startswith(PREFIX + "/"):
+            return None
+        parts = path[len(PREFIX) + 1:].split("/")
+        if parts[0] == "public" and len(parts) >= 3:
+            return "public", parts[1], "/".join(parts[2:])
+        if parts[0] == "list" and len(parts) == 2:
+            return "list", parts[1], ""
+        if len(parts) >= 2:
+            return "object", parts[0], "/".join(parts[1:])
+        return None
+
+    # ----------------------------
+    # Verbs
+    # ----------------------------
+    def do_HEAD(self):
+        self._download(head_only=True)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/__stats":
+            self._send_json(200, self.faults.stats)
+            return
+        self._download(head_only=False)
+
+    def _download(self, head_only):
+        route = self._route()
+        if not route or route[0] not in ("public", "object"):
+            self._error(404, "not_found", "Route not found", head_only)
+            return
+        if self._inject(head_only):
+            return
+        _, bucket, key = route
+        full = self._object_path(bucket, key)
+        if not full or not os.path.isfile(full):
+            self._error(404, "not_found", "Object not found", head_only)
+            return
+
+        size = os.path.getsize(full)
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(full)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.send_header("Last-Modified", self.date_time_string(os.path.getmtime(full)))
+        self.end_headers()
+        if not head_only:
+            with open(full, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+            self.faults.count("bytes_out", size)
+
+    def do_POST(self):
+        route = self._route()
+        if not route:
+            self._error(404, "not_found", "Route not found")
+            return
+        if route[0] == "list":
+            self._list(route[1])
+        elif route[0] == "object":
+            upsert = (self.headers.get("x-upsert") or "").lower() == "true"
+            self._upload(route[1], route[2], overwrite=upsert)
+        else:
+            self._read_body()
+            self._error(405, "method_not_allowed", "Public objects are read-only")
+
+    def do_PUT(self):
+        route = self._route()
+        if not route or route[0] != "object":
+            self._read_body()
+            self._error(404, "not_found", "Route not found")
+            return
+        self._upload(route[1], route[2], overwrite=True)
+
+    def _upload(self, bucket, key, overwrite):
+        body = self._read_body()
+        if self._inject():
+            return
+        full = self._object_path(bucket, key)
+        if not full:
+            self._error(400, "invalid_key", "Invalid object key")
+            return
+        if os.path.exists(full) and not overwrite:
+            self._error(409, "Duplicate", "The resource already exists")
+            return
+
+        content = body
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            # The SDK posts the object as the "file" field of a multipart form
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            content = b""
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "file":
+                    content = part.get_payload(decode=True) or b""
+                    break
+
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        tmp = f"{full}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, full)
+        self.faults.count("uploads")
+        self._send_json(200, {"Key": f"{bucket}/{key}", "Id": f"{bucket}/{key}"})
+
+    def _list(self, bucket):
+        try:
+            options = json.loads(self._read_body() or b"{}")
+        except ValueError:
+            options = {}
+        if self._inject():
+            return
+        prefix = (options.get("prefix") or "").strip("/")
+        limit = int(options.get("limit") or 100)
+        offset = int(options.get("offset") or 0)
+        search = options.get("search") or ""
+
+        folder = self._object_path(bucket, prefix) if prefix else os.path.join(self.root, bucket)
+        entries = []
+        if folder and os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                if search and search not in name:
+                    continue
+                full = os.path.join(folder, name)
+                if os.path.isdir(full):
+                    entries.append({"name": name, "id": None, "metadata": None})
+                else:
+                    stat = os.stat(full)
+                    entries.append({
+                        "name": name,
+                        "id": f"{bucket}/{prefix + '/' if prefix else ''}{name}",
+                        "updated_at": self.date_time_string(stat.st_mtime),
+                        "metadata": {"size": stat.st_size,
+                                     "mimetype": mimetypes.guess_type(name)[0] or "application/octet-stream"},
+                    })
+        self._send_json(200, entries[offset:offset + limit])
+
+
+def seed_templates(root):
+    """Copy the bundled templates/ files into the templates bucket with the remote layout."""
+    copied = 0
+    for key, local in TEMPLATE_SEED.items():
+        source = os.path.join(REPO_ROOT, local)
+        if not os.path.exists(source):
+            print(f"  skip {key}: {local} not found")
+            continue
+        target = os.path.join(root, "templates", key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        copied += 1
+    return copied
+
+
+def start_storage_server(root=DEFAULT_ROOT, host="127.0.0.1", port=54321, latency_ms=0.0, jitter_ms=0.0,
+                         failure_rate=0.0, seed=1, verbose=False):
+    """Start the stand-in on a daemon thread (port=0 picks a free port). Returns the server."""
+    os.makedirs(root, exist_ok=True)
+    server = ThreadingHTTPServer((host, port), StorageHandler)
+    server.daemon_threads = True
+    server.storage_root = os.path.abspath(root)
+    server.faults = FaultInjector(latency_ms, jitter_ms, failure_rate, seed)
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, name="storage-stand-in", daemon=True)
+    thread.start()
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Supabase storage stand-in")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="directory holding {bucket}/{path} files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- uniform jitter on the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=1, help="RNG seed for latency/failure injection")
+    parser.add_argument("--seed-templates", action="store_true", help="copy templates/ into the templates bucket")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.seed_templates:
+        print(f"Seeded {seed_templates(args.root)} templates into {args.root}")
+
+    server = start_storage_server(args.root, args.host, args.port, args.latency_ms, args.jitter_ms,
+                                  args.failure_rate, args.seed, args.verbose)
+    print(f"Storage stand-in on {server.base_url} (root {server.storage_root})")
+    print(f"Set SUPABASE_URL={server.base_url} in .env to use it")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+# benchmarks/synthetic.py
+"""
+Synthetic data generator for benchmarking.
+
+Populates the database behind DATABASE_URL with clients, enquiries, quotations
+(with items and revisions), projects, test requests, samples, worksheets,
+reports, invoices and delivery notes at ratios that mirror the live lab.
+Everything is driven by the target sample count, so the same command scales
+from a smoke test to 1M samples:
+
+    python -m benchmarks.synthetic --samples 1000000 --schema --seed 7
+
+Rows are streamed with COPY in chunks, so memory stays flat. Numbers follow the
+real formats (QG-001-24, LP/16732/24/DXB, GQ-DDMMYY-0N, GS-..., GR - DDMMYY - NNN,
+36001/24) but are dated in past years so the live COUNT-based numbering for the
+current year/day is not disturbed.
+"""
+import argparse
+import csv
+import io
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_connection  # noqa: E402
+from schema_migrations import apply_migrations  # noqa: E402
+
+# ----------------------------
+# Ratios (per parent row)
+# ----------------------------
+RATIOS = {
+    "enquiries_per_client": 4,
+    "revision_rate": 0.15,            # share of quotations that get a revision
+    "items_per_quotation": 12,
+    "geo_items_per_quotation": 40,
+    "geo_share": 0.25,
+    "project_conversion": 0.6,        # quotations that turn into projects
+    "requests_per_project": 3,
+    "tests_per_request": 4,
+    "samples_per_request": 8,
+    "accept_rate": 0.92,
+    "worksheet_rate": 0.95,           # of accepted samples
+    "report_rate": 0.85,              # of test groups with accepted samples
+    "approved_share": 0.75,
+    "invoices_per_project": 1.5,
+    "delivery_note_rate": 0.5,        # of projects with approved reports
+}
+
+DIVISIONS = ["GEO", "SRV", "MAT", "CHM"]
+
+CATALOG = [
+    ("RH", "Relative Humidity Test", "ASTM F2170"),
+    ("SPT", "Standard Penetration Test", "ASTM D1586"),
+    ("MC", "Moisture Content", "BS 1377-2"),
+    ("PSD", "Particle Size Distribution", "BS 1377-2"),
+    ("AL", "Atterberg Limits", "BS 1377-2"),
+    ("CBR", "California Bearing Ratio", "BS 1377-4"),
+    ("PLT", "Plate Load Test", "BS 1377-9"),
+    ("CC", "Concrete Cube Compressive Strength", "BS EN 12390-3"),
+    ("CORE", "Concrete Core Test", "BS EN 12504-1"),
+    ("RB", "Rebound Hammer Test", "BS EN 12504-2"),
+    ("UPV", "Ultrasonic Pulse Velocity", "BS EN 12504-4"),
+    ("CHL", "Chloride Content", "BS 1881-124"),
+    ("SUL", "Sulphate Content", "BS 1377-3"),
+    ("PH", "pH Value", "BS 1377-3"),
+    ("BH", "Borehole Drilling (Rotary)", "BS 5930"),
+    ("DCP", "Dynamic Cone Penetrometer", "ASTM D6951"),
+    ("FDT", "Field Density Test (Sand Replacement)", "BS 1377-9"),
+    ("PT", "Pile Integrity Test", "ASTM D5882"),
+    ("LAB", "Laboratory Analysis of Soil Samples", "BS 1377"),
+    ("ER", "Engineering Report", "-"),
+]
+
+LOCATIONS = ["Dubai", "Abu Dhabi", "Sharjah", "Ajman", "Ras Al Khaimah", "Al Ain", "Fujairah"]
+USERS = [
+    ("bench_manager", "MANAGER", "Bench Manager"),
+    ("bench_supervisor", "SUPERVISOR", "Bench Supervisor"),
+    ("bench_chemist", "CHEMIST", "Bench Chemist"),
+]
+
+# Parent tables first so COPY batches always satisfy foreign keys
+TABLE_COLUMNS = [
+    ("clients", "client_id", ["client_id", "name", "contact_person", "email", "phone", "address", "created_at"]),
+    ("enquiries", "enquiry_id", ["enquiry_id", "client_id", "enquiry_ref", "enquiry_date", "project_name",
+                                 "location", "status", "notes", "created_at"]),
+    ("quotations", "quotation_id", ["quotation_id", "quotation_no", "enquiry_id", "division", "revision",
+                                    "payment_terms", "prepared_under", "validity_days", "status",
+                                    "total_amount", "vat", "grand_total", "created_at", "approved_at"]),
+    ("quotation_items", "item_id", ["item_id", "quotation_id", "item_code", "description", "test_standard",
+                                    "unit_rate", "quantity"]),
+    ("projects", "project_id", ["project_id", "project_no", "quotation_id", "client_id", "project_name",
+                                "location", "lpo_no", "lpo_date", "division", "status", "created_at"]),
+    ("test_requests", "test_request_id", ["test_request_id", "project_id", "request_no", "requested_by",
+                                          "status", "created_at"]),
+    ("test_request_items", "tri_id", ["tri_id", "test_request_id", "quotation_item_id", "quantity"]),
+    ("samples", "sample_id", ["sample_id", "sample_no", "request_id", "collected_by", "received_date",
+                              "status", "barcode", "storage_location", "reason_rejected", "assigned_tri_id",
+                              "assigned_quotation_item_id", "assigned_item_code", "assigned_test_name",
+                              "created_at"]),
+    ("worksheets", "worksheet_id", ["worksheet_id", "worksheet_no", "sample_id", "quotation_item_id",
+                                    "test_name", "standard", "unit_rate", "quantity", "technician",
+                                    "status", "created_at"]),
+    ("reports", "report_id", ["report_id", "report_no", "sample_id", "original_filename", "stored_filename",
+                              "file_path", "file_type", "uploaded_by", "status", "covers_test_type",
+                              "covers_samples", "linked_to_report_id", "checked_by", "checked_at",
+                              "approved_by", "approved_at", "is_locked", "created_at"]),
+    ("invoices", "invoice_id", ["invoice_id", "invoice_no", "project_id", "invoice_type", "payment_method",
+                                "invoice_date", "lpo_reference", "payment_terms", "subtotal", "vat", "total",
+                                "amount_in_words", "services_description", "payment_status", "paid_date",
+                                "created_at"]),
+    ("invoice_items", "item_id", ["item_id", "invoice_id", "description", "test_standard", "unit_rate",
+                                  "quantity", "amount", "sample_id"]),
+    ("invoice_report_links", "id", ["id", "invoice_id", "report_no", "invoice_type"]),
+    ("delivery_notes", "delivery_note_id", ["delivery_note_id", "delivery_note_no", "project_id",
+                                            "generated_at", "total_reports", "file_path"]),
+    ("delivery_note_reports", "id", ["id", "delivery_note_no", "report_no"]),
+]
+
+
+def _pg_array(values):
+    return "{" + ",".join('"' + v.replace('"', '\\"') + '"' for v in values) + "}"
+
+
+class _CopyBuffer:
+    """Accumulates rows for one table and streams them with COPY ... FROM STDIN."""
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = columns
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf)
+        self.pending = 0
+        self.total = 0
+
+    def add(self, row):
+        self.writer.writerow(row)
+        self.pending += 1
+
+    def flush(self, cur):
+        if not self.pending:
+            return
+        self.buf.seek(0)
+        cur.copy_expert(
+            f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN WITH (FORMAT csv)",
+            self.buf,
+        )
+        self.total += self.pending
+        self.pending = 0
+        self.buf = io.StringIO()
+        self.writer = csv.writer(self.buf)
+
+
+class SyntheticDataset:
+    """
+    Generates a consistent object graph and streams it into Postgres.
+
+    The target is a sample count; clients, enquiries, quotations, projects and
+    requests are derived from RATIOS so the graph keeps realistic fan-out.
+    """
+
+    def __init__(self, conn, target_samples, seed=1, years_back=2, chunk_rows=20000):
+        self.conn = conn
+        self.cur = conn.cursor()
+        self.target_samples = target_samples
+        self.rng = random.Random(seed)
+        self.chunk_rows = chunk_rows
+        today = date.today()
+        # Stay strictly before the current year so live numbering is untouched
+        self.date_from = date(today.year - years_back, 1, 1)
+        self.date_to = date(today.year - 1, 12, 31)
+
+        self.buffers = {table: _CopyBuffer(table, cols) for table, _, cols in TABLE_COLUMNS}
+        self.next_id = {}
+        self.counters = {}
+        self.samples_made = 0
+        self.catalog = []
+        self.user_ids = []
+
+    # ----------------------------
+    # Id / number allocation
+    # ----------------------------
+    def _load_id_offsets(self):
+        for table, pk, _ in TABLE_COLUMNS:
+            self.cur.execute(f"SELECT COALESCE(MAX({pk}), 0) FROM {table}")
+            self.next_id[table] = self.cur.fetchone()[0] + 1
+
+    def _id(self, table):
+        value = self.next_id[table]
+        self.next_id[table] = value + 1
+        return value
+
+    def _seq(self, key, start=1):
+        value = self.counters.get(key, start)
+        self.counters[key] = value + 1
+        return value
+
+    def _random_day(self):
+        span = (self.date_to - self.date_from).days
+        return self.date_from + timedelta(days=self.rng.randint(0, span))
+
+    def _ts(self, day, hour_from=8, hour_to=17):
+        return datetime(day.year, day.month, day.day,
+                        self.rng.randint(hour_from, hour_to), self.rng.randint(0, 59), self.rng.randint(0, 59))
+
+    def _advance(self, day, min_days, max_days):
+        nxt = day + timedelta(days=self.rng.randint(min_days, max_days))
+        return min(nxt, self.date_to)
+
+    # ----------------------------
+    # Reference data
+    # ----------------------------
+    def _ensure_reference_data(self):
+        for username, role, full_name in USERS:
+            self.cur.execute("""
+                INSERT INTO users (username, password_hash, user_role, full_name, is_active)
+                VALUES (%s, %s, %s, %s, true)
+                ON CONFLICT (username) DO NOTHING
+            """, (username, "bench", role, full_name))
+        self.cur.execute("SELECT user_id FROM users WHERE username LIKE 'bench_%%' ORDER BY user_id")
+        self.user_ids = [row[0] for row in self.cur.fetchall()]
+
+        self.cur.execute("SELECT code, description, test_standard, unit_rate FROM price_catalog WHERE active = true")
+        self.catalog = [(r[0], r[1], r[2], float(r[3] or 0)) for r in self.cur.fetchall()]
+        if not self.catalog:
+            for idx, (code, description, standard) in enumerate(CATALOG):
+                rate = float(50 + (idx * 37) % 900)
+                self.cur.execute("""
+                    INSERT INTO price_catalog (code, description, test_standard, unit_rate, unit, active, group_name)
+                    VALUES (%s, %s, %s, %s, %s, true, %s)
+                """, (code, description, standard, rate, "No.", "Synthetic"))
+                self.catalog.append((code, description, standard, rate))
+        self.conn.commit()
+
+    # ----------------------------
+    # Graph generation
+    # ----------------------------
+    def _emit(self, table, row):
+        buffer = self.buffers[table]
+        buffer.add(row)
+        if buffer.pending >= self.chunk_rows:
+            self._flush_all()
+
+    def _flush_all(self):
+        for table, _, _ in TABLE_COLUMNS:
+            self.buffers[table].flush(self.cur)
+
+    def _make_client(self):
+        client_id = self._id("clients")
+        n = client_id
+        day = self._random_day()
+        self._emit("clients", [
+            client_id, f"SYN Client {n:06d} LLC", f"Contact {n}", f"client{n}@example.test",
+            f"+9714{n % 10000000:07d}", f"P.O. Box {1000 + n % 9000}, {self.rng.choice(LOCATIONS)}",
+            self._ts(day),
+        ])
+        for _ in range(max(1, int(self.rng.gauss(RATIOS["enquiries_per_client"], 1)))):
+            if self.samples_made >= self.target_samples:
+                break
+            day = self._advance(day, 1, 40)
+            self._make_enquiry(client_id, day)
+
+    def _make_enquiry(self, client_id, day):
+        enquiry_id = self._id("enquiries")
+        project_name = f"SYN Project {enquiry_id:07d}"
+        location = self.rng.choice(LOCATIONS)
+        ref = f"ENQ-{day.year}-{self._seq(('enq', day.year)):03d}"
+        converts = self.rng.random() < RATIOS["project_conversion"]
+        self._emit("enquiries", [
+            enquiry_id, client_id, ref, day, project_name, location,
+            "CLOSED" if converts else self.rng.choice(["OPEN", "QUOTED", "CLOSED"]), None, self._ts(day),
+        ])
+
+        division = "GEO" if self.rng.random() < RATIOS["geo_share"] else self.rng.choice(DIVISIONS[1:])
+        q_day = self._advance(day, 0, 7)
+        quotation_id, items = self._make_quotation(enquiry_id, division, q_day, 0, None,
+                                                   "APPROVED" if converts else None)
+        if self.rng.random() < RATIOS["revision_rate"]:
+            q_day = self._advance(q_day, 1, 14)
+            quotation_id, items = self._make_quotation(enquiry_id, division, q_day, 1, items,
+                                                       "APPROVED" if converts else None)
+        if converts:
+            self._make_project(quotation_id, client_id, division, project_name, location,
+                               items, self._advance(q_day, 1, 21))
+
+    def _make_quotation(self, enquiry_id, division, day, revision, copy_items, status):
+        quotation_id = self._id("quotations")
+        prefix = {"GEO": "QG", "SRV": "QS"}.get(division, "QL")
+        yy = day.strftime("%y")
+        quotation_no = f"{prefix}-{self._seq((prefix, yy)):03d}-{yy}" + (f"-R{revision}" if revision else "")
+
+        if copy_items is None:
+            count = RATIOS["geo_items_per_quotation"] if division == "GEO" else RATIOS["items_per_quotation"]
+            count = max(1, int(self.rng.gauss(count, count / 4)))
+            picks = [self.rng.choice(self.catalog) for _ in range(count)]
+            items = [(code, desc, std, rate, self.rng.randint(1, 6)) for code, desc, std, rate in picks]
+        else:
+            items = [(code, desc, std, rate, qty) for code, desc, std, rate, qty, _ in copy_items]
+
+        with_ids = []
+        for code, desc, std, rate, qty in items:
+            with_ids.append((code, desc, std, rate, qty, self._id("quotation_items")))
+
+        status = status or self.rng.choice(["DRAFT", "SENT", "REJECTED", "CLARIFICATION"])
+        created = self._ts(day)
+        # Header before items so a mid-quotation flush never orphans item rows.
+        # Totals start at 0: the 0005 triggers add the items as they are copied in.
+        self._emit("quotations", [
+            quotation_id, quotation_no, enquiry_id, division, revision,
+            "50% advance, 50% on draft report", self.rng.choice([None, "AR", "AS"]), 30, status,
+            0, 0, 0, created,
+            created + timedelta(days=2) if status == "APPROVED" else None,
+        ])
+        for code, desc, std, rate, qty, item_id in with_ids:
+            self._emit("quotation_items", [item_id, quotation_id, code, desc, std, rate, qty])
+        return quotation_id, with_ids
+
+    def _make_project(self, quotation_id, client_id, division, project_name, location, q_items, day):
+        project_id = self._id("projects")
+        project_no = f"LP/{self._seq('project', 16732)}/{day.strftime('%y')}/DXB"
+        self._emit("projects", [
+            project_id, project_no, quotation_id, client_id, project_name, location,
+            f"LPO-{project_id:06d}", day, division, self.rng.choice(["ACTIVE", "ACTIVE", "ACTIVE", "COMPLETED"]),
+            self._ts(day),
+        ])
+
+        approved_reports = []
+        billed_samples = []
+        for _ in range(max(1, int(self.rng.gauss(RATIOS["requests_per_project"], 1)))):
+            if self.samples_made >= self.target_samples:
+                break
+            day = self._advance(day, 0, 20)
+            reports, samples = self._make_test_request(project_id, q_items, day)
+            approved_reports.extend(reports)
+            billed_samples.extend(samples)
+
+        if billed_samples:
+            self._make_invoices(project_id, project_no, billed_samples, approved_reports, day)
+        if approved_reports and self.rng.random() < RATIOS["delivery_note_rate"]:
+            self._make_delivery_note(project_id, project_no, approved_reports, day)
+
+    def _make_test_request(self, project_id, q_items, day):
+        request_id = self._id("test_requests")
+        request_date = day.strftime("%d%m%y")
+        request_seq = self._seq(("req", day))
+        request_no = f"GQ-{request_date}-0{request_seq}"
+        self._emit("test_requests", [
+            request_id, project_id, request_no, "Site Engineer",
+            self.rng.choice(["SAMPLES_RECEIVED", "TESTING_IN_PROGRESS", "COMPLETED", "APPROVED"]),
+            self._ts(day),
+        ])
+
+        # Spread the sample budget over a handful of tests, like the UI does
+        n_tests = min(len(q_items), max(1, int(self.rng.gauss(RATIOS["tests_per_request"], 1))))
+        tests = self.rng.sample(q_items, n_tests)
+        budget = max(n_tests, int(self.rng.gauss(RATIOS["samples_per_request"], 2)))
+        budget = min(budget, max(n_tests, self.target_samples - self.samples_made))
+        quantities = [1] * n_tests
+        for _ in range(budget - n_tests):
+            quantities[self.rng.randrange(n_tests)] += 1
+
+        seq = 0
+        approved_reports = []
+        billed = []
+        for (code, desc, std, rate, _, item_id), qty in zip(tests, quantities):
+            tri_id = self._id("test_request_items")
+            self._emit("test_request_items", [tri_id, request_id, item_id, qty])
+
+            group = []
+            for _ in range(qty):
+                seq += 1
+                sample_id = self._id("samples")
+                sample_no = f"GS-{request_date}-0{request_seq}-{seq}"
+                accepted = self.rng.random() < RATIOS["accept_rate"]
+                received = self._ts(self._advance(day, 0, 3))
+                self._emit("samples", [
+                    sample_id, sample_no, request_id, "Field Technician", received,
+                    "ACCEPTED" if accepted else "REJECTED",
+                    f"{self.rng.getrandbits(64):016X}" if accepted else None,
+                    f"Rack {self.rng.randint(1, 40)}" if accepted else None,
+                    None if accepted else "Insufficient quantity",
+                    tri_id, item_id, code, desc, received,
+                ])
+                self.samples_made += 1
+                if not accepted:
+                    continue
+                group.append((sample_id, sample_no))
+                billed.append((desc, std, rate, sample_id))
+                if self.rng.random() < RATIOS["worksheet_rate"]:
+                    worksheet_id = self._id("worksheets")
+                    self._emit("worksheets", [
+                        worksheet_id, f"WKS-{received.year}-{sample_id:04d}-{self._seq(('wks', received.year)):03d}",
+                        sample_id, item_id, desc, std, rate, 1, "Lab Technician",
+                        self.rng.choice(["GENERATED", "COMPLETED"]), received,
+                    ])
+
+            if group and self.rng.random() < RATIOS["report_rate"]:
+                report_no = self._make_report(group, desc, self._advance(day, 2, 15))
+                if report_no:
+                    approved_reports.append(report_no)
+        return approved_reports, billed
+
+    def _make_report(self, group, test_name, day):
+        """One report number per test group, one reports row per covered sample."""
+        report_no = f"GR - {day.strftime('%d%m%y')} - {self._seq(('rep', day)):03d}"
+        r = self.rng.random()
+        status = "APPROVED" if r < RATIOS["approved_share"] else ("UNDER_REVIEW" if r < 0.9 else "DRAFT")
+        created = self._ts(day)
+        covers = _pg_array([no for _, no in group])
+        checked = created + timedelta(hours=4) if status != "DRAFT" else None
+        approved = created + timedelta(days=1) if status == "APPROVED" else None
+        uploader = self.rng.choice(self.user_ids) if self.user_ids else None
+        reviewer = self.user_ids[-1] if self.user_ids else None
+
+        main_id = None
+        for sample_id, _ in group:
+            report_id = self._id("reports")
+            stored = f"{report_no.replace(' ', '_')}_{report_id}.docx"
+            self._emit("reports", [
+                report_id, report_no, sample_id, "report.docx", stored, f"uploads/reports/{stored}", "docx",
+                uploader, status, test_name, covers, main_id,
+                reviewer if checked else None, checked, reviewer if approved else None, approved,
+                status == "APPROVED", created,
+            ])
+            main_id = main_id or report_id
+        return report_no if status == "APPROVED" else None
+
+    def _make_invoices(self, project_id, project_no, billed, approved_reports, day):
+        count = max(1, int(round(self.rng.gauss(RATIOS["invoices_per_project"], 0.5))))
+        per_invoice = max(1, math.ceil(len(billed) / count))
+        for idx in range(count):
+            chunk = billed[idx * per_invoice:(idx + 1) * per_invoice]
+            if not chunk:
+                break
+            day = self._advance(day, 5, 30)
+            yy = day.strftime("%y")
+            invoice_type = self.rng.choice(["TAX", "TAX", "PROFORMA", "CASH", "CREDIT"])
+            if invoice_type == "PROFORMA":
+                invoice_no = f"{self._seq(('proforma', yy)):03d}/{yy}"
+            else:
+                invoice_no = f"{self._seq('invoice', 36001)}/{yy}"
+
+            grouped = {}
+            for desc, std, rate, sample_id in chunk:
+                entry = grouped.setdefault((desc, std, rate), [0, sample_id])
+                entry[0] += 1
+
+            invoice_id = self._id("invoices")
+            paid = self.rng.random() < 0.6
+            self._emit("invoices", [
+                invoice_id, invoice_no, project_id, invoice_type,
+                "CREDIT" if invoice_type == "CREDIT" else "CASH", day, f"LPO-{project_id:06d}", "30 days",
+                0, 0, 0,  # maintained from invoice_items by the 0005 triggers
+                "Synthetic Amount Only", f"Testing services for {project_no}",
+                "PAID" if paid else "UNPAID", self._advance(day, 1, 45) if paid else None, self._ts(day),
+            ])
+            for (desc, std, rate), (qty, sample_id) in grouped.items():
+                self._emit("invoice_items", [
+                    self._id("invoice_items"), invoice_id, desc, std, rate, qty, round(rate * qty, 2), sample_id,
+                ])
+            if invoice_type in ("PROFORMA", "TAX"):
+                for report_no in approved_reports[idx::count]:
+                    self._emit("invoice_report_links", [self._id("invoice_report_links"), invoice_id,
+                                                        report_no, invoice_type])
+
+    def _make_delivery_note(self, project_id, project_no, approved_reports, day):
+        note_id = self._id("delivery_notes")
+        day = self._advance(day, 3, 30)
+        note_no = f"{self._seq('delivery', 13212)}/{day.strftime('%y')}"
+        filename = f"DN-{note_no.replace('/', '-')}-{project_no.replace('/', '-')}.xlsx"
+        self._emit("delivery_notes", [note_id, note_no, project_id, self._ts(day), len(approved_reports),
+                                      f"generated_delivery_notes/{filename}"])
+        for report_no in approved_reports:
+            self._emit("delivery_note_reports", [self._id("delivery_note_reports"), note_no, report_no])
+
+    # ----------------------------
+    # Driver
+    # ----------------------------
+    def run(self, progress_every=50000):
+        self._ensure_reference_data()
+        self._load_id_offsets()
+
+        started = time.perf_counter()
+        last_report = 0
+        while self.samples_made < self.target_samples:
+            self._make_client()
+            if self.samples_made - last_report >= progress_every:
+                last_report = self.samples_made
+                rate = self.samples_made / (time.perf_counter() - started)
+                print(f"  {self.samples_made:,} / {self.target_samples:,} samples ({rate:,.0f}/s)")
+
+        self._flush_all()
+        for table, pk, _ in TABLE_COLUMNS:
+            self.cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{pk}'), "
+                f"GREATEST((SELECT COALESCE(MAX({pk}), 0) FROM {table}), 1))"
+            )
+        self.conn.commit()
+
+        # Fresh statistics so benchmark plans reflect the new volume
+        old_autocommit = self.conn.autocommit
+        self.conn.autocommit = True
+        for table, _, _ in TABLE_COLUMNS:
+            self.cur.execute(f"ANALYZE {table}")
+        self.conn.autocommit = old_autocommit
+
+        return {table: self.buffers[table].total for table, _, _ in TABLE_COLUMNS}
+
+
+def reset_data(conn):
+    cur = conn.cursor()
+    tables = ", ".join(table for table, _, _ in reversed(TABLE_COLUMNS))
+    cur.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+    conn.commit()
+    cur.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Populate the database with synthetic GEL LIMS data")
+    parser.add_argument("--samples", type=int, default=10000, help="target number of samples (drives all ratios)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--years-back", type=int, default=2, help="spread data over this many past years")
+    parser.add_argument("--chunk-rows", type=int, default=20000, help="rows per COPY batch")
+    parser.add_argument("--schema", action="store_true", help="apply pending migrations/ first")
+    parser.add_argument("--reset", action="store_true",
+                        help="TRUNCATE all workflow tables first (only use on a disposable database)")
+    args = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        if args.schema:
+            apply_migrations(conn)
+        if args.reset:
+            reset_data(conn)
+
+        print(f"Generating {args.samples:,} samples (seed={args.seed})")
+        started = time.perf_counter()
+        totals = SyntheticDataset(conn, args.samples, seed=args.seed, years_back=args.years_back,
+                                  chunk_rows=args.chunk_rows).run()
+        elapsed = time.perf_counter() - started
+
+        print(f"\nDone in {elapsed:.1f}s")
+        for table, count in totals.items():
+            print(f"  {table:<24} {count:>10,}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# benchmarks/workflow.py
+"""
+End-to-end workflow benchmark.
+
+Drives the real routers in-process (FastAPI TestClient against main.app) through
+the lab workflow and records latency per endpoint:
+
+    enquiry -> quotation (+ catalog items) -> approve -> project -> test request
+    -> samples -> accept -> worksheet -> report upload/review/approve -> invoice
+
+followed by the list endpoints the dashboards poll. Usage:
+
+    python -m benchmarks.workflow --iterations 50 --concurrency 4
+    python -m benchmarks.workflow --iterations 50 --save-baseline
+    python -m benchmarks.workflow --iterations 50 --compare      # exit 1 on regression
+
+Populate the database first (python -m benchmarks.synthetic) so list endpoints
+run against realistic volumes.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stats import (  # noqa: E402
+    LatencyRecorder, compare_to_baseline, load_baseline, print_summary, save_baseline,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "workflow.json")
+
+
+class StepFailed(Exception):
+    pass
+
+
+class BenchClient:
+    """Thin wrapper around TestClient that times every call under its route template."""
+
+    def __init__(self, client, recorder):
+        self.client = client
+        self.recorder = recorder
+
+    def call(self, method, route, path_params=None, **kwargs):
+        url = route.format(**(path_params or {}))
+        start = time.perf_counter()
+        response = self.client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        ok = response.status_code < 400
+        self.recorder.record(f"{method} {route}", elapsed, ok)
+        if not ok:
+            raise StepFailed(f"{method} {url} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+
+def run_workflow(api, rng, options, user_id):
+    """One full enquiry-to-invoice pass. Returns the ids it created."""
+    tag = f"{int(time.time() * 1000)}-{rng.randint(0, 99999)}"
+
+    client_id = api.call("POST", "/enquiries/clients/", json={
+        "name": f"BENCH Client {tag}", "contact_person": "Bench", "email": f"bench{tag}@example.test",
+        "phone": "+97140000000", "address": "Dubai",
+    }).json()["client_id"]
+
+    enquiry_id = api.call("POST", "/enquiries/", json={
+        "client_id": client_id, "project_name": f"BENCH Project {tag}", "location": "Dubai",
+    }).json()["enquiry_id"]
+
+    quotation_id = api.call("POST", "/quotations/", json={
+        "enquiry_id": enquiry_id, "division": options.division, "validity_days": 30,
+    }).json()["quotation_id"]
+
+    catalog = api.call("GET", "/quotations/price-catalog/").json()
+    if not catalog:
+        raise StepFailed("price catalog is empty; run benchmarks.synthetic first")
+    for _ in range(options.items):
+        entry = rng.choice(catalog)
+        api.call("POST", "/quotations/{quotation_id}/items/from-catalog", {"quotation_id": quotation_id},
+                 json={"catalog_id": entry["catalog_id"], "quantity": rng.randint(1, 4)})
+
+    api.call("POST", "/quotations/{quotation_id}/send", {"quotation_id": quotation_id})
+    api.call("POST", "/quotations/{quotation_id}/approve", {"quotation_id": quotation_id})
+    api.call("GET", "/quotations/{quotation_id}", {"quotation_id": quotation_id})
+
+    project_id = api.call("POST", "/projects/", json={
+        "quotation_id": quotation_id, "project_name": f"BENCH Project {tag}", "location": "Dubai",
+    }).json()["project_id"]
+    api.call("GET", "/projects/{project_id}", {"project_id": project_id})
+
+    created = api.call("POST", "/test-requests/", json={"project_id": project_id, "requested_by": "bench"}).json()
+    test_request_id, request_no = created["test_request_id"], created["request_no"]
+
+    # Spread the sample budget over the first few quotation lines (1-based indexes)
+    tests = min(options.items, options.tests_per_request)
+    quantities = [1] * tests
+    for _ in range(max(0, options.samples - tests)):
+        quantities[rng.randrange(tests)] += 1
+    api.call("POST", "/test-requests/{test_request_id}/items/bulk", {"test_request_id": test_request_id}, json={
+        "items": [{"quotation_item_id": idx + 1, "quantity": qty} for idx, qty in enumerate(quantities)],
+    })
+    api.call("GET", "/test-requests/{test_request_id}", {"test_request_id": test_request_id})
+
+    sample_ids = api.call("POST", "/samples-workflow/generate-samples-by-request-no/{request_no}",
+                          {"request_no": request_no}, json={"collected_by": "bench"}).json()["sample_ids"]
+
+    # First accepted sample of each assigned test; uploading for it covers the whole group
+    group_leaders = {}
+    for sample_id in sample_ids:
+        accepted = api.call("POST", "/samples-workflow/samples/{sample_id}/accept", {"sample_id": sample_id},
+                            json={"storage_location": "Bench Rack"}).json()
+        group_leaders.setdefault(accepted.get("assigned_test"), accepted["sample_no"])
+        if not options.skip_worksheets:
+            api.call("POST", "/samples-workflow/samples/{sample_id}/generate-worksheet", {"sample_id": sample_id},
+                     json={"technician": "bench"})
+
+    for sample_no in group_leaders.values():
+        report_id = api.call("POST", "/reports/upload-report", data={
+            "sample_no": sample_no, "uploaded_by": str(user_id), "notes": "bench",
+        }, files={"file": ("bench.docx", b"bench report", "application/octet-stream")}).json()["report_id"]
+        api.call("POST", "/reports/reports/{report_id}/submit-for-review", {"report_id": report_id},
+                 params={"checked_by": user_id})
+        api.call("POST", "/reports/reports/{report_id}/approve", {"report_id": report_id},
+                 params={"approved_by": user_id})
+
+    invoice = api.call("POST", "/invoices/with-payment-method", json={
+        "project_id": project_id, "invoice_type": "TAX", "payment_method": "CREDIT",
+    }).json()
+    api.call("GET", "/invoices/{invoice_id}", {"invoice_id": invoice["invoice_id"]})
+
+    return {"project_id": project_id, "test_request_id": test_request_id, "invoice_id": invoice["invoice_id"]}
+
+
+def run_polling(api):
+    """The list endpoints dashboards poll between workflow steps."""
+    api.call("GET", "/enquiries/recent")
+    api.call("GET", "/projects/projects")
+    api.call("GET", "/samples-workflow/pending-samples")
+    api.call("GET", "/samples-workflow/recent-samples")
+    api.call("GET", "/reports", params={"status": "UNDER_REVIEW"})
+    api.call("GET", "/invoices/projects/latest/")
+    api.call("GET", "/invoices/")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end GEL LIMS workflow benchmark")
+    parser.add_argument("--iterations", type=int, default=20, help="workflows to run")
+    parser.add_argument("--concurrency", type=int, default=1, help="workflows in flight at once")
+    parser.add_argument("--items", type=int, default=12, help="catalog lines per quotation")
+    parser.add_argument("--division", default="MAT")
+    parser.add_argument("--tests-per-request", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=8, help="samples per test request")
+    parser.add_argument("--poll-every", type=int, default=1, help="run the polling mix every N workflows (0 = never)")
+    parser.add_argument("--skip-worksheets", action="store_true",
+                        help="skip worksheet generation (it needs the storage templates)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare with --baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95 growth as a fraction")
+    options = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    recorder = LatencyRecorder()
+    client = TestClient(app)
+    api = BenchClient(client, recorder)
+
+    response = client.get("/auth/users/all")
+    users = response.json() if response.status_code == 200 else []
+    user_id = users[0]["user_id"] if users else 1
+
+    failures = 0
+
+    def one(i):
+        rng = random.Random(options.seed * 100003 + i)
+        start = time.perf_counter()
+        try:
+            run_workflow(api, rng, options, user_id)
+            ok = True
+        except StepFailed as e:
+            print(f"  workflow {i} failed: {e}")
+            ok = False
+        recorder.record("workflow (end to end)", time.perf_counter() - start, ok)
+        if options.poll_every and i % options.poll_every == 0:
+            try:
+                run_polling(api)
+            except StepFailed as e:
+                print(f"  polling after workflow {i} failed: {e}")
+        return ok
+
+    print(f"Running {options.iterations} workflows, concurrency {options.concurrency}")
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        futures = [pool.submit(one, i) for i in range(options.iterations)]
+        for future in as_completed(futures):
+            if not future.result():
+                failures += 1
+    recorder.stop()
+
+    summary = recorder.summary()
+    print_summary(summary, title=f"Workflow benchmark ({options.iterations - failures}/{options.iterations} succeeded)")
+
+    meta = {"iterations": options.iterations, "concurrency": options.concurrency, "items": options.items,
+            "samples": options.samples, "division": options.division, "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    if options.save_baseline:
+        save_baseline(options.baseline, summary, meta)
+    if options.compare:
+        regressions = compare_to_baseline(summary, load_baseline(options.baseline), options.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond tolerance")
+            sys.exit(1)
+        print("\nNo regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# compression.py
+"""
+Response compression for the API.
+
+The list endpoints return tens to hundreds of KiB of JSON that compresses
+5-10x, which matters on the lab's slower links. CompressionMiddleware encodes
+a response with brotli (if the client accepts br and the brotli package is
+installed) or gzip, when all of these hold:
+
+    - the body is sent in one piece (streamed responses, e.g. /events/stream
+      or file downloads, pass through untouched)
+    - the content type is text-like (JSON, HTML, CSS, JS, SVG, plain text)
+    - it is not already encoded (precompressed static files set their own
+      Content-Encoding, see static_assets.py)
+    - it is at least COMPRESSION_MIN_BYTES long
+
+Dynamic responses use fast settings (brotli quality 4, gzip level 6); the
+maximum settings are kept for the build-time static files.
+
+Settings (.env):
+    COMPRESSION=0                  disable
+    COMPRESSION_MIN_BYTES=1024     smaller bodies are sent as they are
+"""
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+import db  # noqa: F401  - loads .env before the settings below are read
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+ENABLED = os.getenv("COMPRESSION", "1").strip().lower() not in ("0", "false", "no", "off")
+MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/css", "text/plain", "text/csv",
+                      "application/javascript", "text/javascript", "image/svg+xml", "application/xml")
+
+
+def choose_encoding(accept_encoding, available=("br", "gzip")):
+    """'br', 'gzip' or None for an Accept-Encoding header (q=0 means refused)."""
+    offered = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name] = q
+    if brotli is not None and "br" in available and offered.get("br", 0) > 0:
+        return "br"
+    if "gzip" in available and offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding, quality=None):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY if quality is None else quality)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if quality is None else quality, mtime=0)
+
+
+def add_vary(headers):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message  # held back until the first body chunk decides
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            if (message.get("more_body", False)
+                    or "content-encoding" in headers
+                    or content_type not in COMPRESSIBLE_TYPES
+                    or start["status"] in (204, 206, 304)
+                    or len(body) < self.minimum_size):
+                passthrough = True
+                if content_type in COMPRESSIBLE_TYPES or start["status"] == 304:
+                    add_vary(headers)
+                await send(start)
+                return await send(message)
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            add_vary(headers)
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The bytes differ from the identity representation
+                headers["ETag"] = f"W/{etag}"
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,10 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 import os
 import sys
+import threading
+import time
 from dotenv import load_dotenv
 
 # 1. Determine where the EXE or Script is sitting
@@ -15,8 +19,181 @@ else:
 env_path = os.path.join(base_path, '.env')
 load_dotenv(env_path, override=True) 
 
-def get_connection():
+# 3. Connection pool
+# get_connection() hands out pooled connections; conn.close() gives them back
+# (rolled back if a transaction was left open), so the endpoints keep their
+# connect / try / finally close pattern. Settings (.env):
+#   DB_POOL=0              plain psycopg2.connect() per call, as before
+#   DB_POOL_MAX=<n>        connections per process (default: derived, see pool_size)
+#   DB_POOL_RESERVE=10     server connections left for migrations, psql, other clients
+#   DB_POOL_TIMEOUT=30     seconds to wait for a free connection
+#   WEB_CONCURRENCY=<n>    worker processes sharing the server (set by server.py)
+POOL_ENABLED = os.getenv("DB_POOL", "1").strip().lower() not in ("0", "false", "no", "off")
+POOL_CAP = 20              # more than this per process only queues inside Postgres
+LISTEN_CONNECTIONS = 3     # unpooled per process: ref_cache, events_feed and jobs listeners
+PING_AFTER_IDLE_SEC = 30
+
+
+def _database_url():
     url = os.getenv("DATABASE_URL")
     if not url:
         raise Exception(f"DATABASE_URL not found in {env_path}")
-    return psycopg2.connect(url)
\ No newline at end of file
+    return url
+
+
+def connect():
+    """A connection outside the pool, for LISTEN threads and other long-lived holders"""
+    return psycopg2.connect(_database_url())
+
+
+def pool_size(conn):
+    """
+    Connections this process may hold: DB_POOL_MAX if set, otherwise the server's
+    max_connections less reserved slots, split across WEB_CONCURRENCY workers.
+    """
+    if os.getenv("DB_POOL_MAX"):
+        return max(1, int(os.getenv("DB_POOL_MAX")))
+    cur = conn.cursor()
+    cur.execute("SELECT current_setting('max_connections')::int, "
+                "current_setting('superuser_reserved_connections')::int")
+    max_connections, superuser_reserved = cur.fetchone()
+    cur.close()
+    conn.rollback()
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    available = max_connections - superuser_reserved - int(os.getenv("DB_POOL_RESERVE", "10"))
+    return max(2, min(POOL_CAP, available // workers - LISTEN_CONNECTIONS))
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """close() returns the connection to its pool instead of closing it."""
+    pool = None
+    checked_out = False
+    released_at = 0.0
+
+    def close(self):
+        if self.pool is None or self.closed:
+            return super().close()
+        if self.checked_out:  # a second close() is a no-op, as it was before pooling
+            self.checked_out = False
+            self.pool.release(self)
+
+    def discard(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Blocking pool: waits up to `timeout` for a free connection instead of failing."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.maxconn = None
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = None
+        self.stats = {"created": 0, "reused": 0, "discarded": 0, "waits": 0, "timeouts": 0}
+
+    def _new(self):
+        conn = psycopg2.connect(self.url, connection_factory=PooledConnection)
+        conn.pool = self
+        self.stats["created"] += 1
+        return conn
+
+    def _size(self):
+        with self._lock:
+            if self._slots is None:
+                conn = self._new()
+                self.maxconn = pool_size(conn)
+                self._slots = threading.BoundedSemaphore(self.maxconn)
+                self._idle.append(conn)
+                print(f"DEBUG: db pool sized to {self.maxconn} connections "
+                      f"(WEB_CONCURRENCY={os.getenv('WEB_CONCURRENCY', '1')})")
+
+    def acquire(self):
+        if self._slots is None:
+            self._size()
+        if not self._slots.acquire(blocking=False):
+            self.stats["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                self.stats["timeouts"] += 1
+                raise psycopg2.pool.PoolError(
+                    f"No database connection free after {self.timeout}s ({self.maxconn} in use)")
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = self._new()
+                    conn.checked_out = True
+                    return conn
+                if self._usable(conn):
+                    self.stats["reused"] += 1
+                    conn.checked_out = True
+                    return conn
+                self._drop(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _usable(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.released_at < PING_AFTER_IDLE_SEC:
+            return True
+        try:  # idle for a while: the server may have dropped it
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _drop(self, conn):
+        self.stats["discarded"] += 1
+        try:
+            conn.discard()
+        except Exception:
+            pass
+
+    def release(self, conn):
+        try:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._drop(conn)
+                return
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+            conn.released_at = time.monotonic()
+            with self._lock:
+                self._idle.append(conn)
+        except psycopg2.Error:
+            self._drop(conn)
+        finally:
+            self._slots.release()
+
+    def state(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {"max": self.maxconn, "idle": idle, **self.stats}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool():
+    url = _database_url()
+    pool = _pools.get(url)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(url, ConnectionPool(url, float(os.getenv("DB_POOL_TIMEOUT", "30"))))
+    return pool
+
+
+def get_connection():
+    if not POOL_ENABLED:
+        return connect()
+    return get_pool().acquire()
@@ -1,9 +1,11 @@
 # enquiries.py - UPDATED VERSION
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from datetime import date, datetime
 from typing import Optional, List
 from db import get_connection
+import ref_cache
+from http_cache import not_modified
 
 router = APIRouter(prefix="/enquiries", tags=["2. Enquiries"])
 
@@ -51,19 +53,24 @@ class ClientOut(BaseModel):
 # ----------------------------
 @router.get("/clients/", response_model=List[ClientOut])
 def get_clients():
-    """Get all clients for dropdown selection"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
+    """Get all clients for dropdown selection (served from ref_cache)"""
+    def load():
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            # Query to get all clients (updated to include all fields)
+            cur.execute("""
+                SELECT client_id, name, contact_person, email, phone, address, created_at 
+                FROM clients 
+                ORDER BY name ASC
+            """)
+            return tuple(cur.fetchall())
+        finally:
+            cur.close()
+            conn.close()
+
     try:
-        # Query to get all clients (updated to include all fields)
-        cur.execute("""
-            SELECT client_id, name, contact_person, email, phone, address, created_at 
-            FROM clients 
-            ORDER BY name ASC
-        """)
-        
-        clients = cur.fetchall()
+        clients = ref_cache.clients.get_or_load("all", load)
         
         # Format response
         client_list = []
@@ -83,9 +90,6 @@ def get_clients():
     except Exception as e:
         print(f"Error fetching clients: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cur.close()
-        conn.close()
 
 
 @router.post("/clients/", response_model=ClientOut)
@@ -109,6 +113,7 @@ def create_client(client: ClientCreate):
         
         row = cur.fetchone()
         conn.commit()
+        ref_cache.clients.invalidate()
         
         return {
             "client_id": row[0],
@@ -307,11 +312,15 @@ def list_enquiries(limit: int = 100, offset: int = 0):
 
 
 @router.get("/recent", response_model=List[EnquiryOut])
-def recent_enquiries(limit: int = 10):
+def recent_enquiries(request: Request, response: Response, limit: int = 10):
     conn = get_connection()
     cur = conn.cursor()
 
     try:
+        cached = not_modified(request, response, cur, ("enquiries",))
+        if cached:
+            return cached
+
         cur.execute("""
             SELECT enquiry_id, enquiry_ref, client_id,
                    enquiry_date, project_name,
@@ -0,0 +1,306 @@
+# events_feed.py
+"""
+Server-sent events feed of lab activity.
+
+    GET /events/stream?cursor=<event_id>&kinds=sample,report
+
+Streams sample.created, sample.status, worksheet.generated, report.uploaded
+and report.status events (written by the triggers in migrations/0009) as
+text/event-stream, so dashboards can update pending/recent samples and the
+review queue without polling the list endpoints. job.status and job.progress
+(migrations/0010) follow background jobs (jobs.py).
+
+Every event carries its event_id as the SSE id. A client that reconnects with
+?cursor= (or the Last-Event-ID header EventSource sends by itself) first gets
+everything after that id, then the live feed. If the cursor is older than the
+retained log it gets a "reset" event and should reload its lists.
+
+Each process runs one LISTEN thread that reads new events in event_id order
+and fans them out to all connected subscribers. An id that is missing because
+its transaction has not committed yet is waited for, so a cursor never skips
+an event that shows up later.
+
+Settings (.env):
+    EVENTS_FEED=0                  disable the feed (503)
+    EVENTS_RETENTION_DAYS=7        prune older events
+"""
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from db import connect, get_connection
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+CHANNEL = "lims_events"
+KINDS = ("sample", "worksheet", "report", "job")
+FETCH_BATCH = 500
+IDLE_POLL_SEC = 5        # re-read even without a NOTIFY (keeps the connection checked)
+GAP_POLL_SEC = 0.2       # while waiting for an uncommitted event_id
+HEARTBEAT_SEC = 15
+SUBSCRIBER_QUEUE = 1000
+PRUNE_EVERY_SEC = 3600
+RETENTION_DAYS = int(os.getenv("EVENTS_RETENTION_DAYS", "7"))
+OVERFLOW = object()
+
+
+def _enabled():
+    return os.getenv("EVENTS_FEED", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _event(row):
+    event_id, kind, entity_id, payload, created_at = row
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    return {"event_id": event_id, "kind": kind, "entity_id": entity_id,
+            "created_at": created_at.isoformat(), **(payload or {})}
+
+
+def _format(event):
+    return f"id: {event['event_id']}\nevent: {event['kind']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+class _Subscriber:
+    def __init__(self, loop, kinds):
+        self.loop = loop
+        self.kinds = kinds
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+
+    def wants(self, event):
+        return not self.kinds or event["kind"].split(".")[0] in self.kinds
+
+    def offer(self, event):
+        # Runs on the event loop. A subscriber that cannot keep up is told to reset
+        # instead of holding back everyone else.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+
+class EventHub:
+    """One LISTEN thread per process, fanned out to any number of subscribers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self.delivered = None      # highest event_id handed to subscribers
+        self._gap = None           # (first missing id, snapshot xmax when it was seen)
+        self.stats = {"connected": False, "delivered_events": 0, "reconnects": 0, "last_error": None}
+
+    # ---- subscribers (event loop side) ----
+    def subscribe(self, loop, kinds):
+        self.start()
+        subscriber = _Subscriber(loop, kinds)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            # Everything after this id reaches the subscriber through its queue
+            return subscriber, self.delivered
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    # ---- listener thread ----
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, name="events-feed", daemon=True)
+                self._thread.start()
+        self._ready.wait(timeout=10)
+
+    def _publish(self, events):
+        with self._lock:
+            for event in events:
+                self.delivered = event["event_id"]
+                for subscriber in self._subscribers:
+                    if subscriber.wants(event):
+                        subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            self.stats["delivered_events"] += len(events)
+
+    def _read_new(self, cur):
+        """Publish the committed events after self.delivered, in order. True if a gap is pending."""
+        cur.execute("""
+            SELECT event_id, kind, entity_id, payload, created_at
+            FROM lims_events WHERE event_id > %s
+            ORDER BY event_id LIMIT %s
+        """, (self.delivered, FETCH_BATCH))
+        rows = cur.fetchall()
+        cur.execute("""
+            SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint,
+                   pg_snapshot_xmax(pg_current_snapshot())::text::bigint
+        """)
+        xmin, xmax = cur.fetchone()
+
+        ready, expected = [], self.delivered + 1
+        for row in rows:
+            if row[0] != expected:
+                # ids expected..row[0]-1 are missing. Their transactions started before
+                # now (they hold an xid < xmax); once all of those have ended, what is
+                # still missing was rolled back.
+                if self._gap is None or self._gap[0] != expected:
+                    self._gap = (expected, xmax)
+                if xmin < self._gap[1]:
+                    break
+                self._gap = None
+            ready.append(_event(row))
+            expected = row[0] + 1
+        else:
+            self._gap = None
+
+        if ready:
+            self._publish(ready)
+        return self._gap is not None or len(rows) == FETCH_BATCH
+
+    def _prune(self, cur):
+        cur.execute("DELETE FROM lims_events WHERE created_at < now() - make_interval(days => %s)",
+                    (RETENTION_DAYS,))
+
+    def _run(self):
+        delay, last_prune = 1, 0.0
+        while True:
+            conn = None
+            try:
+                conn = connect()  # held for good, so not from the pool
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANNEL}")
+                if self.delivered is None:
+                    cur.execute("SELECT COALESCE(MAX(event_id), 0) FROM lims_events")
+                    self.delivered = cur.fetchone()[0]
+                self.stats.update(connected=True, last_error=None)
+                self._ready.set()
+                delay = 1
+                pending = True  # catch up on anything sent while disconnected
+                while True:
+                    if pending:
+                        pending = self._read_new(cur)
+                    if time.monotonic() - last_prune > PRUNE_EVERY_SEC:
+                        self._prune(cur)
+                        last_prune = time.monotonic()
+                    timeout = GAP_POLL_SEC if pending else IDLE_POLL_SEC
+                    select.select([conn], [], [], timeout)
+                    conn.poll()
+                    conn.notifies.clear()
+                    pending = True
+            except Exception as e:
+                self.stats.update(connected=False, last_error=str(e))
+                print(f"WARNING: events feed lost its connection ({e}), retrying in {delay}s")
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._ready.set()
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+            self.stats["reconnects"] += 1
+
+
+hub = EventHub()
+
+
+def _backlog(after, upto, kinds):
+    """Events in (after, upto] for a resuming client, or None if `after` was already pruned."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MIN(event_id) FROM lims_events")
+        oldest = cur.fetchone()[0]
+        if oldest is not None and after < oldest - 1:
+            return None
+        cur.execute("""
+            SELECT event_id, kind, entity_id, payload, created_at
+            FROM lims_events
+            WHERE event_id > %s AND event_id <= %s
+              AND (%s::text[] IS NULL OR split_part(kind, '.', 1) = ANY(%s::text[]))
+            ORDER BY event_id
+        """, (after, upto, kinds, kinds))
+        return [_event(row) for row in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+@router.get("/stream")
+async def stream_events(request: Request, cursor: Optional[int] = None, kinds: Optional[str] = None):
+    """
+    Live sample / worksheet / report / job events as server-sent events.
+    cursor (or Last-Event-ID): resume after this event_id; omitted = live events only.
+    kinds: comma separated subset of sample, worksheet, report, job.
+    """
+    if not _enabled():
+        raise HTTPException(503, "Events feed is disabled (EVENTS_FEED=0)")
+
+    kind_filter = None
+    if kinds:
+        kind_filter = [k.strip() for k in kinds.split(",") if k.strip()]
+        unknown = [k for k in kind_filter if k not in KINDS]
+        if unknown:
+            raise HTTPException(400, f"Unknown event kind(s): {', '.join(unknown)}. Use {', '.join(KINDS)}")
+
+    last_event_id = request.headers.get("last-event-id")
+    if cursor is None and last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+
+    subscriber, upto = await run_in_threadpool(hub.subscribe, asyncio.get_running_loop(), kind_filter)
+    if upto is None:
+        hub.unsubscribe(subscriber)
+        raise HTTPException(503, f"Events feed unavailable: {hub.stats['last_error']}")
+
+    async def body():
+        try:
+            yield f"retry: 3000\n: connected, live after event {upto}\n\n"
+            last = upto
+            if cursor is not None and cursor < upto:
+                backlog = await run_in_threadpool(_backlog, cursor, upto, kind_filter)
+                if backlog is None:
+                    yield f"event: reset\ndata: {json.dumps({'reason': 'cursor expired', 'cursor': upto})}\n\n"
+                else:
+                    for event in backlog:
+                        yield _format(event)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if event is OVERFLOW:
+                    yield f"event: reset\ndata: {json.dumps({'reason': 'subscriber too slow', 'cursor': last})}\n\n"
+                    break
+                if event["event_id"] <= last:
+                    continue
+                last = event["event_id"]
+                yield _format(event)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/status")
+def events_status():
+    """Listener state and number of connected subscribers of this process"""
+    return {**hub.stats, "delivered_up_to": hub.delivered, "subscribers": hub.subscriber_count(),
+            "enabled": _enabled()}
@@ -0,0 +1,78 @@
+# fast_json.py
+"""
+Fast JSON responses for the large list endpoints.
+
+A list endpoint that returns plain dicts normally goes through FastAPI's
+response_model validation, jsonable_encoder and json.dumps - for a few
+thousand rows that is most of the request time. These endpoints build their
+rows themselves from database values, so they can skip all three:
+
+    return fast_response(rows)                    # rows exactly as built
+    return fast_response(invoices, InvoiceOut)    # keep only the model's top-level fields
+
+Returning a Response bypasses response_model (it still documents the shape in
+/docs), so use this only for rows the endpoint builds itself. Decimals become
+int/float exactly as jsonable_encoder does; date/datetime are written natively
+as ISO 8601. orjson is used when installed, otherwise json.dumps with the same
+conversions. FAST_JSON=0 in .env returns the content unchanged, i.e. back
+through FastAPI's normal validated path.
+"""
+import json
+import os
+from decimal import Decimal
+from datetime import date, datetime, time
+
+from fastapi.responses import JSONResponse
+
+import db  # noqa: F401  - loads .env before the settings below are read
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+ENABLED = os.getenv("FAST_JSON", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        # Same rule as fastapi.encoders.decimal_encoder
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; no validation, no jsonable_encoder pass."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content, model=None, **kwargs):
+    """
+    Serialise trusted rows directly. With a pydantic model, each row (or the
+    single dict) is cut down to the model's top-level fields, as response_model
+    would, but nothing is validated or converted.
+    """
+    if not ENABLED:
+        return content
+    if model is not None:
+        fields = tuple(model.model_fields)
+        if isinstance(content, dict):
+            content = {name: content.get(name) for name in fields}
+        else:
+            content = [{name: row.get(name) for name in fields} for row in content]
+    return FastJSONResponse(content, **kwargs)
@@ -0,0 +1,135 @@
+# http_cache.py
+"""
+HTTP conditional requests for the polled list endpoints.
+
+The ETag is derived from the change counters (migrations/0007, 0008) of the
+tables an endpoint reads, plus its path and query string; Last-Modified is the
+latest change among them. When the browser's If-None-Match (or
+If-Modified-Since) still matches, the endpoint answers 304 after one small
+indexed lookup instead of running its query and serialising the JSON.
+
+    @router.get("/recent")
+    def recent_enquiries(request: Request, response: Response, limit: int = 10):
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cached = not_modified(request, response, cur, ("enquiries",))
+            if cached:
+                return cached
+            ...
+
+Responses carry Cache-Control: no-cache, so the browser keeps them but always
+revalidates - fetch() then turns a 304 back into the stored 200 by itself.
+
+Writes append to table_changes; start_compactor() (from the lifespan) folds
+that log into table_versions every TABLE_CHANGES_COMPACT_SEC seconds (default 60).
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from db import get_connection
+
+
+def version_token(cur, tables):
+    """(token, last changed_at) for the given tables."""
+    # One statement, so a concurrent compact_table_changes() is seen entirely or not at all
+    cur.execute("""
+        SELECT v.table_name,
+               v.version + COUNT(c.change_id),
+               GREATEST(v.changed_at, MAX(c.changed_at))
+        FROM table_versions v
+        LEFT JOIN table_changes c ON c.table_name = v.table_name
+        WHERE v.table_name = ANY(%s)
+        GROUP BY v.table_name, v.version, v.changed_at
+        ORDER BY v.table_name
+    """, (list(tables),))
+    rows = cur.fetchall()
+    token = ",".join(f"{name}:{version}" for name, version, _ in rows)
+    last_modified = max((changed_at for _, _, changed_at in rows), default=None)
+    return token, last_modified
+
+
+def not_modified(request: Request, response: Response, cur, tables, key: str = ""):
+    """
+    Set ETag / Last-Modified on response; return a 304 Response if the client's
+    copy is still current, else None (and the endpoint builds its body as usual).
+    key names what else the body depends on (e.g. a normalised filter), on top
+    of the path and query string.
+    """
+    token, last_modified = version_token(cur, tables)
+    digest = hashlib.sha1(f"{request.url.path}?{request.url.query}|{key}|{token}".encode("utf-8")).hexdigest()[:20]
+    # Weak: the same JSON may go out compressed or not
+    etag = f'W/"{digest}"'
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in candidates or etag in candidates or etag[2:] in candidates:
+            return Response(status_code=304, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is not None and last_modified.replace(microsecond=0) <= since:
+            return Response(status_code=304, headers=headers)
+    return None
+
+
+VALIDATOR_HEADERS = ("etag", "last-modified", "cache-control")
+
+
+def with_validators(result, response: Response):
+    """
+    Copy the headers not_modified() set on response onto a Response the
+    endpoint returns itself (fast_response): FastAPI only merges response
+    into bodies it renders.
+    """
+    if isinstance(result, Response):
+        result.headers.update({k: v for k, v in response.headers.items() if k in VALIDATOR_HEADERS})
+    return result
+
+
+def _compact_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            conn = get_connection()
+        except Exception as e:
+            print(f"ERROR: table_changes compaction could not connect: {e}")
+            continue
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT compact_table_changes()")
+            conn.commit()
+            cur.close()
+        except Exception as e:
+            conn.rollback()
+            print(f"ERROR: table_changes compaction failed: {e}")
+        finally:
+            conn.close()
+
+
+def start_compactor():
+    """Fold table_changes into table_versions on a daemon thread (TABLE_CHANGES_COMPACT_SEC=0 disables)."""
+    interval = float(os.getenv("TABLE_CHANGES_COMPACT_SEC", "60"))
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=_compact_periodically, args=(interval,), name="table-changes-compact",
+                              daemon=True)
+    thread.start()
+    return thread
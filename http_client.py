@@ -0,0 +1,203 @@
+# http_client.py
+"""
+Shared outbound HTTP client (Supabase storage).
+
+Template downloads used bare requests.get/head: a new connection (TLS
+handshake included) per call, and no timeout at all in some places, so a
+storage hiccup held threadpool workers for minutes. request()/get() go through
+one requests.Session with a keep-alive connection pool and add:
+
+    - a deadline per call, retries included; each attempt's read timeout is
+      what is left of it
+    - bounded retries on connection errors, timeouts, 429 and 5xx gateway /
+      server errors, with full-jitter exponential backoff
+    - a circuit breaker per host: after HTTP_BREAKER_FAILURES consecutive
+      failures calls fail at once with CircuitOpenError (a requests
+      ConnectionError, so existing except clauses catch it) for
+      HTTP_BREAKER_RESET_SEC, then a single trial call decides whether to
+      close it again. template_cache serves its last good copy meanwhile.
+    - per-host metrics (calls, retries, failures, short circuits, latency
+      percentiles), served by GET /api/outbound-stats
+
+Non-retryable answers (404 and the like) are returned, not raised, so the
+caller keeps deciding what a status means.
+
+This module imports requests, so it is itself imported on first use
+(startup_report.py).
+
+Settings (.env):
+    HTTP_DEADLINE_SEC=15          default total time for one call
+    HTTP_CONNECT_TIMEOUT_SEC=3
+    HTTP_RETRIES=2                extra attempts after the first
+    HTTP_POOL_SIZE=20             keep-alive connections per host
+    HTTP_BREAKER_FAILURES=5
+    HTTP_BREAKER_RESET_SEC=30
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEADLINE_SEC = float(os.getenv("HTTP_DEADLINE_SEC", "15"))
+CONNECT_TIMEOUT_SEC = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", "3"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SEC = float(os.getenv("HTTP_BREAKER_RESET_SEC", "30"))
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+BACKOFF_BASE_SEC = 0.2
+BACKOFF_CAP_SEC = 2.0
+LATENCY_SAMPLES = 1000
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without a network call while a host's breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET_SEC):
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self, host):
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_after:
+                    raise CircuitOpenError(f"circuit open for {host} after {self.failures} failures")
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open":
+                if self._trial_running:
+                    raise CircuitOpenError(f"circuit half-open for {host}, trial call in progress")
+                self._trial_running = True
+
+    def record(self, ok):
+        with self._lock:
+            self._trial_running = False
+            if ok:
+                self.state, self.failures = "closed", 0
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    print(f"WARNING: outbound circuit opened after {self.failures} failures")
+                self.state, self.opened_at = "open", time.monotonic()
+
+
+class _Host:
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.calls = self.attempts = self.retries = self.failures = self.short_circuited = 0
+        self.latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+
+
+_hosts = {}
+_lock = threading.Lock()
+_session = None
+
+
+def session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+def _host(url):
+    name = urlsplit(url).netloc
+    host = _hosts.get(name)
+    if host is None:
+        with _lock:
+            host = _hosts.setdefault(name, _Host())
+    return name, host
+
+
+def _backoff(attempt, remaining):
+    return min(remaining, random.uniform(0, min(BACKOFF_CAP_SEC, BACKOFF_BASE_SEC * 2 ** attempt)))
+
+
+def request(method, url, deadline=None, retries=None, **kwargs):
+    """
+    Send a request within `deadline` seconds (default HTTP_DEADLINE_SEC), retrying
+    transient failures. Returns the response; raises the last requests exception
+    (or CircuitOpenError) when no attempt got a usable answer.
+    """
+    deadline = DEADLINE_SEC if deadline is None else deadline
+    retries = RETRIES if retries is None else retries
+    name, host = _host(url)
+    host.calls += 1
+    end = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        try:
+            host.breaker.before_call(name)
+        except CircuitOpenError:
+            host.short_circuited += 1
+            raise
+        remaining = end - time.monotonic()
+        started = time.monotonic()
+        host.attempts += 1
+        try:
+            response = session().request(method, url, timeout=(min(CONNECT_TIMEOUT_SEC, remaining), remaining),
+                                         **kwargs)
+            error = None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response, error = None, e
+        host.latencies_ms.append((time.monotonic() - started) * 1000)
+
+        transient = error is not None or response.status_code in RETRY_STATUSES
+        host.breaker.record(not transient)
+        if not transient:
+            return response
+
+        remaining = end - time.monotonic()
+        if attempt >= retries or remaining <= 0.05:
+            host.failures += 1
+            if error is not None:
+                raise error
+            return response
+        attempt += 1
+        host.retries += 1
+        time.sleep(_backoff(attempt, remaining))
+
+
+def get(url, deadline=None, **kwargs):
+    return request("GET", url, deadline=deadline, **kwargs)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 1)
+
+
+def stats():
+    result = {}
+    for name, host in list(_hosts.items()):
+        latencies = list(host.latencies_ms)
+        result[name] = {
+            "calls": host.calls, "attempts": host.attempts, "retries": host.retries,
+            "failures": host.failures, "short_circuited": host.short_circuited,
+            "breaker": host.breaker.state,
+            "latency_ms": {"p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                           "p99": _percentile(latencies, 99), "samples": len(latencies)},
+        }
+    return result
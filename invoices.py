@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List, Literal
 from datetime import date, datetime
@@ -7,15 +7,16 @@ from decimal import Decimal
 from fastapi.responses import HTMLResponse
 import traceback
 from utils import resource_path  # ADD THIS LINE
-import requests
+from storage import template_url
+import ref_cache
+import template_cache
+import render_flight
+from http_cache import not_modified
+from fast_json import fast_response
 import tempfile
-
-
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+# openpyxl and requests are imported inside the functions that use them (startup_report.py)
 
 from fastapi.responses import FileResponse
-import openpyxl
 from datetime import datetime
 import os
 
@@ -227,17 +228,6 @@ def generate_invoice_no(cur, invoice_type: str) -> str:
     invoice_no = f"{next_number}/{year_short}"
     print(f"DEBUG: Generated non-PROFORMA invoice_no: {invoice_no}")
     return invoice_no
-def ensure_delivery_note_reports_table(cur):
-    """Ensure the delivery_note_reports junction table exists"""
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS delivery_note_reports (
-            id SERIAL PRIMARY KEY,
-            delivery_note_no VARCHAR(50) NOT NULL,
-            report_no VARCHAR(50) NOT NULL,  -- Changed from VARCHAR(100) to VARCHAR(50)
-            UNIQUE(delivery_note_no, report_no)
-        )
-    """)
-    # Note: removed included_at column since your SQL table doesn't have it
 
 
 # ----------------------------
@@ -337,7 +327,12 @@ def get_invoice_complete(invoice_id: int, cur):
                i.subtotal, i.vat, i.total, i.amount_in_words, i.services_description, 
                i.remarks, i.payment_status, i.paid_date,
                p.project_no, p.project_name, p.location,
-               c.client_id, c.name, c.contact_person, c.email, c.address, c.phone
+               c.client_id, c.name, c.contact_person, c.email, c.address, c.phone,
+               i.linked_subtotal,
+               EXISTS (
+                   SELECT 1 FROM invoice_report_links irl
+                   WHERE irl.invoice_id = i.invoice_id AND irl.invoice_type = i.invoice_type
+               ) AS has_linked_reports
         FROM invoices i
         JOIN projects p ON i.project_id = p.project_id
         JOIN clients c ON p.client_id = c.client_id
@@ -361,7 +356,8 @@ def get_invoice_complete(invoice_id: int, cur):
             s.sample_no,
             s.status as sample_status,
             tr.request_no,
-            tr.test_request_id
+            tr.test_request_id,
+            ii.linked
         FROM invoice_items ii
         LEFT JOIN samples s ON ii.sample_id = s.sample_id
         LEFT JOIN test_requests tr ON ii.test_request_id = tr.test_request_id
@@ -376,73 +372,25 @@ def get_invoice_complete(invoice_id: int, cur):
     payment_method = header[4]  # NEW: Get payment_method
     
     # =====================================================
-    # NEW: For PROFORMA/TAX invoices, filter items by linked reports
+    # For PROFORMA/TAX invoices, keep only the items covered by linked reports.
+    # ii.linked and i.linked_subtotal are maintained by the database triggers
+    # (migrations/0005), so nothing is re-matched or re-summed here.
     # =====================================================
-    if invoice_type in ["PROFORMA", "TAX"]:
-        # Get reports linked to this invoice
-        cur.execute("""
-            SELECT report_no 
-            FROM invoice_report_links 
-            WHERE invoice_id = %s 
-            AND invoice_type = %s
-        """, (invoice_id, invoice_type))
-        
-        linked_reports = [row[0] for row in cur.fetchall()]
-        
-        if linked_reports:
-            # Get test types from linked reports
-            cur.execute("""
-                SELECT DISTINCT covers_test_type 
-                FROM reports 
-                WHERE report_no = ANY(%s)
-                AND status = 'APPROVED'
-            """, (linked_reports,))
-            
-            linked_test_types = [row[0] for row in cur.fetchall() if row[0]]
-            
-            print(f"DEBUG: Found {len(linked_test_types)} test types for invoice {invoice_id}")
-            print(f"DEBUG: Linked test types: {linked_test_types}")
-            
-            # Filter items to only include those with matching test types
-            filtered_items = []
-            for item in items_data:
-                item_id, description, test_standard, unit_rate, quantity, amount, sample_id, sample_no, sample_status, request_no, test_request_id = item
-                
-                # Check if this item's description matches any linked test type
-                item_included = False
-                for test_type in linked_test_types:
-                    if test_type and description and (
-                        test_type.lower() == description.lower() or 
-                        test_type.lower() in description.lower() or
-                        description.lower() in test_type.lower()
-                    ):
-                        item_included = True
-                        break
-                
-                if item_included:
-                    filtered_items.append(item)
-                    print(f"DEBUG: Keeping item: {description}")
-                else:
-                    print(f"DEBUG: Filtering out item: {description}")
-            
-            # Use filtered items
-            items_data = filtered_items
+    if invoice_type in ["PROFORMA", "TAX"] and header[28]:
+        items_data = [item for item in items_data if item[11]]
+        print(f"DEBUG: {len(items_data)} item(s) covered by linked reports for invoice {invoice_id}")
     
     # Build items list
     items_list = []
-    filtered_subtotal = 0.0
     
     for item in items_data:
-        item_amount = float(item[5]) if isinstance(item[5], Decimal) else item[5]
-        filtered_subtotal += item_amount
-        
         items_list.append({
             "item_id": item[0],
             "description": item[1],
             "test_standard": item[2],
             "unit_rate": float(item[3]) if isinstance(item[3], Decimal) else item[3],
             "quantity": item[4],
-            "amount": item_amount,
+            "amount": float(item[5]) if isinstance(item[5], Decimal) else item[5],
             "sample_id": item[6],
             "sample_no": item[7],
             "sample_status": item[8],
@@ -451,35 +399,18 @@ def get_invoice_complete(invoice_id: int, cur):
         })
     
     # =====================================================
-    # NEW: Calculate CORRECT totals for filtered items
+    # Totals: the billed (linked) subtotal for PROFORMA/TAX, the stored ones otherwise
     # =====================================================
-    if invoice_type in ["PROFORMA", "TAX"] and items_list:
-        # Recalculate based on filtered items
-        filtered_vat = filtered_subtotal * 0.05
-        filtered_total = filtered_subtotal + filtered_vat
-        filtered_amount_words = number_to_words(filtered_total)
-        
-        # Check if different from original
-        original_subtotal = float(header[10]) if isinstance(header[10], Decimal) else header[10]
-        
-        if abs(original_subtotal - filtered_subtotal) > 0.01:
-            print(f"DEBUG: Using FILTERED totals for {invoice_type} invoice {invoice_id}")
-            print(f"  Original: Subtotal={original_subtotal}")
-            print(f"  Filtered: Subtotal={filtered_subtotal}, Total={filtered_total}")
-            
-            subtotal = filtered_subtotal
-            vat = filtered_vat
-            total = filtered_total
-            amount_words = filtered_amount_words
-        else:
-            # Use original totals
-            subtotal = original_subtotal
-            vat = float(header[11]) if isinstance(header[11], Decimal) else header[11]
-            total = float(header[12]) if isinstance(header[12], Decimal) else header[12]
-            amount_words = header[13]
+    original_subtotal = float(header[10]) if isinstance(header[10], Decimal) else header[10]
+    linked_subtotal = float(header[27]) if isinstance(header[27], Decimal) else header[27]
+    
+    if invoice_type in ["PROFORMA", "TAX"] and header[28] and items_list and abs(original_subtotal - linked_subtotal) > 0.01:
+        subtotal = linked_subtotal
+        vat = linked_subtotal * 0.05
+        total = linked_subtotal + vat
+        amount_words = number_to_words(total)
     else:
-        # For other invoice types, use original totals
-        subtotal = float(header[10]) if isinstance(header[10], Decimal) else header[10]
+        subtotal = original_subtotal
         vat = float(header[11]) if isinstance(header[11], Decimal) else header[11]
         total = float(header[12]) if isinstance(header[12], Decimal) else header[12]
         amount_words = header[13]
@@ -727,16 +658,7 @@ def create_invoice_with_payment_method(payload: InvoiceCreate):
         # ---------------------------------------------------
         # 1. Get project details with client info
         # ---------------------------------------------------
-        cur.execute("""
-            SELECT p.project_id, p.project_no, p.project_name, p.location, p.lpo_no, p.lpo_date,
-                   c.client_id, c.name, c.contact_person, c.email, c.address, c.phone,
-                   q.quotation_no
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            JOIN quotations q ON p.quotation_id = q.quotation_id
-            WHERE p.project_id = %s
-        """, (payload.project_id,))
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, payload.project_id, require_quotation=True)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
 
@@ -780,7 +702,8 @@ def create_invoice_with_payment_method(payload: InvoiceCreate):
         invoice_no = generate_invoice_no(cur, payload.invoice_type)
 
         # ---------------------------------------------------
-        # 4. Calculate totals
+        # 4. Calculate totals (for the amount in words only: the stored
+        #    subtotal/vat/total are summed from invoice_items by the triggers)
         # ---------------------------------------------------
         subtotal = 0.0
         for item in final_items:
@@ -811,10 +734,10 @@ def create_invoice_with_payment_method(payload: InvoiceCreate):
             INSERT INTO invoices (
                 invoice_no, project_id, invoice_type, payment_method, invoice_date,
                 client_reference, lpo_reference, lpo_date, payment_terms,
-                subtotal, vat, total, amount_in_words, services_description, remarks,
+                amount_in_words, services_description, remarks,
                 payment_status
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING invoice_id
         """, (
             invoice_no,
@@ -826,9 +749,6 @@ def create_invoice_with_payment_method(payload: InvoiceCreate):
             lpo_reference,
             lpo_date,
             payment_terms,
-            subtotal,
-            vat,
-            total,
             amount_words,
             payload.services_description or f"Testing services for {project_data[2]}",
             payload.remarks,
@@ -899,7 +819,8 @@ def list_invoices(limit: int = 100, offset: int = 0):
         for inv_id in invoice_ids:
             invoices.append(get_invoice_complete(inv_id, cur))
         
-        return invoices
+        # Rows are built by get_invoice_complete; skip re-validating them against InvoiceOut
+        return fast_response(invoices, InvoiceOut)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1054,6 +975,166 @@ def generate_excel_invoice(invoice_id: int):
     Generate Excel invoice using the template, insert rows dynamically,
     fill test items, report numbers, amounts, totals and save on server.
     """
+    content, download_filename = render_invoice_excel(invoice_id)
+
+    import urllib.parse
+    encoded_filename = urllib.parse.quote(download_filename)
+
+    return Response(
+        content=content,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}; filename=\"{download_filename}\""
+        }
+    )
+
+
+def render_invoice_excel(invoice_id: int):
+    """
+    (xlsx bytes, download filename) of an invoice. Concurrent calls for the
+    same invoice data share one render (render_flight.py).
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        invoice = get_invoice_complete(invoice_id, cur)
+        apply_excel_billing(invoice_id, invoice, cur)
+        all_reports = get_invoice_reports(invoice_id, invoice, cur)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Error generating invoice:", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        cur.close()
+        conn.close()
+
+    key = ("invoice", invoice_id, render_flight.data_version(invoice, all_reports))
+    return render_flight.renders.run(key, lambda: _render_excel_invoice(invoice_id, invoice, all_reports))
+
+
+def apply_excel_billing(invoice_id: int, invoice: dict, cur):
+    """
+    Items and totals printed on a PROFORMA/TAX Excel invoice with linked
+    reports: for each linked report, the first item whose description is
+    exactly the report's covers_test_type - one item per report - with the
+    totals re-summed from those items. This is stricter than the loose
+    match behind ii.linked used by the JSON endpoints, and is what the
+    printed invoices have always billed. CASH/CREDIT invoices and invoices
+    without linked reports are left as get_invoice_complete returned them.
+    """
+    invoice_type = invoice.get("invoice_type", "CASH")
+    if invoice_type not in ["PROFORMA", "TAX"]:
+        return
+
+    cur.execute("""
+        SELECT irl.report_no, r.report_no IS NOT NULL, r.covers_test_type
+        FROM invoice_report_links irl
+        LEFT JOIN LATERAL (
+            SELECT report_no, covers_test_type FROM reports WHERE report_no = irl.report_no LIMIT 1
+        ) r ON TRUE
+        WHERE irl.invoice_id = %s
+        AND irl.invoice_type = %s
+    """, (invoice_id, invoice_type))
+    linked = cur.fetchall()
+    if not linked:
+        print("DEBUG: No linked reports found, using all items")
+        return
+
+    original_items = invoice.get("items", [])
+    filtered_items = []
+    for report_no, report_exists, test_type in linked:
+        if not report_exists:
+            continue
+        for item in original_items:
+            if item.get("description") == test_type:
+                filtered_items.append(item)
+                break  # Only add one item per report
+
+    subtotal = sum(item.get("amount", 0) for item in filtered_items)
+    vat = subtotal * 0.05  # 5% VAT
+    invoice["items"] = filtered_items
+    invoice["subtotal"] = subtotal
+    invoice["vat"] = vat
+    invoice["total"] = subtotal + vat
+    invoice["amount_in_words"] = number_to_words(subtotal + vat)
+    print(f"DEBUG: Excel {invoice_type} invoice {invoice_id}: {len(filtered_items)} of "
+          f"{len(original_items)} items for {len(linked)} linked reports, subtotal {subtotal}")
+
+
+def get_invoice_reports(invoice_id: int, invoice: dict, cur):
+    """
+    Approved reports listed on the invoice: the ones linked to it
+    (PROFORMA/TAX with selected reports), else all of the project's.
+    """
+    print("=== GETTING REPORTS GROUPED BY TEST TYPE ===")
+
+    # FIRST: Get all reports that are linked to this specific invoice
+    cur.execute("""
+        SELECT report_no 
+        FROM invoice_report_links 
+        WHERE invoice_id = %s
+    """, (invoice_id,))
+
+    linked_report_nos = [row[0] for row in cur.fetchall()]
+    print(f"DEBUG: Invoice {invoice_id} has {len(linked_report_nos)} linked reports: {linked_report_nos}")
+
+    if linked_report_nos:
+        # This invoice has linked reports (PROFORMA/TAX invoice with selected reports)
+        # ONLY fetch the linked reports
+        cur.execute("""
+            SELECT 
+                r.report_no,
+                r.created_at,
+                r.covers_test_type,
+                r.sample_id,
+                COUNT(DISTINCT s.sample_id) as sample_count
+            FROM reports r
+            LEFT JOIN samples s ON (
+                r.sample_id = s.sample_id 
+                OR 
+                (r.covers_samples IS NOT NULL AND s.sample_id::text = ANY(r.covers_samples))
+            )
+            LEFT JOIN test_requests tr ON s.request_id = tr.test_request_id
+            WHERE r.report_no = ANY(%s)
+            AND r.status = 'APPROVED'
+            GROUP BY r.report_no, r.created_at, r.covers_test_type, r.sample_id
+            ORDER BY r.report_no
+        """, (linked_report_nos,))
+    else:
+        # This invoice has no linked reports (regular CASH/CREDIT invoice)
+        # Get all approved reports for the project
+        cur.execute("""
+            SELECT 
+                r.report_no,
+                r.created_at,
+                r.covers_test_type,
+                r.sample_id,
+                COUNT(DISTINCT s.sample_id) as sample_count
+            FROM reports r
+            LEFT JOIN samples s ON (
+                r.sample_id = s.sample_id 
+                OR 
+                (r.covers_samples IS NOT NULL AND s.sample_id::text = ANY(r.covers_samples))
+            )
+            LEFT JOIN test_requests tr ON s.request_id = tr.test_request_id
+            WHERE tr.project_id = %s
+            AND r.status = 'APPROVED'
+            GROUP BY r.report_no, r.created_at, r.covers_test_type, r.sample_id
+            ORDER BY r.report_no
+        """, (invoice.get("project_id"),))
+
+    return cur.fetchall()
+
+
+def _render_excel_invoice(invoice_id: int, invoice: dict, all_reports):
+    """
+    Fill the invoice template and save generated_invoices/{invoice_no}.xlsx.
+    Returns (file bytes, download filename).
+    """
+    import openpyxl
 
     # Path to converted template (.xlsx)
     template_path = download_template_from_supabase("invoice")
@@ -1061,95 +1142,16 @@ def generate_excel_invoice(invoice_id: int):
     if not os.path.exists(template_path):
         raise HTTPException(status_code=404, detail="Invoice template not found. Convert invoice.xls → .xlsx")
 
-    conn = get_connection()
-    cur = conn.cursor()
-
     try:
         # =====================================================
-        # 1. Load full invoice from DB
+        # 1. Invoice and its reports (loaded by render_invoice_excel)
         # =====================================================
-        invoice = get_invoice_complete(invoice_id, cur)
         project_details = invoice.get("project_details", {})
         
-        # Get invoice type to determine if we should filter by reports
         invoice_type = invoice.get("invoice_type", "CASH")
         
-        # =====================================================
-        # NEW: Filter items for PROFORMA/TAX invoices
-        # =====================================================
-        if invoice_type in ["PROFORMA", "TAX"]:
-            print(f"DEBUG: Filtering items for {invoice_type} invoice {invoice_id}")
-            
-            # Get reports linked to this invoice
-            cur.execute("""
-                SELECT report_no 
-                FROM invoice_report_links 
-                WHERE invoice_id = %s 
-                AND invoice_type = %s
-            """, (invoice_id, invoice_type))
-            
-            linked_reports = [row[0] for row in cur.fetchall()]
-            print(f"DEBUG: Found {len(linked_reports)} linked reports: {linked_reports}")
-            
-            # Filter invoice items to only include those with linked reports
-            original_items = invoice.get("items", [])
-            filtered_items = []
-            
-            if linked_reports:
-                # For each report, find matching invoice items
-                for report_no in linked_reports:
-                    # Get test type from report
-                    cur.execute("""
-                        SELECT covers_test_type 
-                        FROM reports 
-                        WHERE report_no = %s
-                    """, (report_no,))
-                    
-                    report_data = cur.fetchone()
-                    if report_data:
-                        test_type = report_data[0]
-                        print(f"DEBUG: Report {report_no} covers test type: '{test_type}'")
-                        
-                        # Find invoice items that match this test type
-                        for item in original_items:
-                            if item.get("description") == test_type:
-                                filtered_items.append(item)
-                                print(f"DEBUG: Added item '{item.get('description')}' for report {report_no}")
-                                break  # Only add one item per report
-            else:
-                # No linked reports, use all items
-                filtered_items = original_items
-                print("DEBUG: No linked reports found, using all items")
-            
-            # Update invoice items with filtered list
-            invoice["items"] = filtered_items
-            print(f"DEBUG: Filtered from {len(original_items)} to {len(filtered_items)} items")
-            
-            # =====================================================
-            # FIX: RECALCULATE TOTALS based on filtered items only
-            # =====================================================
-            # Calculate new totals from filtered items
-            filtered_subtotal = sum(item.get("amount", 0) for item in filtered_items)
-            filtered_vat = filtered_subtotal * 0.05  # 5% VAT
-            filtered_total = filtered_subtotal + filtered_vat
-            filtered_amount_words = number_to_words(filtered_total)
-            
-            # Update invoice totals with filtered amounts
-            invoice["subtotal"] = filtered_subtotal
-            invoice["vat"] = filtered_vat
-            invoice["total"] = filtered_total
-            invoice["amount_in_words"] = filtered_amount_words
-            
-            print(f"DEBUG: Recalculated totals for filtered items:")
-            print(f"  Subtotal: {filtered_subtotal} (was {invoice.get('subtotal', 'original')})")
-            print(f"  VAT: {filtered_vat} (was {invoice.get('vat', 'original')})")
-            print(f"  Total: {filtered_total} (was {invoice.get('total', 'original')})")
-            
-        else:
-            # For CASH/CREDIT invoices, use all items and original totals
-            invoice["items"] = invoice.get("items", [])
-            print("DEBUG: Using original totals for CASH/CREDIT invoice")
-        
+        # PROFORMA/TAX items and totals were narrowed to one item per linked
+        # report by apply_excel_billing (render_invoice_excel)
         items = invoice.get("items", [])
         
         # DEBUG: Print what data we're getting
@@ -1277,64 +1279,7 @@ def generate_excel_invoice(invoice_id: int):
         # =====================================================
         # 6. CORRECTED: Get reports by TEST TYPE not just by sample
         # =====================================================
-        print("=== GETTING REPORTS GROUPED BY TEST TYPE ===")
-
-        # FIRST: Get all reports that are linked to this specific invoice
-        cur.execute("""
-            SELECT report_no 
-            FROM invoice_report_links 
-            WHERE invoice_id = %s
-        """, (invoice_id,))
-
-        linked_report_nos = [row[0] for row in cur.fetchall()]
-        print(f"DEBUG: Invoice {invoice_id} has {len(linked_report_nos)} linked reports: {linked_report_nos}")
-
-        if linked_report_nos:
-            # This invoice has linked reports (PROFORMA/TAX invoice with selected reports)
-            # ONLY fetch the linked reports
-            cur.execute("""
-                SELECT 
-                    r.report_no,
-                    r.created_at,
-                    r.covers_test_type,
-                    r.sample_id,
-                    COUNT(DISTINCT s.sample_id) as sample_count
-                FROM reports r
-                LEFT JOIN samples s ON (
-                    r.sample_id = s.sample_id 
-                    OR 
-                    (r.covers_samples IS NOT NULL AND s.sample_id::text = ANY(r.covers_samples))
-                )
-                LEFT JOIN test_requests tr ON s.request_id = tr.test_request_id
-                WHERE r.report_no = ANY(%s)
-                AND r.status = 'APPROVED'
-                GROUP BY r.report_no, r.created_at, r.covers_test_type, r.sample_id
-                ORDER BY r.report_no
-            """, (linked_report_nos,))
-        else:
-            # This invoice has no linked reports (regular CASH/CREDIT invoice)
-            # Get all approved reports for the project
-            cur.execute("""
-                SELECT 
-                    r.report_no,
-                    r.created_at,
-                    r.covers_test_type,
-                    r.sample_id,
-                    COUNT(DISTINCT s.sample_id) as sample_count
-                FROM reports r
-                LEFT JOIN samples s ON (
-                    r.sample_id = s.sample_id 
-                    OR 
-                    (r.covers_samples IS NOT NULL AND s.sample_id::text = ANY(r.covers_samples))
-                )
-                LEFT JOIN test_requests tr ON s.request_id = tr.test_request_id
-                WHERE tr.project_id = %s
-                AND r.status = 'APPROVED'
-                GROUP BY r.report_no, r.created_at, r.covers_test_type, r.sample_id
-                ORDER BY r.report_no
-            """, (invoice.get("project_id"),))
-
-        all_reports = cur.fetchall()
+        # all_reports: loaded by get_invoice_reports()
         
         print(f"Found {len(all_reports)} approved reports for project")
         
@@ -1619,32 +1564,17 @@ def generate_excel_invoice(invoice_id: int):
         # Save file
         output_path = os.path.join(output_dir, f"{invoice_no_hyphen}.xlsx")
 
-        wb.save(output_path)
+        content = render_flight.save_workbook(wb, output_path)
 
-        # =====================================================
-        # 14. Return File for Download
-        # =====================================================
-        import urllib.parse
-        encoded_filename = urllib.parse.quote(download_filename)
-        
-        return FileResponse(
-            output_path,
-            filename=download_filename,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}; filename=\"{download_filename}\""
-            }
-        )
+        return content, download_filename
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error generating invoice:", e)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
-
-    finally:
-        cur.close()
-        conn.close()
     """
     Generate Excel invoice using the template, insert rows dynamically,
     fill test items, report numbers, amounts, totals and save on server.
@@ -2215,7 +2145,7 @@ def generate_excel_invoice(invoice_id: int):
 # GET LATEST PROJECTS FOR INVOICE DROPDOWN - ENHANCED VERSION
 # ----------------------------
 @router.get("/projects/latest/")
-def get_latest_projects():
+def get_latest_projects(request: Request, response: Response):
     """
     Get the latest 10 projects with complete info for invoice creation
     Returns: Array of project objects with details
@@ -2224,6 +2154,10 @@ def get_latest_projects():
     cur = conn.cursor()
     
     try:
+        cached = not_modified(request, response, cur, ("projects", "clients", "quotations"))
+        if cached:
+            return cached
+
         # Enhanced query with more details
         cur.execute("""
             SELECT 
@@ -2341,22 +2275,12 @@ def get_reports_for_delivery_note(project_id: int):
     cur = conn.cursor()
     
     try:
-        # Ensure the junction table exists before querying
-        ensure_delivery_note_reports_table(cur)
-        
         # Get project details
-        cur.execute(""" 
-            SELECT p.project_no, p.project_name, c.name as client_name
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            WHERE p.project_id = %s
-        """, (project_id,))
-        
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, project_id)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_no, project_name, client_name = project_data
+        project_no, project_name, client_name = project_data.project_no, project_data.project_name, project_data.client_name
         
         print(f"DEBUG: Fetching reports for project {project_id} - {project_name}")
         
@@ -2480,24 +2404,17 @@ def generate_delivery_note_excel_template(payload: DeliveryNoteRequest):
     """
     Generate delivery note Excel file using the template for selected reports
     """
+    import openpyxl
     conn = get_connection()
     cur = conn.cursor()
     
     try:
         # Get project details
-        cur.execute("""
-            SELECT p.project_no, p.project_name, c.name as client_name,
-                   c.address, c.phone, c.email
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            WHERE p.project_id = %s
-        """, (payload.project_id,))
-        
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, payload.project_id)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_no, project_name, client_name, client_address, client_phone, client_email = project_data
+        project_no, client_name = project_data.project_no, project_data.client_name
         
         # Get selected reports or all if include_all_reports is True
         if payload.include_all_reports:
@@ -2613,15 +2530,12 @@ def generate_delivery_note_excel_template(payload: DeliveryNoteRequest):
         filename = f"DN-{delivery_note_no.replace('/', '-')}-{clean_project_no}.xlsx"
         filepath = os.path.join(output_dir, filename)
         
-        wb.save(filepath)
+        render_flight.save_workbook(wb, filepath)
         
         # =====================================================
         # 5. NEW: Track which reports were included in this delivery note
         # =====================================================
         try:
-            # First ensure the delivery_note_reports junction table exists
-            ensure_delivery_note_reports_table(cur)
-            
             # Insert records for each report included
             for report in reports_data:
                 report_no = report[1]  # report_no is at index 1
@@ -2631,19 +2545,6 @@ def generate_delivery_note_excel_template(payload: DeliveryNoteRequest):
                     ON CONFLICT (delivery_note_no, report_no) DO NOTHING
                 """, (delivery_note_no, report_no))
             
-            # Update delivery_notes table - FIXED to match existing schema
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS delivery_notes (
-                    delivery_note_id SERIAL PRIMARY KEY,
-                    delivery_note_no VARCHAR(50) NOT NULL UNIQUE,
-                    project_id INTEGER NOT NULL REFERENCES projects(project_id),
-                    generated_by INTEGER REFERENCES users(user_id),
-                    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total_reports INTEGER DEFAULT 0,
-                    file_path TEXT
-                )
-            """)
-            
             # Use existing user ID or default to NULL
             # In a real app, you would get this from the current user session
             user_id = None  # You might want to pass this from the frontend or use a default
@@ -2705,18 +2606,11 @@ def get_reports_for_invoice(project_id: int, invoice_type: str):
     
     try:
         # Get project details
-        cur.execute(""" 
-            SELECT p.project_no, p.project_name, c.name as client_name
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            WHERE p.project_id = %s
-        """, (project_id,))
-        
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, project_id)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_no, project_name, client_name = project_data
+        project_no, project_name, client_name = project_data.project_no, project_data.project_name, project_data.client_name
         
         print(f"DEBUG: Fetching reports for {invoice_type} invoice - project {project_id}")
         
@@ -2845,16 +2739,7 @@ def create_invoice_with_reports(payload: InvoiceCreate, selection: Optional[Invo
         # ---------------------------------------------------
         # 1. Get project details with client info
         # ---------------------------------------------------
-        cur.execute("""
-            SELECT p.project_id, p.project_no, p.project_name, p.location, p.lpo_no, p.lpo_date,
-                   c.client_id, c.name, c.contact_person, c.email, c.address, c.phone,
-                   q.quotation_no
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            JOIN quotations q ON p.quotation_id = q.quotation_id
-            WHERE p.project_id = %s
-        """, (payload.project_id,))
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, payload.project_id, require_quotation=True)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
 
@@ -2898,7 +2783,8 @@ def create_invoice_with_reports(payload: InvoiceCreate, selection: Optional[Invo
         invoice_no = generate_invoice_no(cur, payload.invoice_type)
 
         # ---------------------------------------------------
-        # 4. Calculate totals
+        # 4. Calculate totals (for the amount in words only: the stored
+        #    subtotal/vat/total are summed from invoice_items by the triggers)
         # ---------------------------------------------------
         subtotal = 0.0
         for item in final_items:
@@ -2924,9 +2810,9 @@ def create_invoice_with_reports(payload: InvoiceCreate, selection: Optional[Invo
             INSERT INTO invoices (
                 invoice_no, project_id, invoice_type, invoice_date,
                 client_reference, lpo_reference, lpo_date, payment_terms,
-                subtotal, vat, total, amount_in_words, services_description, remarks
+                amount_in_words, services_description, remarks
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING invoice_id
         """, (
             invoice_no,
@@ -2937,9 +2823,6 @@ def create_invoice_with_reports(payload: InvoiceCreate, selection: Optional[Invo
             lpo_reference,
             lpo_date,
             payment_terms,
-            subtotal,
-            vat,
-            total,
             amount_words,
             payload.services_description or f"Testing services for {project_data[2]}",
             payload.remarks
@@ -3164,18 +3047,11 @@ def get_reports_invoiced_status(project_id: int):
     
     try:
         # Get project details
-        cur.execute(""" 
-            SELECT p.project_no, p.project_name, c.name as client_name
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            WHERE p.project_id = %s
-        """, (project_id,))
-        
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, project_id)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_no, project_name, client_name = project_data
+        project_no, project_name, client_name = project_data.project_no, project_data.project_name, project_data.client_name
         
         # Get all approved reports with combined invoice/delivery status
         cur.execute("""
@@ -3261,6 +3137,8 @@ def generate_proforma_for_multiple_reports(payload: dict):
     """
     Generate Proforma Invoice for multiple selected reports
     """
+    import openpyxl
+    from openpyxl.styles import Font, Alignment
     conn = get_connection()
     cur = conn.cursor()
     
@@ -3275,17 +3153,7 @@ def generate_proforma_for_multiple_reports(payload: dict):
             raise HTTPException(status_code=400, detail="Project ID and at least one report are required")
         
         # Get project details
-        cur.execute("""
-            SELECT p.project_id, p.project_no, p.project_name, p.location, p.lpo_no, p.lpo_date,
-                   c.client_id, c.name, c.contact_person, c.email, c.address, c.phone,
-                   q.quotation_no
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            JOIN quotations q ON p.quotation_id = q.quotation_id
-            WHERE p.project_id = %s
-        """, (project_id,))
-        
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, project_id, require_quotation=True)
         if not project_data:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -3495,7 +3363,7 @@ def generate_proforma_for_multiple_reports(payload: dict):
         filename = f"Proforma-{invoice_date.strftime('%Y%m%d')}-{len(invoice_items)}reports.xlsx"
         filepath = os.path.join(output_dir, filename)
         
-        wb.save(filepath)
+        render_flight.save_workbook(wb, filepath)
         
         print(f"DEBUG: Proforma invoice saved to {filepath}")
         
@@ -3672,29 +3540,31 @@ def update_invoice_payment_status(invoice_id: int, status_update: dict):
         conn.close()
 
 
+TEMPLATE_URLS = {
+    "invoice": template_url("invoices/invoice.xlsx"),
+    "delivery_note": template_url("invoices/delivery_note.xlsx")
+}
+template_cache.register(*TEMPLATE_URLS.values())
+
+
 def download_template_from_supabase(template_type: str = "invoice"):
     """
     Download template from Supabase storage.
     template_type: "invoice" or "delivery_note"
     """
-    template_urls = {
-        "invoice": "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/invoices/invoice.xlsx",
-        "delivery_note": "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/invoices/delivery_note.xlsx"
-    }
-    
-    if template_type not in template_urls:
+    import requests
+    if template_type not in TEMPLATE_URLS:
         raise ValueError(f"Template type {template_type} not supported")
     
-    url = template_urls[template_type]
+    url = TEMPLATE_URLS[template_type]
     
     try:
-        # Download the file
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        # Download the file (cached per process, see template_cache.py)
+        content = template_cache.fetch(url)
         
         # Create a temporary file
         with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_file:
-            temp_file.write(response.content)
+            temp_file.write(content)
             temp_path = temp_file.name
         
         print(f"DEBUG: Downloaded {template_type} template from {url}")
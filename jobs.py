@@ -0,0 +1,490 @@
+# jobs.py
+"""
+Background job queue for long-running document and bulk operations.
+
+Proforma invoices for many reports, delivery notes, samples for a large test
+request and quotation revisions ran inside the HTTP request and could outlive
+the proxy timeout. They can now be submitted as jobs: the row is stored in
+the jobs table (migrations/0010), a worker thread runs the same function the
+synchronous endpoint runs, and the UI polls or subscribes instead of holding
+a connection open.
+
+    POST /jobs/{kind}              submit; body = the operation's payload -> 202 + job
+    GET  /jobs/{job_id}            status, progress, result, error
+    GET  /jobs/{job_id}/artifact   the produced file
+    GET  /jobs?status=&kind=       recent jobs
+    GET  /events/stream?kinds=job  job.status / job.progress as they happen
+
+    kind                payload                                    runs
+    proforma            {project_id, report_ids | report_nos}      invoices.generate_proforma_for_multiple_reports
+    delivery_note       {project_id, selected_report_ids, ...}     invoices.generate_delivery_note_excel_template
+    generate_samples    {request_no, collected_by}                 samples_workflow.generate_samples_by_request_no
+    quotation_revision  {quotation_id}                             quotations.create_revision
+
+Workers in every process claim queued rows with FOR UPDATE SKIP LOCKED, so
+any number of server workers and lab PCs can share the queue; a NOTIFY on
+insert wakes idle ones. A listener thread heartbeats the jobs this process is
+running; a job whose heartbeat is older than JOB_STALE_SEC (its process died)
+is requeued, or failed once out of attempts. Outcomes and progress are only
+written while the worker still holds the job (status running, worker = its
+name), so a worker that was presumed dead cannot overwrite a later attempt.
+
+A failed attempt is retried after JOB_RETRY_BASE_SEC * 2^(attempt-1) seconds
+until max_attempts. 4xx errors (bad payload, missing request) are not retried.
+Kinds that insert rows (delivery notes, samples, revisions) get one attempt:
+a rerun after their commit would create duplicates, and a failure before it
+is rolled back, so resubmitting is safe.
+
+Files a job returns are uploaded to the JOB_ARTIFACT_BUCKET storage bucket
+(create it as a private bucket) under {kind}/{job_id}/; if the upload fails the
+file stays where the function wrote it and the artifact endpoint serves that.
+
+Settings (.env):
+    JOB_WORKERS=2              worker threads per process (0: submit only)
+    JOB_MAX_ATTEMPTS=3
+    JOB_RETRY_BASE_SEC=10
+    JOB_STALE_SEC=300
+    JOB_ARTIFACT_BUCKET=job-artifacts
+"""
+import json
+import os
+import select
+import socket
+import threading
+import time
+import traceback
+from typing import Optional
+
+import psycopg2
+from fastapi import APIRouter, Body, HTTPException, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from db import connect, get_connection
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+CHANNEL = "jobs"
+WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SEC = float(os.getenv("JOB_RETRY_BASE_SEC", "10"))
+STALE_SEC = float(os.getenv("JOB_STALE_SEC", "300"))
+ARTIFACT_BUCKET = os.getenv("JOB_ARTIFACT_BUCKET", "job-artifacts")
+POLL_SEC = 5             # look for due retries even without a NOTIFY
+HEARTBEAT_SEC = 30
+PROGRESS_EVERY_SEC = 1   # progress writes per job are throttled to this
+UPLOAD_ATTEMPTS = 3
+
+JOB_COLUMNS = """job_id, kind, payload, status, attempts, max_attempts, run_after, progress,
+                 progress_message, result, error, artifact_path, artifact_name, submitted_by,
+                 worker, created_at, started_at, finished_at"""
+
+
+# ---- kinds ----
+def _proforma(payload):
+    from invoices import generate_proforma_for_multiple_reports
+    return generate_proforma_for_multiple_reports(payload)
+
+
+def _delivery_note(payload):
+    from invoices import DeliveryNoteRequest, generate_delivery_note_excel_template
+    return generate_delivery_note_excel_template(DeliveryNoteRequest(**payload))
+
+
+def _generate_samples(payload):
+    from samples_workflow import GenerateSamplesIn, generate_samples_by_request_no
+    fields = {k: v for k, v in payload.items() if k != "request_no"}
+    return generate_samples_by_request_no(payload["request_no"], GenerateSamplesIn(**fields))
+
+
+def _quotation_revision(payload):
+    from quotations import create_revision
+    return create_revision(int(payload["quotation_id"]))
+
+
+# kind: (function, required payload keys, retried)
+KINDS = {
+    "proforma": (_proforma, ("project_id",), True),
+    "delivery_note": (_delivery_note, ("project_id",), False),
+    "generate_samples": (_generate_samples, ("request_no",), False),
+    "quotation_revision": (_quotation_revision, ("quotation_id",), False),
+}
+
+
+# ---- progress (called from inside the job functions) ----
+_current = threading.local()
+
+
+def report_progress(done: int, total: Optional[int] = None, message: Optional[str] = None) -> None:
+    """
+    Record progress of the job running on this thread (a percentage of total,
+    or done as a percentage). Does nothing outside a job, so the synchronous
+    endpoints can call it too.
+    """
+    job_id = getattr(_current, "job_id", None)
+    if job_id is None:
+        return
+    percent = int(done * 100 / total) if total else int(done)
+    percent = max(0, min(99, percent))  # 100 is written when the job finishes
+    now = time.monotonic()
+    if now - _current.progress_at < PROGRESS_EVERY_SEC and (total is None or done < total):
+        return
+    _current.progress_at = now
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs SET progress = %s, progress_message = %s
+            WHERE job_id = %s AND status = 'running' AND worker = %s
+        """, (percent, message or (f"{done}/{total}" if total else None), job_id, _current.worker))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"WARNING: could not record progress of job {job_id}: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ---- queue ----
+def _row(cur, row):
+    job = dict(zip([d[0] for d in cur.description], row))
+    for key in ("run_after", "created_at", "started_at", "finished_at"):
+        if job.get(key) is not None:
+            job[key] = job[key].isoformat()
+    job["status_url"] = f"/jobs/{job['job_id']}"
+    job["artifact_url"] = f"/jobs/{job['job_id']}/artifact" if job["artifact_name"] else None
+    return job
+
+
+def submit(kind: str, payload: dict, submitted_by: Optional[str] = None) -> dict:
+    if kind not in KINDS:
+        raise HTTPException(404, f"Unknown job kind '{kind}'. Use {', '.join(KINDS)}")
+    missing = [key for key in KINDS[kind][1] if payload.get(key) in (None, "")]
+    if missing:
+        raise HTTPException(400, f"{kind} needs {', '.join(missing)}")
+    max_attempts = MAX_ATTEMPTS if KINDS[kind][2] else 1
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            INSERT INTO jobs (kind, payload, max_attempts, submitted_by)
+            VALUES (%s, %s, %s, %s)
+            RETURNING {JOB_COLUMNS}
+        """, (kind, json.dumps(payload, default=str), max_attempts, submitted_by))
+        job = _row(cur, cur.fetchone())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    _wake.set()
+    return job
+
+
+def _claim(worker):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, worker = %s, progress = 0,
+                progress_message = NULL, started_at = now(), heartbeat_at = now()
+            WHERE job_id = (
+                SELECT job_id FROM jobs
+                WHERE status = 'queued' AND run_after <= now()
+                ORDER BY run_after, job_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, kind, payload, attempts, max_attempts
+        """, (worker,))
+        row = cur.fetchone()
+        conn.commit()
+        return row
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _update(job_id, worker, sql, params=()):
+    """
+    Apply a finishing UPDATE if worker still holds the job. After a missed
+    heartbeat the job may have been requeued and claimed by another worker;
+    this worker's late outcome is then dropped rather than overwriting it.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"UPDATE jobs SET {sql} WHERE job_id = %s AND status = 'running' AND worker = %s",
+                    (*params, job_id, worker))
+        held = cur.rowcount == 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    if not held:
+        print(f"WARNING: job {job_id}: lease lost by {worker} (requeued after a missed heartbeat), "
+              f"outcome not recorded")
+    return held
+
+
+def _succeeded(job_id, worker, result, artifact_path=None, artifact_name=None, error=None):
+    return _update(job_id, worker, """status = 'succeeded', progress = 100, progress_message = 'done',
+                                      result = %s, artifact_path = %s, artifact_name = %s, error = %s,
+                                      finished_at = now()""",
+                   (result, artifact_path, artifact_name, error))
+
+
+def _retry_later(job_id, worker, error, delay):
+    return _update(job_id, worker, "status = 'queued', error = %s, worker = NULL, "
+                                   "run_after = now() + make_interval(secs => %s)", (error, delay))
+
+
+def _failed(job_id, worker, error):
+    return _update(job_id, worker, "status = 'failed', error = %s, finished_at = now()", (error,))
+
+
+def _store_artifact(kind, job_id, response):
+    """Upload a job's file; returns (artifact_path, name, size, local_path, upload_error)."""
+    if isinstance(response, FileResponse):
+        name = response.filename or os.path.basename(response.path)
+        local_path = response.path
+        with open(local_path, "rb") as f:
+            content = f.read()
+    else:
+        name, local_path, content = f"job-{job_id}", None, bytes(response.body)
+    path = f"{kind}/{job_id}/{name}"
+
+    from storage import get_supabase
+    error = None
+    for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+        try:
+            get_supabase().storage.from_(ARTIFACT_BUCKET).upload(
+                path=path,
+                file=content,
+                file_options={"content-type": response.media_type or "application/octet-stream",
+                              "x-upsert": "true"},
+            )
+            return path, name, len(content), local_path, None
+        except Exception as e:
+            error = e
+            if attempt < UPLOAD_ATTEMPTS:
+                time.sleep(min(5, 0.5 * 2 ** attempt))
+    print(f"WARNING: job {job_id}: artifact upload failed ({error}), keeping {local_path}")
+    return None, name, len(content), local_path, f"artifact upload failed: {error}"
+
+
+def _result_json(result):
+    if hasattr(result, "model_dump"):
+        result = result.model_dump()
+    elif hasattr(result, "dict") and not isinstance(result, dict):
+        result = result.dict()
+    return json.dumps(result, default=str)
+
+
+def _client_error(e):
+    """The 4xx HTTPException behind e, if any (several endpoints re-raise it as a 500)."""
+    while e is not None:
+        if isinstance(e, HTTPException) and e.status_code < 500:
+            return e
+        e = e.__cause__ or e.__context__
+    return None
+
+
+def _run(job, worker):
+    job_id, kind, payload, attempts, max_attempts = job
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    started = time.perf_counter()
+    _current.job_id, _current.worker, _current.progress_at = job_id, worker, 0.0
+    _running.add(job_id)
+    try:
+        result = KINDS[kind][0](payload)
+        if isinstance(result, StreamingResponse):
+            raise RuntimeError("a streamed response cannot be stored as a job result")
+        if isinstance(result, Response):
+            path, name, size, local_path, upload_error = _store_artifact(kind, job_id, result)
+            _succeeded(job_id, worker, json.dumps({"file": name, "size": size, "local_path": local_path}),
+                       path, name, upload_error)
+        else:
+            _succeeded(job_id, worker, _result_json(result))
+        print(f"DEBUG: job {job_id} ({kind}) done in {time.perf_counter() - started:.1f}s on {worker}")
+    except Exception as e:
+        client_error = _client_error(e)
+        permanent = client_error is not None
+        if permanent:
+            message = str(client_error.detail)
+        else:
+            message = str(e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {e}")
+        if not permanent and attempts < max_attempts:
+            delay = RETRY_BASE_SEC * 2 ** (attempts - 1)
+            print(f"WARNING: job {job_id} ({kind}) attempt {attempts}/{max_attempts} failed, "
+                  f"retry in {delay:.0f}s: {message}")
+            _retry_later(job_id, worker, message, delay)
+        else:
+            print(f"WARNING: job {job_id} ({kind}) failed: {message}")
+            if not permanent:
+                traceback.print_exc()
+            _failed(job_id, worker, message)
+    finally:
+        _running.discard(job_id)
+        _current.job_id = None
+
+
+def _worker_loop(name):
+    worker = f"{socket.gethostname()}:{os.getpid()}:{name}"
+    while True:
+        try:
+            job = _claim(worker)
+        except Exception as e:
+            print(f"WARNING: job worker {name}: {e}")
+            time.sleep(POLL_SEC)
+            continue
+        if job is not None:
+            _run(job, worker)
+            continue
+        _wake.wait(POLL_SEC)
+        _wake.clear()
+
+
+def _heartbeat_and_recover(cur):
+    if _running:
+        cur.execute("UPDATE jobs SET heartbeat_at = now() WHERE job_id = ANY(%s) AND status = 'running'",
+                    (list(_running),))
+    cur.execute("""
+        UPDATE jobs
+        SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+            finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END,
+            error = 'worker ' || COALESCE(worker, '?') || ' stopped responding',
+            worker = NULL, run_after = now()
+        WHERE status = 'running' AND heartbeat_at < now() - make_interval(secs => %s)
+        RETURNING job_id, status
+    """, (STALE_SEC,))
+    for job_id, status in cur.fetchall():
+        print(f"WARNING: job {job_id} lost its worker, now {status}")
+
+
+def _listen_forever():
+    while True:
+        conn = None
+        try:
+            conn = connect()
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CHANNEL}")
+            last_beat = 0.0
+            while True:
+                if time.monotonic() - last_beat >= HEARTBEAT_SEC:
+                    _heartbeat_and_recover(cur)
+                    last_beat = time.monotonic()
+                if select.select([conn], [], [], POLL_SEC) != ([], [], []):
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        _wake.set()
+        except Exception as e:
+            print(f"WARNING: jobs listener: {e}; reconnecting in 5s")
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+_wake = threading.Event()
+_running = set()
+_started = False
+
+
+def start_workers():
+    """Called from the lifespan: JOB_WORKERS worker threads and the listener."""
+    global _started
+    if _started or WORKERS <= 0:
+        return
+    _started = True
+    threading.Thread(target=_listen_forever, name="jobs-listener", daemon=True).start()
+    for i in range(WORKERS):
+        threading.Thread(target=_worker_loop, args=(f"job-worker-{i + 1}",), name=f"job-worker-{i + 1}",
+                         daemon=True).start()
+    print(f"DEBUG: {WORKERS} job worker(s) started")
+
+
+# ---- endpoints ----
+@router.post("/{kind}", status_code=202)
+def submit_job(kind: str, payload: dict = Body(default={}), submitted_by: Optional[str] = None):
+    """Queue a job; poll status_url or follow /events/stream?kinds=job."""
+    return submit(kind, payload, submitted_by)
+
+
+@router.get("")
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT {JOB_COLUMNS} FROM jobs
+            WHERE (%s::text IS NULL OR status = %s) AND (%s::text IS NULL OR kind = %s)
+            ORDER BY created_at DESC
+            LIMIT %s
+        """, (status, status, kind, kind, min(limit, 500)))
+        return [_row(cur, row) for row in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _get(job_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = %s", (job_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(404, f"Job {job_id} not found")
+        return _row(cur, row)
+    finally:
+        cur.close()
+        conn.close()
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int):
+    return _get(job_id)
+
+
+@router.get("/{job_id}/artifact")
+def download_job_artifact(job_id: int):
+    job = _get(job_id)
+    if job["status"] != "succeeded" or not job["artifact_name"]:
+        raise HTTPException(409 if job["status"] in ("queued", "running") else 404,
+                            f"Job {job_id} has no file ({job['status']})")
+    name = job["artifact_name"]
+    headers = {"Content-Disposition": f'attachment; filename="{name}"'}
+
+    if job["artifact_path"]:
+        import http_client
+        from storage import STORAGE_BASE_URL, SUPABASE_KEY
+        response = http_client.get(f"{STORAGE_BASE_URL}/object/{ARTIFACT_BUCKET}/{job['artifact_path']}",
+                                   headers={"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY},
+                                   stream=True)
+        if response.status_code == 200:
+            return StreamingResponse(response.iter_content(64 * 1024), headers=headers,
+                                     media_type=response.headers.get("content-type", "application/octet-stream"))
+        response.close()
+        print(f"WARNING: job {job_id} artifact: storage answered {response.status_code}")
+
+    local_path = (job["result"] or {}).get("local_path")
+    if local_path and os.path.exists(local_path):
+        return FileResponse(local_path, filename=name)
+    raise HTTPException(502, f"File of job {job_id} is not available")
@@ -0,0 +1,181 @@
+# labels.py
+"""
+Printable sample labels: Code 128 barcodes drawn straight into a PDF.
+
+render_labels_pdf(labels, layout) lays out one label per entry - sample
+number, request and test, the barcode and its digits underneath - and
+returns a single PDF for the whole batch. It is pure Python (pydyf, the PDF
+writer WeasyPrint itself uses), so it needs none of the Pango/GTK libraries
+WeasyPrint would need on the lab PCs.
+
+Code 128 has 107 symbols of fixed bar patterns. Each symbol is drawn once
+per document as a form XObject and every label places those "glyphs" with
+a transformation matrix, so a request of 200 samples costs 200 short
+placement lists rather than 200 x 18 x 3 rectangles; the bar geometry of a
+symbol and the symbol sequence of a barcode are cached across documents.
+
+Layouts (LAYOUTS):
+    a4      3 x 8 labels of 70 x 37 mm on A4 (Avery 3474 / L7161-style sheets)
+    roll    one 62 x 29 mm label per page (label printers: Brother DK-11209, Zebra)
+"""
+import functools
+import io
+from typing import Dict, Iterable, List, Tuple
+
+import pydyf
+
+MM = 72 / 25.4
+
+# Bar/space widths, in modules, of symbol values 0..106 (103-105 start A/B/C, 106 stop)
+CODE128_PATTERNS = (
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232", "2331112",
+)
+START_B = 104
+STOP = 106
+QUIET_ZONE = 10  # modules of white either side
+
+LAYOUTS = {
+    "a4": {"page": (210 * MM, 297 * MM), "label": (70 * MM, 37 * MM), "grid": (3, 8)},
+    "roll": {"page": (62 * MM, 29 * MM), "label": (62 * MM, 29 * MM), "grid": (1, 1)},
+}
+
+
+@functools.lru_cache(maxsize=4096)
+def code128_symbols(value: str) -> Tuple[int, ...]:
+    """Symbol values of value in code set B: start, data, checksum, stop."""
+    data = []
+    for ch in value:
+        if not 32 <= ord(ch) <= 127:
+            raise ValueError(f"Cannot encode {ch!r} in Code 128 set B")
+        data.append(ord(ch) - 32)
+    checksum = (START_B + sum(i * s for i, s in enumerate(data, 1))) % 103
+    return (START_B, *data, checksum, STOP)
+
+
+def code128_modules(value: str) -> int:
+    """Width of the symbol in modules, quiet zones excluded."""
+    return 11 * (len(code128_symbols(value)) - 1) + 13
+
+
+@functools.lru_cache(maxsize=None)
+def _glyph_ops(symbol: int) -> bytes:
+    """Content stream of one symbol: its bars in a box of 1 unit per module, 1 unit high."""
+    ops, x = [], 0
+    for i, width in enumerate(CODE128_PATTERNS[symbol]):
+        width = int(width)
+        if i % 2 == 0:
+            ops.append(f"{x} 0 {width} 1 re")
+        x += width
+    ops.append("f")
+    return "\n".join(ops).encode()
+
+
+class _Document:
+    """One PDF being written; glyph XObjects are added on first use."""
+
+    def __init__(self):
+        self.pdf = pydyf.PDF()
+        self.glyphs: Dict[int, pydyf.Stream] = {}
+        self.fonts = {}
+        for name, base in (("F1", "Helvetica"), ("F2", "Helvetica-Bold")):
+            font = pydyf.Dictionary({"Type": "/Font", "Subtype": "/Type1",
+                                     "BaseFont": f"/{base}", "Encoding": "/WinAnsiEncoding"})
+            self.pdf.add_object(font)
+            self.fonts[name] = font.reference
+
+    def glyph(self, symbol: int) -> str:
+        if symbol not in self.glyphs:
+            width = 13 if symbol == STOP else 11
+            form = pydyf.Stream([_glyph_ops(symbol)], extra={
+                "Type": "/XObject", "Subtype": "/Form", "BBox": pydyf.Array([0, 0, width, 1])})
+            self.pdf.add_object(form)
+            self.glyphs[symbol] = form
+        return f"C{symbol}"
+
+    def add_page(self, size, content: pydyf.Stream):
+        self.pdf.add_object(content)
+        resources = pydyf.Dictionary({
+            "Font": pydyf.Dictionary(self.fonts),
+            "XObject": pydyf.Dictionary({f"C{s}": g.reference for s, g in self.glyphs.items()}),
+        })
+        page = pydyf.Dictionary({"Type": "/Page", "Parent": self.pdf.pages.reference,
+                                 "MediaBox": pydyf.Array([0, 0, *size]),
+                                 "Resources": resources, "Contents": content.reference})
+        self.pdf.add_page(page)
+
+
+def _text(stream, font, size, x, y, text, max_chars=None):
+    text = str(text or "")
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars - 1] + "…"
+    stream.begin_text()
+    stream.set_font_size(font, size)
+    stream.set_text_matrix(1, 0, 0, 1, x, y)
+    # Standard 14 fonts with WinAnsiEncoding: cp1252, anything else shown as '?'
+    stream.show_text_string(text.encode("cp1252", errors="replace"))
+    stream.end_text()
+
+
+def _draw_label(doc: _Document, stream, x, y, width, height, label):
+    pad = 2.5 * MM
+    value = label["barcode"]
+    modules = code128_modules(value) + 2 * QUIET_ZONE
+    module = (width - 2 * pad) / modules
+    bar_height = height * 0.38
+    bar_x = x + pad + QUIET_ZONE * module
+    bar_y = y + pad + 9
+
+    _text(stream, "F2", 9, x + pad, y + height - pad - 8, label.get("sample_no") or "-", 30)
+    subtitle = " · ".join(str(v) for v in (label.get("request_no"), label.get("item_code")) if v)
+    _text(stream, "F1", 6.5, x + pad, y + height - pad - 16, subtitle, 44)
+
+    for symbol in code128_symbols(value):
+        name = doc.glyph(symbol)
+        stream.push_state()
+        stream.set_matrix(module, 0, 0, bar_height, bar_x, bar_y)
+        stream.draw_x_object(name)
+        stream.pop_state()
+        bar_x += (13 if symbol == STOP else 11) * module
+
+    _text(stream, "F1", 7, x + pad + QUIET_ZONE * module, y + pad + 1, value)
+
+
+def render_labels_pdf(labels: Iterable[dict], layout: str = "a4", title: str = "Sample labels") -> bytes:
+    """
+    One PDF with a label per entry of labels (dicts with barcode, sample_no,
+    request_no, item_code), filling pages of the given layout in order.
+    """
+    spec = LAYOUTS[layout]
+    page_size, (label_w, label_h) = spec["page"], spec["label"]
+    columns, rows = spec["grid"]
+    # The grid is centred on the page
+    left = (page_size[0] - columns * label_w) / 2
+    bottom = (page_size[1] - rows * label_h) / 2
+
+    doc = _Document()
+    doc.pdf.info["Title"] = pydyf.String(title.encode("cp1252", errors="replace"))
+    labels: List[dict] = list(labels)
+    per_page = columns * rows
+    for start in range(0, len(labels), per_page):
+        stream = pydyf.Stream(compress=True)
+        stream.set_color_rgb(0, 0, 0)
+        for i, label in enumerate(labels[start:start + per_page]):
+            column, row = i % columns, i // columns
+            x = left + column * label_w
+            y = bottom + (rows - 1 - row) * label_h
+            _draw_label(doc, stream, x, y, label_w, label_h, label)
+        doc.add_page(page_size, stream)
+
+    output = io.BytesIO()
+    doc.pdf.write(output, compress=True)
+    return output.getvalue()
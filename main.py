@@ -1,13 +1,13 @@
 # main.py
+import startup_report  # first, so its clock starts with main.py
 import sys
 import io
 import os
 import webbrowser
 import threading
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 import uvicorn
 
 # --- 1. STREAM FIX FOR PYINSTALLER --noconsole MODE ---
@@ -25,8 +25,45 @@ from samples_workflow import router as samples_workflow_router
 from invoices import router as invoice_router
 from reports import router as reports_router
 from search import router as search_router
+from events_feed import router as events_router
+from jobs import router as jobs_router, start_workers as start_job_workers
+from print_pack import router as print_pack_router
+from traffic_capture import install_traffic_capture
+from schema_migrations import SchemaGuardMiddleware, run_startup_migrations
+from totals_consistency import start_consistency_job
+import ref_cache
+import render_flight
+import warmup
+from http_cache import start_compactor
+from db import POOL_ENABLED, get_pool
+from compression import CompressionMiddleware
+from static_assets import IndexPage, PrecompressedStaticFiles
 
-app = FastAPI(title="GEL LIMS API")
+startup_report.mark("imports")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Apply pending migrations/ once before serving (AUTO_MIGRATE=0 to skip); the API
+    # answers 503 while any is left unapplied (schema_migrations.SchemaGuardMiddleware)
+    run_startup_migrations()
+    # Periodic re-derivation of the trigger-maintained totals (TOTALS_CHECK_INTERVAL_MIN=0 to skip)
+    start_consistency_job()
+    # Drop cached reference data when another process writes it (REF_CACHE_LISTEN=0 to skip)
+    ref_cache.start_listener()
+    # Fold the table change log behind the list ETags (TABLE_CHANGES_COMPACT_SEC=0 to skip)
+    start_compactor()
+    # Background jobs: proforma, delivery notes, bulk samples, revisions (JOB_WORKERS=0 to skip)
+    start_job_workers()
+    # Pool, price catalog, clients and templates (WARMUP=background|blocking|off, warmup.py)
+    warmup.start()
+    startup_report.mark("ready")
+    startup_report.log_summary()
+    yield
+
+app = FastAPI(title="GEL LIMS API", lifespan=lifespan)
+
+# 503 on the API while bundled migrations are not applied (added first, so CORS wraps it)
+app.add_middleware(SchemaGuardMiddleware)
 
 # --- 3. CORS MIDDLEWARE ---
 app.add_middleware(
@@ -36,6 +73,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/brotli for JSON and other text bodies over COMPRESSION_MIN_BYTES (COMPRESSION=0 to skip)
+app.add_middleware(CompressionMiddleware)
 
 # --- 4. PATH RESOLUTION LOGIC ---
 def get_base_dir():
@@ -65,6 +104,9 @@ folders = ["uploads/reports", "generated_invoices", "generated_delivery_notes",
 for folder in folders:
     os.makedirs(os.path.join(EXE_DIR, folder), exist_ok=True)
 
+# Opt-in request metadata capture for load testing (TRAFFIC_CAPTURE=1 in .env)
+install_traffic_capture(app, EXE_DIR)
+
 # --- 5. ROUTER REGISTRATION (API ROUTES FIRST) ---
 app.include_router(auth_router, prefix="/auth")
 app.include_router(enquiry_router)  # Already has /enquiries in its file
@@ -75,20 +117,44 @@ app.include_router(samples_workflow_router)  # Already has /samples-workflow in
 app.include_router(invoice_router)  # Already has /invoices in its file
 app.include_router(reports_router, prefix="/reports")
 app.include_router(search_router, prefix="/search")
+app.include_router(events_router)  # Already has /events in its file
+app.include_router(jobs_router)  # Already has /jobs in its file
+app.include_router(print_pack_router)  # Already has /print-pack in its file
 
 # --- 6. SERVE STATIC ASSETS ---
 if os.path.exists(DIST_PATH) and os.path.exists(os.path.join(DIST_PATH, "assets")):
-    app.mount("/assets", StaticFiles(directory=os.path.join(DIST_PATH, "assets")), name="assets")
+    # Hashed bundle files: immutable caching, build-time .br/.gz when present (static_assets.py)
+    app.mount("/assets", PrecompressedStaticFiles(directory=os.path.join(DIST_PATH, "assets")), name="assets")
+
+# index.html is read once and served from memory
+index_page = IndexPage(os.path.join(DIST_PATH, "index.html"))
 
 # --- 7. API HEALTH CHECK (OPTIONAL) ---
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "api": "running", "frontend": os.path.exists(DIST_PATH)}
+    return {"status": "healthy", "api": "running", "frontend": index_page.available,
+            "warmup": warmup.state, "startup": startup_report.timings()}
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    # Hit/miss counters of the reference data and template caches, the LISTEN thread
+    # (ref_cache.py), this process's connection pool (db.py) and coalesced renders
+    # (render_flight.py)
+    return {**ref_cache.cache_stats(), "db_pool": get_pool().state() if POOL_ENABLED else None,
+            "renders": render_flight.renders.stats()}
+
+@app.get("/api/outbound-stats")
+async def outbound_stats():
+    # Storage calls per host: retries, failures, circuit state, latency (http_client.py),
+    # and how often template_cache fell back to a last good copy
+    import http_client
+    import template_cache
+    return {"hosts": http_client.stats(), "template_fallback": template_cache.fallback_stats}
 
 # --- 8. REACT CATCH-ALL ROUTE (MUST BE LAST!) ---
 # This catches any routes not matched above and serves the React app
 @app.get("/{full_path:path}", include_in_schema=False)
-async def serve_frontend(full_path: str):
+async def serve_frontend(full_path: str, request: Request):
     """
     Serve React app for any non-API routes.
     This only runs if no other route (API, docs, static files) matches.
@@ -96,13 +162,13 @@ async def serve_frontend(full_path: str):
     # Let FastAPI handle its own docs paths automatically
     # This function only runs for paths not matched by any previous route
     
-    index_path = os.path.join(DIST_PATH, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
+    response = index_page.response(request)
+    if response is not None:
+        return response
     
     return {
         "message": "GEL LIMS Backend is running",
-        "frontend_status": f"Frontend not found at {index_path}",
+        "frontend_status": f"Frontend not found at {index_page.path}",
         "note": "API endpoints available at /docs, /redoc, /openapi.json"
     }
 
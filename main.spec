@@ -1,11 +1,17 @@
 # -*- mode: python ; coding: utf-8 -*-
+import sys
+sys.path.insert(0, SPECPATH)
+from static_assets import precompress_dir
+
+# Ship dist/ with .br/.gz next to the text assets (served by PrecompressedStaticFiles)
+precompress_dir('dist')
 
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('dist', 'dist')],
+    datas=[('dist', 'dist'), ('migrations', 'migrations')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,225 @@
+-- migrations/0001_base_schema.sql
+-- GEL LIMS base schema, reconstructed from the queries in the routers.
+-- Every statement is IF NOT EXISTS, so on an existing database this is a no-op
+-- and on a blank one (benchmarks, new installs) it creates the full schema.
+-- Indexes and constraints live in the later migrations.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id SERIAL PRIMARY KEY,
+    username VARCHAR(100) NOT NULL UNIQUE,
+    password_hash TEXT,
+    user_role VARCHAR(30),
+    full_name VARCHAR(200),
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS clients (
+    client_id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    contact_person VARCHAR(255),
+    email VARCHAR(255),
+    phone VARCHAR(50),
+    address TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS enquiries (
+    enquiry_id SERIAL PRIMARY KEY,
+    client_id INTEGER REFERENCES clients(client_id),
+    enquiry_ref VARCHAR(50),
+    enquiry_date DATE,
+    project_name VARCHAR(255),
+    location VARCHAR(255),
+    status VARCHAR(30) DEFAULT 'OPEN',
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS price_catalog (
+    catalog_id SERIAL PRIMARY KEY,
+    code VARCHAR(50),
+    description TEXT,
+    test_standard VARCHAR(255),
+    unit_rate NUMERIC(12, 2),
+    unit VARCHAR(30),
+    active BOOLEAN DEFAULT TRUE,
+    group_name VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS quotations (
+    quotation_id SERIAL PRIMARY KEY,
+    quotation_no VARCHAR(50),
+    enquiry_id INTEGER REFERENCES enquiries(enquiry_id),
+    division VARCHAR(20),
+    revision INTEGER DEFAULT 0,
+    payment_terms TEXT,
+    prepared_under VARCHAR(20),
+    validity_days INTEGER DEFAULT 30,
+    status VARCHAR(30) DEFAULT 'DRAFT',
+    total_amount NUMERIC(14, 2) DEFAULT 0,
+    vat NUMERIC(14, 2) DEFAULT 0,
+    grand_total NUMERIC(14, 2) DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    approved_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS quotation_items (
+    item_id SERIAL PRIMARY KEY,
+    quotation_id INTEGER REFERENCES quotations(quotation_id) ON DELETE CASCADE,
+    item_code VARCHAR(50),
+    description TEXT,
+    test_standard VARCHAR(255),
+    unit_rate NUMERIC(12, 2) DEFAULT 0,
+    quantity INTEGER DEFAULT 1,
+    unit VARCHAR(30),
+    amount NUMERIC(14, 2) GENERATED ALWAYS AS (unit_rate * quantity) STORED
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    project_id SERIAL PRIMARY KEY,
+    project_no VARCHAR(50),
+    quotation_id INTEGER REFERENCES quotations(quotation_id),
+    client_id INTEGER REFERENCES clients(client_id),
+    project_name VARCHAR(255),
+    location VARCHAR(255),
+    lpo_no VARCHAR(100),
+    lpo_date DATE,
+    lpo_file TEXT,
+    division VARCHAR(20),
+    status VARCHAR(30) DEFAULT 'ACTIVE',
+    halted_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS test_requests (
+    test_request_id SERIAL PRIMARY KEY,
+    project_id INTEGER REFERENCES projects(project_id),
+    request_no VARCHAR(50),
+    requested_by VARCHAR(255),
+    status VARCHAR(30) DEFAULT 'PENDING_SAMPLES',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS test_request_items (
+    tri_id SERIAL PRIMARY KEY,
+    test_request_id INTEGER REFERENCES test_requests(test_request_id) ON DELETE CASCADE,
+    quotation_item_id INTEGER REFERENCES quotation_items(item_id),
+    quantity INTEGER DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS samples (
+    sample_id SERIAL PRIMARY KEY,
+    sample_no VARCHAR(50),
+    request_id INTEGER REFERENCES test_requests(test_request_id),
+    collected_by VARCHAR(255),
+    received_date TIMESTAMP,
+    status VARCHAR(30) DEFAULT 'PENDING',
+    barcode VARCHAR(64),
+    storage_location VARCHAR(255),
+    reason_rejected TEXT,
+    assigned_tri_id INTEGER,
+    assigned_quotation_item_id INTEGER,
+    assigned_item_code VARCHAR(50),
+    assigned_test_name TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS worksheets (
+    worksheet_id SERIAL PRIMARY KEY,
+    worksheet_no VARCHAR(60),
+    sample_id INTEGER REFERENCES samples(sample_id),
+    quotation_item_id INTEGER,
+    test_name TEXT,
+    standard VARCHAR(255),
+    unit_rate NUMERIC(12, 2),
+    quantity INTEGER,
+    technician VARCHAR(255),
+    status VARCHAR(30) DEFAULT 'GENERATED',
+    template_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+-- One row per covered sample; rows of the same report share report_no
+CREATE TABLE IF NOT EXISTS reports (
+    report_id SERIAL PRIMARY KEY,
+    report_no VARCHAR(60),
+    sample_id INTEGER REFERENCES samples(sample_id),
+    original_filename TEXT,
+    stored_filename TEXT,
+    file_path TEXT,
+    file_type VARCHAR(20),
+    uploaded_by INTEGER,
+    status VARCHAR(30) DEFAULT 'DRAFT',
+    covers_test_type TEXT,
+    covers_samples TEXT[],
+    notes TEXT,
+    linked_to_report_id INTEGER,
+    checked_by INTEGER,
+    checked_at TIMESTAMP,
+    approved_by INTEGER,
+    approved_at TIMESTAMP,
+    is_locked BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_id SERIAL PRIMARY KEY,
+    invoice_no VARCHAR(50),
+    project_id INTEGER REFERENCES projects(project_id),
+    invoice_type VARCHAR(20),
+    payment_method VARCHAR(20) DEFAULT 'CASH',
+    invoice_date DATE,
+    client_reference TEXT,
+    lpo_reference TEXT,
+    lpo_date DATE,
+    payment_terms TEXT,
+    subtotal NUMERIC(14, 2) DEFAULT 0,
+    vat NUMERIC(14, 2) DEFAULT 0,
+    total NUMERIC(14, 2) DEFAULT 0,
+    amount_in_words TEXT,
+    services_description TEXT,
+    remarks TEXT,
+    payment_status VARCHAR(20) DEFAULT 'UNPAID',
+    paid_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS invoice_items (
+    item_id SERIAL PRIMARY KEY,
+    invoice_id INTEGER REFERENCES invoices(invoice_id) ON DELETE CASCADE,
+    description TEXT,
+    test_standard VARCHAR(255),
+    unit_rate NUMERIC(12, 2),
+    quantity INTEGER,
+    amount NUMERIC(14, 2),
+    sample_id INTEGER,
+    test_request_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS invoice_report_links (
+    id SERIAL PRIMARY KEY,
+    invoice_id INTEGER REFERENCES invoices(invoice_id) ON DELETE CASCADE,
+    report_no VARCHAR(60) NOT NULL,
+    invoice_type VARCHAR(20) NOT NULL,
+    UNIQUE (invoice_id, report_no, invoice_type)
+);
+
+CREATE TABLE IF NOT EXISTS delivery_notes (
+    delivery_note_id SERIAL PRIMARY KEY,
+    delivery_note_no VARCHAR(50) NOT NULL UNIQUE,
+    project_id INTEGER NOT NULL REFERENCES projects(project_id),
+    generated_by INTEGER REFERENCES users(user_id),
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_reports INTEGER DEFAULT 0,
+    file_path TEXT
+);
+
+CREATE TABLE IF NOT EXISTS delivery_note_reports (
+    id SERIAL PRIMARY KEY,
+    delivery_note_no VARCHAR(50) NOT NULL,
+    report_no VARCHAR(50) NOT NULL,
+    UNIQUE (delivery_note_no, report_no)
+);
@@ -0,0 +1,37 @@
+-- migrations/0002_hot_indexes.sql
+-- migrate:no-transaction
+-- Indexes for the filters the routers run on every list/search/numbering call.
+-- Built CONCURRENTLY so a startup against a live database does not block writes;
+-- each statement runs on its own.
+
+-- Samples: per-request lists, lookups by number, the pending/recent dashboards
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_request_id ON samples (request_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_sample_no ON samples (sample_no);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_open ON samples (sample_id DESC) WHERE status IN ('PENDING', 'ACCEPTED');
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_status ON samples (status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_assigned_test ON samples (assigned_quotation_item_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_assigned_tri ON samples (assigned_tri_id);
+
+-- Reports: rows of one report share report_no
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_report_no ON reports (report_no);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_sample_id ON reports (sample_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_status ON reports (status, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_approved ON reports (report_no, created_at DESC) WHERE status = 'APPROVED';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reports_created_day ON reports ((DATE(created_at)));
+
+-- Invoice / delivery note links, looked up by report number
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoice_report_links_report_no ON invoice_report_links (report_no, invoice_type);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_delivery_note_reports_report_no ON delivery_note_reports (report_no);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items (invoice_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_project_id ON invoices (project_id);
+
+-- Items by parent
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_test_request_items_request ON test_request_items (test_request_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_quotation_items_quotation ON quotation_items (quotation_id, item_id);
+
+-- Parents and the COUNT-per-day numbering
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_test_requests_project_id ON test_requests (project_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_test_requests_created_day ON test_requests ((DATE(created_at)));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_worksheets_sample_id ON worksheets (sample_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projects_quotation_id ON projects (quotation_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_quotations_enquiry_id ON quotations (enquiry_id);
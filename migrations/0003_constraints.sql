@@ -0,0 +1,45 @@
+-- migrations/0003_constraints.sql
+-- Columns and constraints the code relies on but that older databases may have
+-- been created without (they used to be added by hand or inside requests).
+
+-- Stored test assignment (was a manual step documented in samples_workflow.py)
+ALTER TABLE samples ADD COLUMN IF NOT EXISTS assigned_tri_id INTEGER;
+ALTER TABLE samples ADD COLUMN IF NOT EXISTS assigned_quotation_item_id INTEGER;
+
+-- ON CONFLICT targets
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'delivery_note_reports'::regclass AND contype = 'u'
+    ) THEN
+        ALTER TABLE delivery_note_reports
+            ADD CONSTRAINT delivery_note_reports_delivery_note_no_report_no_key UNIQUE (delivery_note_no, report_no);
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'invoice_report_links'::regclass AND contype = 'u'
+    ) THEN
+        ALTER TABLE invoice_report_links
+            ADD CONSTRAINT invoice_report_links_invoice_id_report_no_invoice_type_key UNIQUE (invoice_id, report_no, invoice_type);
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'delivery_notes'::regclass AND contype = 'u'
+    ) THEN
+        ALTER TABLE delivery_notes ADD CONSTRAINT delivery_notes_delivery_note_no_key UNIQUE (delivery_note_no);
+    END IF;
+END $$;
+
+-- Link rows must point at an existing invoice / report number. NOT VALID keeps
+-- startup fast and tolerates old orphans; new rows are checked.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'invoice_report_links_invoice_id_fkey') THEN
+        ALTER TABLE invoice_report_links
+            ADD CONSTRAINT invoice_report_links_invoice_id_fkey
+            FOREIGN KEY (invoice_id) REFERENCES invoices(invoice_id) ON DELETE CASCADE NOT VALID;
+    END IF;
+END $$;
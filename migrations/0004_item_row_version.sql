@@ -0,0 +1,25 @@
+-- migrations/0004_item_row_version.sql
+-- Optimistic concurrency for item edits. Every UPDATE bumps row_version (via
+-- trigger, so older code paths and the batch endpoints count too); the
+-- ID-addressed item endpoints only apply an edit made against the version the
+-- client last read and answer 409 otherwise.
+
+ALTER TABLE quotation_items ADD COLUMN IF NOT EXISTS row_version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE test_request_items ADD COLUMN IF NOT EXISTS row_version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_row_version() RETURNS trigger AS $$
+BEGIN
+    NEW.row_version := OLD.row_version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS quotation_items_row_version ON quotation_items;
+CREATE TRIGGER quotation_items_row_version
+    BEFORE UPDATE ON quotation_items
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+DROP TRIGGER IF EXISTS test_request_items_row_version ON test_request_items;
+CREATE TRIGGER test_request_items_row_version
+    BEFORE UPDATE ON test_request_items
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
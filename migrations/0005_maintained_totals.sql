@@ -0,0 +1,235 @@
+-- migrations/0005_maintained_totals.sql
+-- Quotation and invoice totals maintained by triggers instead of being re-summed
+-- in Python after every item change. Statement-level triggers read the
+-- transition tables and apply one delta per parent row, so adding 60 lines in
+-- one INSERT costs one UPDATE of the quotation, and editing one line costs O(1)
+-- whatever the number of lines. totals_consistency.py re-derives everything
+-- from the items and reports (and repairs) any drift.
+--
+-- VAT is 5% here as in quotations.VAT_RATE / invoices.py.
+
+-- ----------------------------------------------------------------
+-- Quotations: total_amount = SUM(quotation_items.amount)
+-- ----------------------------------------------------------------
+CREATE OR REPLACE FUNCTION quotation_items_apply_totals() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH delta AS (
+            SELECT quotation_id, SUM(amount) AS amount FROM new_rows GROUP BY quotation_id
+        )
+        UPDATE quotations q
+        SET total_amount = COALESCE(q.total_amount, 0) + delta.amount,
+            vat = (COALESCE(q.total_amount, 0) + delta.amount) * 0.05,
+            grand_total = (COALESCE(q.total_amount, 0) + delta.amount) * 1.05
+        FROM delta
+        WHERE q.quotation_id = delta.quotation_id AND delta.amount <> 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH delta AS (
+            SELECT quotation_id, -SUM(amount) AS amount FROM old_rows GROUP BY quotation_id
+        )
+        UPDATE quotations q
+        SET total_amount = COALESCE(q.total_amount, 0) + delta.amount,
+            vat = (COALESCE(q.total_amount, 0) + delta.amount) * 0.05,
+            grand_total = (COALESCE(q.total_amount, 0) + delta.amount) * 1.05
+        FROM delta
+        WHERE q.quotation_id = delta.quotation_id AND delta.amount <> 0;
+    ELSE
+        WITH delta AS (
+            SELECT quotation_id, SUM(amount) AS amount FROM (
+                SELECT quotation_id, amount FROM new_rows
+                UNION ALL
+                SELECT quotation_id, -amount FROM old_rows
+            ) d
+            GROUP BY quotation_id
+        )
+        UPDATE quotations q
+        SET total_amount = COALESCE(q.total_amount, 0) + delta.amount,
+            vat = (COALESCE(q.total_amount, 0) + delta.amount) * 0.05,
+            grand_total = (COALESCE(q.total_amount, 0) + delta.amount) * 1.05
+        FROM delta
+        WHERE q.quotation_id = delta.quotation_id AND delta.amount <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS quotation_items_totals_insert ON quotation_items;
+CREATE TRIGGER quotation_items_totals_insert
+    AFTER INSERT ON quotation_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION quotation_items_apply_totals();
+
+DROP TRIGGER IF EXISTS quotation_items_totals_update ON quotation_items;
+CREATE TRIGGER quotation_items_totals_update
+    AFTER UPDATE ON quotation_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION quotation_items_apply_totals();
+
+DROP TRIGGER IF EXISTS quotation_items_totals_delete ON quotation_items;
+CREATE TRIGGER quotation_items_totals_delete
+    AFTER DELETE ON quotation_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION quotation_items_apply_totals();
+
+-- Quotation totals have always been re-derived from the items, so bring them in line once
+UPDATE quotations q
+SET total_amount = sub.total,
+    vat = sub.total * 0.05,
+    grand_total = sub.total * 1.05
+FROM (
+    SELECT q2.quotation_id, COALESCE(SUM(qi.amount), 0) AS total
+    FROM quotations q2
+    LEFT JOIN quotation_items qi ON qi.quotation_id = q2.quotation_id
+    GROUP BY q2.quotation_id
+) sub
+WHERE q.quotation_id = sub.quotation_id
+  AND q.total_amount IS DISTINCT FROM sub.total;
+
+-- ----------------------------------------------------------------
+-- Invoices: subtotal = SUM(invoice_items.amount)
+--           linked_subtotal = SUM(amount) of the items covered by the
+--           invoice's linked APPROVED reports (PROFORMA/TAX billing)
+-- ----------------------------------------------------------------
+ALTER TABLE invoices ADD COLUMN IF NOT EXISTS linked_subtotal NUMERIC(14, 2) NOT NULL DEFAULT 0;
+ALTER TABLE invoice_items ADD COLUMN IF NOT EXISTS linked BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Same matching rule get_invoice_complete used in Python: the report's test type
+-- equals, contains or is contained in the item description (case-insensitive)
+CREATE OR REPLACE FUNCTION invoice_item_is_linked(p_invoice_id INTEGER, p_description TEXT) RETURNS BOOLEAN AS $$
+    SELECT COALESCE(p_description, '') <> '' AND EXISTS (
+        SELECT 1
+        FROM invoices i
+        JOIN invoice_report_links irl ON irl.invoice_id = i.invoice_id AND irl.invoice_type = i.invoice_type
+        JOIN reports r ON r.report_no = irl.report_no AND r.status = 'APPROVED'
+        WHERE i.invoice_id = p_invoice_id
+          AND i.invoice_type IN ('PROFORMA', 'TAX')
+          AND COALESCE(r.covers_test_type, '') <> ''
+          AND (position(lower(r.covers_test_type) IN lower(p_description)) > 0
+               OR position(lower(p_description) IN lower(r.covers_test_type)) > 0)
+    )
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION invoice_items_set_linked() RETURNS trigger AS $$
+BEGIN
+    NEW.linked := invoice_item_is_linked(NEW.invoice_id, NEW.description);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS invoice_items_linked ON invoice_items;
+CREATE TRIGGER invoice_items_linked
+    BEFORE INSERT OR UPDATE OF invoice_id, description ON invoice_items
+    FOR EACH ROW EXECUTE FUNCTION invoice_items_set_linked();
+
+CREATE OR REPLACE FUNCTION invoice_items_apply_totals() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        WITH delta AS (
+            SELECT invoice_id,
+                   SUM(COALESCE(amount, 0)) AS amount,
+                   SUM(CASE WHEN linked THEN COALESCE(amount, 0) ELSE 0 END) AS linked_amount
+            FROM new_rows GROUP BY invoice_id
+        )
+        UPDATE invoices i
+        SET subtotal = COALESCE(i.subtotal, 0) + delta.amount,
+            vat = (COALESCE(i.subtotal, 0) + delta.amount) * 0.05,
+            total = (COALESCE(i.subtotal, 0) + delta.amount) * 1.05,
+            linked_subtotal = i.linked_subtotal + delta.linked_amount
+        FROM delta
+        WHERE i.invoice_id = delta.invoice_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        WITH delta AS (
+            SELECT invoice_id,
+                   -SUM(COALESCE(amount, 0)) AS amount,
+                   -SUM(CASE WHEN linked THEN COALESCE(amount, 0) ELSE 0 END) AS linked_amount
+            FROM old_rows GROUP BY invoice_id
+        )
+        UPDATE invoices i
+        SET subtotal = COALESCE(i.subtotal, 0) + delta.amount,
+            vat = (COALESCE(i.subtotal, 0) + delta.amount) * 0.05,
+            total = (COALESCE(i.subtotal, 0) + delta.amount) * 1.05,
+            linked_subtotal = i.linked_subtotal + delta.linked_amount
+        FROM delta
+        WHERE i.invoice_id = delta.invoice_id;
+    ELSE
+        WITH delta AS (
+            SELECT invoice_id, SUM(amount) AS amount, SUM(linked_amount) AS linked_amount FROM (
+                SELECT invoice_id, COALESCE(amount, 0) AS amount,
+                       CASE WHEN linked THEN COALESCE(amount, 0) ELSE 0 END AS linked_amount
+                FROM new_rows
+                UNION ALL
+                SELECT invoice_id, -COALESCE(amount, 0),
+                       CASE WHEN linked THEN -COALESCE(amount, 0) ELSE 0 END
+                FROM old_rows
+            ) d
+            GROUP BY invoice_id
+        )
+        -- A pure relink (amounts unchanged) must not rewrite the issued vat/total
+        UPDATE invoices i
+        SET subtotal = COALESCE(i.subtotal, 0) + delta.amount,
+            vat = CASE WHEN delta.amount <> 0 THEN (COALESCE(i.subtotal, 0) + delta.amount) * 0.05 ELSE i.vat END,
+            total = CASE WHEN delta.amount <> 0 THEN (COALESCE(i.subtotal, 0) + delta.amount) * 1.05 ELSE i.total END,
+            linked_subtotal = i.linked_subtotal + delta.linked_amount
+        FROM delta
+        WHERE i.invoice_id = delta.invoice_id
+          AND (delta.amount <> 0 OR delta.linked_amount <> 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS invoice_items_totals_insert ON invoice_items;
+CREATE TRIGGER invoice_items_totals_insert
+    AFTER INSERT ON invoice_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION invoice_items_apply_totals();
+
+DROP TRIGGER IF EXISTS invoice_items_totals_update ON invoice_items;
+CREATE TRIGGER invoice_items_totals_update
+    AFTER UPDATE ON invoice_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION invoice_items_apply_totals();
+
+DROP TRIGGER IF EXISTS invoice_items_totals_delete ON invoice_items;
+CREATE TRIGGER invoice_items_totals_delete
+    AFTER DELETE ON invoice_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION invoice_items_apply_totals();
+
+-- Linking or unlinking reports re-evaluates the items of the invoices touched
+-- (the UPDATE below then moves linked_subtotal through the trigger above)
+CREATE OR REPLACE FUNCTION invoice_report_links_relink() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE invoice_items ii
+        SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+        WHERE ii.invoice_id IN (SELECT DISTINCT invoice_id FROM new_rows)
+          AND ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
+    ELSE
+        UPDATE invoice_items ii
+        SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+        WHERE ii.invoice_id IN (SELECT DISTINCT invoice_id FROM old_rows)
+          AND ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS invoice_report_links_relink_insert ON invoice_report_links;
+CREATE TRIGGER invoice_report_links_relink_insert
+    AFTER INSERT ON invoice_report_links
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION invoice_report_links_relink();
+
+DROP TRIGGER IF EXISTS invoice_report_links_relink_delete ON invoice_report_links;
+CREATE TRIGGER invoice_report_links_relink_delete
+    AFTER DELETE ON invoice_report_links
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION invoice_report_links_relink();
+
+-- Backfill the new linked figures (the UPDATE goes through the triggers above).
+-- Stored invoice subtotals are issued amounts and are left alone; any that do
+-- not match their items are reported by totals_consistency.py.
+UPDATE invoice_items ii
+SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+WHERE ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
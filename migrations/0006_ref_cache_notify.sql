@@ -0,0 +1,46 @@
+-- migrations/0006_ref_cache_notify.sql
+-- Change notifications for the reference data cache (ref_cache.py). Any write
+-- to these tables - through the API, another lab PC's EXE or the Supabase
+-- console - sends NOTIFY ref_cache '<table>[:<id>]' at commit, and every
+-- running process drops the matching cache entries.
+
+CREATE OR REPLACE FUNCTION notify_ref_cache_table() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('ref_cache', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Project headers are cached per project, so only that entry is dropped
+CREATE OR REPLACE FUNCTION notify_ref_cache_project() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('ref_cache', 'projects:' || OLD.project_id);
+    ELSE
+        PERFORM pg_notify('ref_cache', 'projects:' || NEW.project_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS price_catalog_ref_cache ON price_catalog;
+CREATE TRIGGER price_catalog_ref_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON price_catalog
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ref_cache_table();
+
+DROP TRIGGER IF EXISTS clients_ref_cache ON clients;
+CREATE TRIGGER clients_ref_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON clients
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ref_cache_table();
+
+DROP TRIGGER IF EXISTS users_ref_cache ON users;
+CREATE TRIGGER users_ref_cache
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_ref_cache_table();
+
+-- Only the columns that make up the cached header
+DROP TRIGGER IF EXISTS projects_ref_cache ON projects;
+CREATE TRIGGER projects_ref_cache
+    AFTER UPDATE OF project_no, project_name, location, lpo_no, lpo_date, client_id, quotation_id OR DELETE
+    ON projects
+    FOR EACH ROW EXECUTE FUNCTION notify_ref_cache_project();
@@ -0,0 +1,41 @@
+-- migrations/0007_table_versions.sql
+-- Per-table change counters for HTTP conditional requests (http_cache.py).
+-- Every write statement on a tracked table bumps its row here; the polled
+-- list endpoints build their ETag / Last-Modified from these rows and answer
+-- 304 without running their query when nothing changed.
+--
+-- The counter is an ordinary row update, so a new version only becomes
+-- visible when the write that caused it commits - a poll can never see the
+-- new token together with the old data.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, clock_timestamp())
+    ON CONFLICT (table_name) DO UPDATE
+        SET version = table_versions.version + 1,
+            changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['enquiries', 'clients', 'quotations', 'quotation_items', 'projects',
+                             'test_requests', 'samples', 'reports']
+    LOOP
+        INSERT INTO table_versions (table_name) VALUES (t) ON CONFLICT DO NOTHING;
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_table_version', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', t || '_table_version', t);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,42 @@
+-- migrations/0008_table_change_log.sql
+-- Make the table_versions bump (0007) contention free. Updating one counter row
+-- per table held a row lock until commit, so every transaction writing samples
+-- (or any tracked table) waited for the previous one to finish.
+--
+-- Writers now only append to table_changes; a table's version is its
+-- table_versions.version plus its pending table_changes rows. Rows appear at
+-- commit, so the token still only moves with committed data. http_cache folds
+-- the log into table_versions periodically with compact_table_changes(), which
+-- moves rows and counts in one statement so the sum seen by readers is unchanged.
+
+CREATE TABLE IF NOT EXISTS table_changes (
+    change_id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(63) NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_table_changes_table_name ON table_changes (table_name);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_changes (table_name) VALUES (TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION compact_table_changes() RETURNS INTEGER AS $$
+    WITH moved AS (
+        DELETE FROM table_changes RETURNING table_name, changed_at
+    ), summary AS (
+        SELECT table_name, COUNT(*) AS changes, MAX(changed_at) AS last_changed
+        FROM moved GROUP BY table_name
+    ), folded AS (
+        INSERT INTO table_versions AS v (table_name, version, changed_at)
+        SELECT table_name, changes, last_changed FROM summary
+        ON CONFLICT (table_name) DO UPDATE
+            SET version = v.version + EXCLUDED.version,
+                changed_at = GREATEST(v.changed_at, EXCLUDED.changed_at)
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM folded;
+$$ LANGUAGE sql;
@@ -0,0 +1,85 @@
+-- migrations/0009_lims_events.sql
+-- Event log behind the /events/stream feed (events_feed.py). Row triggers on
+-- samples, worksheets and reports append one event per change and NOTIFY
+-- lims_events; event_id is the cursor clients resume from. Rows older than
+-- EVENTS_RETENTION_DAYS are pruned by the feed.
+
+CREATE TABLE IF NOT EXISTS lims_events (
+    event_id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(40) NOT NULL,
+    entity_id INTEGER,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION record_lims_event() RETURNS trigger AS $$
+DECLARE
+    v_kind TEXT;
+    v_id INTEGER;
+    v_payload JSONB;
+BEGIN
+    IF TG_TABLE_NAME = 'samples' THEN
+        v_id := NEW.sample_id;
+        v_payload := jsonb_build_object('sample_id', NEW.sample_id, 'sample_no', NEW.sample_no,
+                                        'request_id', NEW.request_id, 'status', NEW.status);
+        IF TG_OP = 'INSERT' THEN
+            v_kind := 'sample.created';
+        ELSE
+            v_kind := 'sample.status';
+            v_payload := v_payload || jsonb_build_object('old_status', OLD.status,
+                                                         'reason_rejected', NEW.reason_rejected);
+        END IF;
+
+    ELSIF TG_TABLE_NAME = 'worksheets' THEN
+        v_id := NEW.worksheet_id;
+        v_kind := 'worksheet.generated';
+        v_payload := jsonb_build_object('worksheet_id', NEW.worksheet_id, 'worksheet_no', NEW.worksheet_no,
+                                        'sample_id', NEW.sample_id, 'test_name', NEW.test_name);
+
+    ELSIF TG_TABLE_NAME = 'reports' THEN
+        v_id := NEW.report_id;
+        v_payload := jsonb_build_object('report_id', NEW.report_id, 'report_no', NEW.report_no,
+                                        'sample_id', NEW.sample_id, 'status', NEW.status);
+        IF TG_OP = 'INSERT' OR NEW.status IS NOT DISTINCT FROM OLD.status THEN
+            -- New report, or a new file uploaded over an existing one
+            v_kind := 'report.uploaded';
+        ELSE
+            v_kind := 'report.status';
+            v_payload := v_payload || jsonb_build_object('old_status', OLD.status);
+        END IF;
+    END IF;
+
+    INSERT INTO lims_events (kind, entity_id, payload) VALUES (v_kind, v_id, v_payload);
+    PERFORM pg_notify('lims_events', v_kind);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS samples_lims_events_insert ON samples;
+CREATE TRIGGER samples_lims_events_insert
+    AFTER INSERT ON samples
+    FOR EACH ROW EXECUTE FUNCTION record_lims_event();
+
+DROP TRIGGER IF EXISTS samples_lims_events_update ON samples;
+CREATE TRIGGER samples_lims_events_update
+    AFTER UPDATE OF status ON samples
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION record_lims_event();
+
+DROP TRIGGER IF EXISTS worksheets_lims_events ON worksheets;
+CREATE TRIGGER worksheets_lims_events
+    AFTER INSERT ON worksheets
+    FOR EACH ROW EXECUTE FUNCTION record_lims_event();
+
+DROP TRIGGER IF EXISTS reports_lims_events_insert ON reports;
+CREATE TRIGGER reports_lims_events_insert
+    AFTER INSERT ON reports
+    FOR EACH ROW EXECUTE FUNCTION record_lims_event();
+
+DROP TRIGGER IF EXISTS reports_lims_events_update ON reports;
+CREATE TRIGGER reports_lims_events_update
+    AFTER UPDATE OF status, stored_filename ON reports
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.stored_filename IS DISTINCT FROM NEW.stored_filename)
+    EXECUTE FUNCTION record_lims_event();
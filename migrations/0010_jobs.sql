@@ -0,0 +1,69 @@
+-- migrations/0010_jobs.sql
+-- Background job queue (jobs.py). Workers claim queued rows with
+-- FOR UPDATE SKIP LOCKED; a row stays 'running' while its worker heartbeats
+-- and is requeued (or failed) when the heartbeat goes stale. Status and
+-- progress changes are appended to lims_events as job.* events, so the
+-- /events/stream feed doubles as the subscription for job updates.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(60) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+    progress SMALLINT NOT NULL DEFAULT 0,
+    progress_message TEXT,
+    result JSONB,
+    error TEXT,
+    artifact_path TEXT,
+    artifact_name TEXT,
+    submitted_by VARCHAR(100),
+    worker VARCHAR(100),
+    heartbeat_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (run_after, job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs (heartbeat_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at DESC);
+
+CREATE OR REPLACE FUNCTION record_job_event() RETURNS trigger AS $$
+DECLARE
+    v_kind TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.status IS DISTINCT FROM OLD.status THEN
+        v_kind := 'job.status';
+    ELSE
+        v_kind := 'job.progress';
+    END IF;
+    INSERT INTO lims_events (kind, entity_id, payload)
+    VALUES (v_kind, NEW.job_id::integer,
+            jsonb_build_object('job_id', NEW.job_id, 'job_kind', NEW.kind, 'status', NEW.status,
+                               'progress', NEW.progress, 'message', NEW.progress_message,
+                               'attempts', NEW.attempts, 'error', NEW.error));
+    PERFORM pg_notify('lims_events', v_kind);
+    IF NEW.status = 'queued' THEN
+        -- wakes idle workers (jobs.py)
+        PERFORM pg_notify('jobs', NEW.kind);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS jobs_events_insert ON jobs;
+CREATE TRIGGER jobs_events_insert
+    AFTER INSERT ON jobs
+    FOR EACH ROW EXECUTE FUNCTION record_job_event();
+
+DROP TRIGGER IF EXISTS jobs_events_update ON jobs;
+CREATE TRIGGER jobs_events_update
+    AFTER UPDATE OF status, progress, progress_message ON jobs
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.progress IS DISTINCT FROM NEW.progress
+          OR OLD.progress_message IS DISTINCT FROM NEW.progress_message)
+    EXECUTE FUNCTION record_job_event();
@@ -0,0 +1,22 @@
+-- migrations/0011_sample_barcodes.sql
+-- migrate:no-transaction
+-- Scanner-driven intake (GET /samples-workflow/samples/lookup-by-barcode/{barcode})
+-- looks samples up by the barcode printed on their label, so a barcode must
+-- identify one sample. Built CONCURRENTLY like 0002; each statement runs on its own.
+
+-- Barcodes are stored as generate_barcode() makes them: upper-case hex
+UPDATE samples SET barcode = NULLIF(UPPER(BTRIM(barcode)), '')
+WHERE barcode IS DISTINCT FROM NULLIF(UPPER(BTRIM(barcode)), '');
+
+-- Older duplicates (should not exist, but the column was never constrained)
+-- get a fresh code; the lowest sample_id keeps the printed one
+UPDATE samples s
+SET barcode = UPPER(SUBSTR(MD5(s.sample_id::text || clock_timestamp()::text), 1, 16))
+FROM (
+    SELECT sample_id, ROW_NUMBER() OVER (PARTITION BY barcode ORDER BY sample_id) AS n
+    FROM samples
+    WHERE barcode IS NOT NULL
+) d
+WHERE d.sample_id = s.sample_id AND d.n > 1;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_samples_barcode ON samples (barcode);
@@ -0,0 +1,91 @@
+-- migrations/0012_relink_on_report_changes.sql
+-- invoice_items.linked / invoices.linked_subtotal (0005) depend on the linked
+-- reports' status and covers_test_type and on the invoice's type, but were
+-- only re-evaluated when invoice_report_links rows came or went. Approving a
+-- report, editing what it covers or changing an invoice's type now
+-- re-evaluates the items of the invoices concerned straight away, instead of
+-- waiting for the periodic totals_consistency pass.
+
+-- Reports: statement level, since a report is one row per covered sample and
+-- is approved / edited with one UPDATE across those rows
+CREATE OR REPLACE FUNCTION reports_relink() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        UPDATE invoice_items ii
+        SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+        WHERE ii.invoice_id IN (
+                SELECT irl.invoice_id
+                FROM invoice_report_links irl
+                WHERE irl.report_no IN (
+                    SELECT n.report_no
+                    FROM new_rows n JOIN old_rows o ON o.report_id = n.report_id
+                    WHERE n.status IS DISTINCT FROM o.status
+                       OR n.covers_test_type IS DISTINCT FROM o.covers_test_type
+                       OR n.report_no IS DISTINCT FROM o.report_no
+                    UNION
+                    SELECT o.report_no
+                    FROM new_rows n JOIN old_rows o ON o.report_id = n.report_id
+                    WHERE n.report_no IS DISTINCT FROM o.report_no
+                ))
+          AND ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
+    ELSIF TG_OP = 'INSERT' THEN
+        UPDATE invoice_items ii
+        SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+        WHERE ii.invoice_id IN (
+                SELECT irl.invoice_id FROM invoice_report_links irl
+                WHERE irl.report_no IN (SELECT report_no FROM new_rows))
+          AND ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
+    ELSE
+        UPDATE invoice_items ii
+        SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+        WHERE ii.invoice_id IN (
+                SELECT irl.invoice_id FROM invoice_report_links irl
+                WHERE irl.report_no IN (SELECT report_no FROM old_rows))
+          AND ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reports_relink_insert ON reports;
+CREATE TRIGGER reports_relink_insert
+    AFTER INSERT ON reports
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reports_relink();
+
+-- Transition tables cannot be combined with UPDATE OF <columns>; the function
+-- only acts on rows whose status / covers_test_type / report_no changed
+DROP TRIGGER IF EXISTS reports_relink_update ON reports;
+CREATE TRIGGER reports_relink_update
+    AFTER UPDATE ON reports
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reports_relink();
+
+DROP TRIGGER IF EXISTS reports_relink_delete ON reports;
+CREATE TRIGGER reports_relink_delete
+    AFTER DELETE ON reports
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION reports_relink();
+
+-- Invoices: only PROFORMA/TAX invoices bill linked reports
+CREATE OR REPLACE FUNCTION invoices_relink() RETURNS trigger AS $$
+BEGIN
+    UPDATE invoice_items ii
+    SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+    WHERE ii.invoice_id = NEW.invoice_id
+      AND ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS invoices_relink_type ON invoices;
+CREATE TRIGGER invoices_relink_type
+    AFTER UPDATE OF invoice_type ON invoices
+    FOR EACH ROW
+    WHEN (OLD.invoice_type IS DISTINCT FROM NEW.invoice_type)
+    EXECUTE FUNCTION invoices_relink();
+
+-- Catch up on anything that went stale before these triggers existed
+UPDATE invoice_items ii
+SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+WHERE ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description);
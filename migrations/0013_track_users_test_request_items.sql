@@ -0,0 +1,19 @@
+-- migrations/0013_track_users_test_request_items.sql
+-- GET /reports?status= (reports.get_reports) also reads test_request_items
+-- (for the item code) and users (uploaded/checked/approved by), so its ETag
+-- must move when those change too. Same statement-level trigger as 0007;
+-- bump_table_version() appends to table_changes since 0008.
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['test_request_items', 'users']
+    LOOP
+        INSERT INTO table_versions (table_name) VALUES (t) ON CONFLICT DO NOTHING;
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_table_version', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', t || '_table_version', t);
+    END LOOP;
+END;
+$$;
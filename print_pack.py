@@ -0,0 +1,210 @@
+# print_pack.py
+"""
+"Print pack" export: everything handed over for a test request or a project
+in one ZIP, instead of downloading each document separately.
+
+    GET /print-pack/test-requests/{test_request_id}
+    GET /print-pack/projects/{project_id}
+
+    {request_no}/Test_Request_{request_no}.xlsx     tests.download_test_request_doc
+    {request_no}/worksheets/...                     one filled workbook per test
+                                                    (samples_workflow.render_test_worksheet)
+    {request_no}/reports/...                        the stored report files
+    invoices/...                                    invoices.render_invoice_excel
+    MANIFEST.csv                                    every part and whether it worked
+
+The archive is streamed (zip_stream.py) while the parts are produced: up to
+PRINT_PACK_WORKERS (default 4) render at the same time and each is written
+as soon as it is ready, so neither the archive nor more than a few parts are
+ever held in memory or on disk. Stored report files are copied from disk in
+chunks. Renders go through the same paths as the single downloads, so they
+share template_cache and coalesce with identical invoice downloads in flight.
+
+A part that fails does not stop the pack: it is listed in MANIFEST.csv with
+the error (the response headers are already sent by then).
+
+?include_drafts=true also packs reports that are not APPROVED yet.
+"""
+import csv
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from db import get_connection
+from zip_stream import stream_zip
+
+router = APIRouter(prefix="/print-pack", tags=["Print pack"])
+
+WORKERS = int(os.getenv("PRINT_PACK_WORKERS", "4"))
+
+
+def _safe(name):
+    return str(name).replace("/", "-").replace("\\", "-").strip() or "unnamed"
+
+
+# ---- parts: each returns [(archive name, bytes or file path)] ----
+def _test_request_doc(folder, test_request_id):
+    from tests import download_test_request_doc
+    response = download_test_request_doc(test_request_id)
+    try:
+        with open(response.path, "rb") as f:
+            content = f.read()
+    finally:
+        os.remove(response.path)  # a temp file written for this download
+    return [(f"{folder}/{response.filename}", content)]
+
+
+def _worksheet(folder, header, test_samples):
+    from samples_workflow import render_test_worksheet
+    name, content = render_test_worksheet(header, test_samples)
+    return [(f"{folder}/worksheets/{name}", content)]
+
+
+def _report(folder, name, path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"report file not found at {path}")
+    return [(f"{folder}/reports/{name}", path)]
+
+
+def _invoice(invoice_id):
+    from invoices import render_invoice_excel
+    content, name = render_invoice_excel(invoice_id)
+    return [(f"invoices/{name}", content)]
+
+
+# ---- what goes into a pack ----
+def _request_parts(cur, test_request_id, request_no, include_drafts):
+    from samples_workflow import group_samples_by_test, load_request_worksheets
+    from reports import report_download_name
+
+    folder = _safe(request_no)
+    parts = [(f"{folder}/test request", _test_request_doc, (folder, test_request_id))]
+
+    header, samples = load_request_worksheets(cur, request_no)
+    for test_samples in group_samples_by_test(samples).values():
+        if any(s["worksheet_id"] for s in test_samples):
+            label = f"{folder}/worksheet {test_samples[0]['item_code']}"
+            parts.append((label, _worksheet, (folder, header, test_samples)))
+
+    # A report has one row per covered sample; pack each report_no once
+    cur.execute("""
+        SELECT DISTINCT ON (r.report_no) r.report_no, r.original_filename, r.file_path, r.file_type
+        FROM reports r
+        JOIN samples s ON s.sample_id = r.sample_id
+        WHERE s.request_id = %s
+          AND r.file_path IS NOT NULL
+          AND (%s OR r.status = 'APPROVED')
+        ORDER BY r.report_no, r.report_id DESC
+    """, (test_request_id, include_drafts))
+    for report_no, original_filename, file_path, file_type in cur.fetchall():
+        name = _safe(report_download_name(report_no, original_filename, file_type))
+        parts.append((f"{folder}/report {report_no}", _report, (folder, name, file_path)))
+    return parts
+
+
+def _invoice_parts(cur, project_id, test_request_id=None):
+    cur.execute("""
+        SELECT i.invoice_id, i.invoice_no
+        FROM invoices i
+        WHERE i.project_id = %s
+          AND (%s::integer IS NULL OR EXISTS (
+                SELECT 1
+                FROM invoice_items ii
+                LEFT JOIN samples s ON s.sample_id = ii.sample_id
+                WHERE ii.invoice_id = i.invoice_id
+                  AND (ii.test_request_id = %s OR s.request_id = %s)))
+        ORDER BY i.invoice_id
+    """, (project_id, test_request_id, test_request_id, test_request_id))
+    return [(f"invoice {invoice_no}", _invoice, (invoice_id,)) for invoice_id, invoice_no in cur.fetchall()]
+
+
+def _run_bounded(parts, workers):
+    """Run parts on a pool, at most `workers` at once; yield (label, files, error) as each finishes."""
+    def run(part):
+        label, fn, args = part
+        try:
+            return label, fn(*args), None
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {e}"
+            print(f"WARNING: print pack part '{label}' failed: {detail}")
+            return label, [], str(detail)
+
+    queue = iter(parts)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="print-pack") as pool:
+        pending = {pool.submit(run, part) for part in islice(queue, workers)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                following = next(queue, None)
+                if following is not None:
+                    pending.add(pool.submit(run, following))
+
+
+def _stream(parts):
+    manifest = []
+    for label, files, error in _run_bounded(parts, max(1, WORKERS)):
+        for name, content in files:
+            manifest.append((label, name, "ok"))
+            yield name, content
+        if error:
+            manifest.append((label, "", f"failed: {error}"))
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["part", "file", "result"])
+    writer.writerows(sorted(manifest))
+    yield "MANIFEST.csv", out.getvalue().encode("utf-8-sig")
+
+
+def _response(parts, filename):
+    return StreamingResponse(stream_zip(_stream(parts)), media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                                      "X-Print-Pack-Parts": str(len(parts))})
+
+
+@router.get("/test-requests/{test_request_id}")
+def test_request_print_pack(test_request_id: int, include_drafts: bool = False):
+    """Test request document, filled worksheets, reports and invoices of one test request as a ZIP."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT request_no, project_id FROM test_requests WHERE test_request_id = %s",
+                    (test_request_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(404, "Test request not found")
+        request_no, project_id = row
+        parts = _request_parts(cur, test_request_id, request_no, include_drafts)
+        parts += _invoice_parts(cur, project_id, test_request_id)
+    finally:
+        cur.close()
+        conn.close()
+    return _response(parts, f"{_safe(request_no)}_print_pack.zip")
+
+
+@router.get("/projects/{project_id}")
+def project_print_pack(project_id: int, include_drafts: bool = False):
+    """Print pack of every test request of a project plus the project's invoices."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT project_no FROM projects WHERE project_id = %s", (project_id,))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(404, "Project not found")
+        project_no = row[0] or f"project-{project_id}"
+        cur.execute("SELECT test_request_id, request_no FROM test_requests WHERE project_id = %s "
+                    "ORDER BY test_request_id", (project_id,))
+        parts = []
+        for test_request_id, request_no in cur.fetchall():
+            parts += _request_parts(cur, test_request_id, request_no, include_drafts)
+        parts += _invoice_parts(cur, project_id)
+    finally:
+        cur.close()
+        conn.close()
+    return _response(parts, f"{_safe(project_no)}_print_pack.zip")
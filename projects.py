@@ -6,15 +6,9 @@ from datetime import datetime
 from typing import Optional, List
 import os
 import shutil
-import supabase
 
-from supabase import create_client, Client
-
-SUPABASE_URL = "https://hqwgkmbjmcxpxbwccclo.supabase.co"
-SUPABASE_KEY = "sb_secret_-8uQCdQSiUgDFO_MUEsTWg_TPWtsyy3"
-
-# This 'supabase' object is what you'll use to upload files
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from storage import get_supabase
+import ref_cache
 
 # FIXED: Remove duplicate prefix - just use prefix="/projects"
 router = APIRouter(prefix="/projects", tags=["Projects"])
@@ -281,6 +275,7 @@ def update_project(project_id: int, payload: ProjectCreate):
 
         result = cur.fetchone()
         conn.commit()
+        ref_cache.project_headers.invalidate(project_id)
 
         return {
             "message": "Project updated successfully",
@@ -317,6 +312,7 @@ async def upload_lpo_file(project_id: int, file: UploadFile = File(...)):
 
         # 2. Upload to Supabase Storage (Bucket name: "projects")
         # Ensure you created a bucket named 'projects' in Supabase dashboard first!
+        supabase = get_supabase()
         upload_response = supabase.storage.from_("projects").upload(
             path=cloud_filename,
             file=file_content,
@@ -424,3 +420,307 @@ def update_project_status(project_id: int, payload: ProjectStatusUpdate):
 
 
 
+
+
+# ------------------------------
+# PROJECT DOSSIER
+# ------------------------------
+# Everything one project screen needs in a single round trip: each section is a
+# json_agg subquery of one SELECT, so the project/client/quotation joins are done
+# once instead of once per endpoint. Column lists below are also the whitelist for
+# ?fields=section.column (the first column of a section is always returned).
+DOSSIER_SECTIONS = {
+    "project": {
+        "many": False,
+        "from": """projects p
+                   LEFT JOIN quotations q ON p.quotation_id = q.quotation_id
+                   LEFT JOIN clients c ON p.client_id = c.client_id
+                   WHERE p.project_id = %(project_id)s""",
+        "order": None,
+        "columns": {
+            "project_id": "p.project_id",
+            "project_no": "p.project_no",
+            "project_name": "p.project_name",
+            "location": "p.location",
+            "division": "p.division",
+            "status": "p.status",
+            "halted_date": "p.halted_date",
+            "lpo_no": "p.lpo_no",
+            "lpo_date": "p.lpo_date",
+            "lpo_file": "p.lpo_file",
+            "created_at": "p.created_at",
+            "quotation_id": "p.quotation_id",
+            "quotation_no": "q.quotation_no",
+            "client_id": "p.client_id",
+            "client_name": "c.name",
+            "contact_person": "c.contact_person",
+            "client_email": "c.email",
+            "client_phone": "c.phone",
+        },
+    },
+    "quotation": {
+        "many": False,
+        "from": """projects p
+                   JOIN quotations q ON p.quotation_id = q.quotation_id
+                   WHERE p.project_id = %(project_id)s""",
+        "order": None,
+        "columns": {
+            "quotation_id": "q.quotation_id",
+            "quotation_no": "q.quotation_no",
+            "division": "q.division",
+            "revision": "q.revision",
+            "status": "q.status",
+            "payment_terms": "q.payment_terms",
+            "validity_days": "q.validity_days",
+            "total_amount": "q.total_amount",
+            "vat": "q.vat",
+            "grand_total": "q.grand_total",
+            "created_at": "q.created_at",
+            "approved_at": "q.approved_at",
+        },
+    },
+    "items": {
+        "many": True,
+        "from": """projects p
+                   JOIN quotation_items qi ON qi.quotation_id = p.quotation_id
+                   WHERE p.project_id = %(project_id)s""",
+        "order": "qi.item_id",
+        "columns": {
+            "item_id": "qi.item_id",
+            "item_code": "qi.item_code",
+            "description": "qi.description",
+            "test_standard": "qi.test_standard",
+            "unit_rate": "qi.unit_rate",
+            "quantity": "qi.quantity",
+            "unit": "qi.unit",
+            "amount": "qi.amount",
+        },
+    },
+    "test_requests": {
+        "many": True,
+        "from": """test_requests tr
+                   WHERE tr.project_id = %(project_id)s""",
+        "order": "tr.created_at DESC, tr.test_request_id DESC",
+        "columns": {
+            "test_request_id": "tr.test_request_id",
+            "request_no": "tr.request_no",
+            "requested_by": "tr.requested_by",
+            "status": "tr.status",
+            "created_at": "tr.created_at",
+            "items": """(SELECT COALESCE(json_agg(json_build_object(
+                            'tri_id', tri.tri_id,
+                            'quotation_item_id', tri.quotation_item_id,
+                            'description', qi.description,
+                            'test_standard', qi.test_standard,
+                            'unit_rate', qi.unit_rate,
+                            'quantity', tri.quantity,
+                            'amount', qi.unit_rate * tri.quantity
+                         ) ORDER BY tri.tri_id), '[]'::json)
+                         FROM test_request_items tri
+                         LEFT JOIN quotation_items qi ON tri.quotation_item_id = qi.item_id
+                         WHERE tri.test_request_id = tr.test_request_id)""",
+            "total_amount": """(SELECT COALESCE(SUM(qi.unit_rate * tri.quantity), 0)
+                                FROM test_request_items tri
+                                JOIN quotation_items qi ON tri.quotation_item_id = qi.item_id
+                                WHERE tri.test_request_id = tr.test_request_id)""",
+        },
+    },
+    "samples": {
+        "many": True,
+        "from": """samples s
+                   JOIN test_requests tr ON s.request_id = tr.test_request_id
+                   WHERE tr.project_id = %(project_id)s""",
+        "order": "s.sample_id",
+        "columns": {
+            "sample_id": "s.sample_id",
+            "sample_no": "s.sample_no",
+            "request_id": "s.request_id",
+            "request_no": "tr.request_no",
+            "status": "s.status",
+            "barcode": "s.barcode",
+            "collected_by": "s.collected_by",
+            "received_date": "s.received_date",
+            "storage_location": "s.storage_location",
+            "reason_rejected": "s.reason_rejected",
+            "assigned_tri_id": "s.assigned_tri_id",
+            "assigned_item_code": "s.assigned_item_code",
+            "assigned_test_name": "s.assigned_test_name",
+            "created_at": "s.created_at",
+        },
+    },
+    "worksheets": {
+        "many": True,
+        "from": """worksheets w
+                   JOIN samples s ON w.sample_id = s.sample_id
+                   JOIN test_requests tr ON s.request_id = tr.test_request_id
+                   WHERE tr.project_id = %(project_id)s""",
+        "order": "w.worksheet_id",
+        "columns": {
+            "worksheet_id": "w.worksheet_id",
+            "worksheet_no": "w.worksheet_no",
+            "sample_id": "w.sample_id",
+            "sample_no": "s.sample_no",
+            "quotation_item_id": "w.quotation_item_id",
+            "test_name": "w.test_name",
+            "standard": "w.standard",
+            "technician": "w.technician",
+            "status": "w.status",
+            "created_at": "w.created_at",
+        },
+    },
+    "reports": {
+        "many": True,
+        "from": """reports r
+                   JOIN samples s ON r.sample_id = s.sample_id
+                   JOIN test_requests tr ON s.request_id = tr.test_request_id
+                   WHERE tr.project_id = %(project_id)s""",
+        "order": "r.report_no, r.report_id",
+        "columns": {
+            "report_id": "r.report_id",
+            "report_no": "r.report_no",
+            "sample_id": "r.sample_id",
+            "sample_no": "s.sample_no",
+            "status": "r.status",
+            "test_name": "r.covers_test_type",
+            "covers_samples": "r.covers_samples",
+            "file_path": "r.file_path",
+            "is_locked": "r.is_locked",
+            "created_at": "r.created_at",
+            "approved_at": "r.approved_at",
+            "invoice_types": """(SELECT COALESCE(json_agg(DISTINCT irl.invoice_type), '[]'::json)
+                                 FROM invoice_report_links irl WHERE irl.report_no = r.report_no)""",
+            "delivery_note_nos": """(SELECT COALESCE(json_agg(DISTINCT dnr.delivery_note_no), '[]'::json)
+                                     FROM delivery_note_reports dnr WHERE dnr.report_no = r.report_no)""",
+        },
+    },
+    "invoices": {
+        "many": True,
+        "from": """invoices i
+                   WHERE i.project_id = %(project_id)s""",
+        "order": "i.invoice_id DESC",
+        "columns": {
+            "invoice_id": "i.invoice_id",
+            "invoice_no": "i.invoice_no",
+            "invoice_type": "i.invoice_type",
+            "payment_method": "i.payment_method",
+            "invoice_date": "i.invoice_date",
+            "subtotal": "i.subtotal",
+            "vat": "i.vat",
+            "total": "i.total",
+            "payment_status": "i.payment_status",
+            "paid_date": "i.paid_date",
+            "created_at": "i.created_at",
+            "items": """(SELECT COALESCE(json_agg(json_build_object(
+                            'item_id', ii.item_id,
+                            'description', ii.description,
+                            'test_standard', ii.test_standard,
+                            'unit_rate', ii.unit_rate,
+                            'quantity', ii.quantity,
+                            'amount', ii.amount
+                         ) ORDER BY ii.item_id), '[]'::json)
+                         FROM invoice_items ii WHERE ii.invoice_id = i.invoice_id)""",
+            "report_nos": """(SELECT COALESCE(json_agg(irl.report_no ORDER BY irl.report_no), '[]'::json)
+                              FROM invoice_report_links irl WHERE irl.invoice_id = i.invoice_id)""",
+        },
+    },
+    "delivery_notes": {
+        "many": True,
+        "from": """delivery_notes dn
+                   WHERE dn.project_id = %(project_id)s""",
+        "order": "dn.delivery_note_id DESC",
+        "columns": {
+            "delivery_note_id": "dn.delivery_note_id",
+            "delivery_note_no": "dn.delivery_note_no",
+            "generated_at": "dn.generated_at",
+            "total_reports": "dn.total_reports",
+            "file_path": "dn.file_path",
+            "report_nos": """(SELECT COALESCE(json_agg(dnr.report_no ORDER BY dnr.report_no), '[]'::json)
+                              FROM delivery_note_reports dnr WHERE dnr.delivery_note_no = dn.delivery_note_no)""",
+        },
+    },
+}
+
+
+def parse_dossier_selection(include: Optional[str], fields: Optional[str]):
+    """
+    Turn ?include=samples,reports&fields=samples.sample_no,samples.status into
+    {section: [columns]}. Unknown names are a 400 rather than silently dropped,
+    so a typo in a screen shows up straight away.
+    """
+    sections = [s.strip() for s in include.split(",") if s.strip()] if include else list(DOSSIER_SECTIONS)
+    unknown = [s for s in sections if s not in DOSSIER_SECTIONS]
+    if unknown:
+        raise HTTPException(400, f"Unknown dossier section(s): {', '.join(unknown)}")
+
+    requested = {}
+    for field in (fields or "").split(","):
+        field = field.strip()
+        if not field:
+            continue
+        section, _, column = field.partition(".")
+        if section not in DOSSIER_SECTIONS or column not in DOSSIER_SECTIONS[section]["columns"]:
+            raise HTTPException(400, f"Unknown dossier field: {field}")
+        requested.setdefault(section, []).append(column)
+
+    selection = {}
+    for section in sections:
+        columns = list(DOSSIER_SECTIONS[section]["columns"])
+        if section in requested:
+            # The key column always comes back so rows can be matched up client side
+            columns = [columns[0]] + [c for c in columns[1:] if c in requested[section]]
+        selection[section] = columns
+    return selection
+
+
+def build_dossier_query(selection):
+    """One SELECT with a JSON subquery per selected section."""
+    parts = []
+    for section, columns in selection.items():
+        spec = DOSSIER_SECTIONS[section]
+        row = "json_build_object(" + ", ".join(
+            f"'{column}', {spec['columns'][column]}" for column in columns
+        ) + ")"
+        if spec["many"]:
+            parts.append(f"(SELECT COALESCE(json_agg({row} ORDER BY {spec['order']}), '[]'::json) "
+                         f"FROM {spec['from']}) AS {section}")
+        else:
+            parts.append(f"(SELECT {row} FROM {spec['from']}) AS {section}")
+    # The existence check rides along so a missing project is still one query
+    parts.append("EXISTS (SELECT 1 FROM projects WHERE project_id = %(project_id)s) AS project_exists")
+    return "SELECT " + ",\n       ".join(parts)
+
+
+@router.get("/{project_id}/dossier", summary="Get Project Dossier")
+def get_project_dossier(project_id: int, include: Optional[str] = None, fields: Optional[str] = None):
+    """
+    The whole project graph - project, quotation and its items, test requests,
+    samples, worksheets, reports, invoices and delivery notes - in one response.
+
+    include: comma-separated sections to return (default: all)
+    fields:  comma-separated section.column names; a section listed here only
+             returns those columns (plus its id), other sections return everything
+    """
+    selection = parse_dossier_selection(include, fields)
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(build_dossier_query(selection), {"project_id": project_id})
+        row = cur.fetchone()
+
+        if not row[-1]:
+            raise HTTPException(404, "Project not found")
+
+        dossier = {"project_id": project_id}
+        for index, section in enumerate(selection):
+            dossier[section] = row[index]
+        return dossier
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, str(e))
+    finally:
+        cur.close()
+        conn.close()
@@ -2,20 +2,22 @@
 import io
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from db import get_connection
 from fastapi.responses import StreamingResponse
-from template_processor import QuotationTemplateProcessor
+from psycopg2.extras import execute_values
 from utils import resource_path
+from storage import template_url
+import ref_cache
+import template_cache
 
-import requests # Don't forget to 'pip install requests'
 from io import BytesIO
 
 
 router = APIRouter(prefix="/quotations", tags=["3. Quotations"])
 
-VAT_RATE = 0.05
+VAT_RATE = 0.05  # applied in SQL by the quotation_items totals triggers (migrations/0005)
 
 
 # ============================================================
@@ -47,15 +49,33 @@ class ItemQuantityUpdate(BaseModel):
 class UnitRateUpdate(BaseModel):
     unit_rate: float
 
+class QuotationItemOperation(BaseModel):
+    op: Literal["add", "update", "delete"]
+    # add: catalog_id (+ quantity, optional overrides) or description/unit_rate/quantity
+    catalog_id: Optional[int] = None
+    # update/delete: item_id, or item_index as used by PUT/DELETE /items/{item_index}
+    # (resolved against the items as they were before the batch)
+    item_id: Optional[int] = None
+    item_index: Optional[int] = None
+    row_version: Optional[int] = None  # refuse (409) if the item changed since it was read
+    description: Optional[str] = None
+    test_standard: Optional[str] = None
+    unit_rate: Optional[float] = None
+    quantity: Optional[int] = None
+
+class QuotationItemBatch(BaseModel):
+    operations: List[QuotationItemOperation]
+
 # ============================================================
 # Generate Quotation Number with New Format (Thread-safe version)
 # ============================================================
 
 TEMPLATE_URLS = {
-    "GEO": "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/quotations/GEO.docx",
-    "SRV": "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/quotations/SRV.docx",
-    "DEFAULT": "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/quotations/QT.docx"
+    "GEO": template_url("quotations/GEO.docx"),
+    "SRV": template_url("quotations/SRV.docx"),
+    "DEFAULT": template_url("quotations/QT.docx")
 }
+template_cache.register(*TEMPLATE_URLS.values())
 
 def _generate_quotation_no(cur, division, prepared_under):
     """
@@ -243,33 +263,15 @@ def add_item_from_catalog(quotation_id: int, payload: QuotationItemFromCatalog):
 
         item_id = cur.fetchone()[0]
 
-        # Recalculate totals
-        cur.execute("""
-            UPDATE quotations
-            SET total_amount = COALESCE(sub.total, 0),
-                vat = COALESCE(sub.total, 0) * %s,
-                grand_total = COALESCE(sub.total, 0) * (1 + %s)
-            FROM (
-                SELECT SUM(amount) AS total
-                FROM quotation_items
-                WHERE quotation_id = %s
-            ) sub
-            WHERE quotation_id = %s
-            RETURNING total_amount, vat, grand_total
-        """, (VAT_RATE, VAT_RATE, quotation_id, quotation_id))
-
-        totals = cur.fetchone()
+        # Totals are maintained by the quotation_items triggers
+        totals = _quotation_totals(cur, quotation_id)
         conn.commit()
 
         return {
             "message": "Item added from catalog",
             "item_id": item_id,
             "quotation_id": quotation_id,
-            "totals": {
-                "total_amount": float(totals[0]),
-                "vat": float(totals[1]),
-                "grand_total": float(totals[2]),
-            },
+            "totals": totals,
         }
 
     except Exception as e:
@@ -307,35 +309,183 @@ def add_item(quotation_id: int, item: QuotationItemCreate):
 
         item_id = cur.fetchone()[0]
 
-        # Recalculate totals
-        cur.execute("""
-            UPDATE quotations
-            SET total_amount = COALESCE(sub.total, 0),
-                vat = COALESCE(sub.total, 0) * %s,
-                grand_total = COALESCE(sub.total, 0) * (1 + %s)
-            FROM (
-                SELECT SUM(amount) AS total
-                FROM quotation_items
-                WHERE quotation_id = %s
-            ) sub
-            WHERE quotations.quotation_id = %s
-            RETURNING total_amount, vat, grand_total
-        """, (VAT_RATE, VAT_RATE, quotation_id, quotation_id))
-
-        totals = cur.fetchone()
+        # Totals are maintained by the quotation_items triggers
+        totals = _quotation_totals(cur, quotation_id)
         conn.commit()
 
         return {
             "message": "Item added",
             "item_id": item_id,
             "quotation_id": quotation_id,
-            "totals": {
-                "total_amount": float(totals[0]),
-                "vat": float(totals[1]),
-                "grand_total": float(totals[2]),
-            },
+            "totals": totals,
+        }
+
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, str(e))
+
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ============================================================
+# 3️⃣b BATCH ITEM CHANGES (ONE TRANSACTION, ONE TOTALS UPDATE)
+# ============================================================
+
+def _quotation_totals(cur, quotation_id):
+    """
+    Current total_amount / vat / grand_total. They are kept up to date by the
+    quotation_items triggers (migrations/0005), so this is a primary-key read.
+    """
+    cur.execute("""
+        SELECT total_amount, vat, grand_total
+        FROM quotations
+        WHERE quotation_id = %s
+    """, (quotation_id,))
+    totals = cur.fetchone()
+    return {
+        "total_amount": float(totals[0]),
+        "vat": float(totals[1]),
+        "grand_total": float(totals[2]),
+    }
+
+
+@router.post("/{quotation_id}/items/batch", summary="Add, Update and Delete Items in One Request")
+def batch_items(quotation_id: int, payload: QuotationItemBatch):
+    """
+    Apply a list of item operations atomically: either all of them are applied
+    or none are. All adds go in with a single INSERT, so the totals triggers
+    adjust the quotation once for them.
+
+    Same rules as the single-item endpoints: quantity > 0, unit_rate >= 0, and
+    update/delete only on DRAFT or APPROVED quotations. A failing operation is
+    reported as 400 with its position in the list.
+    """
+    if not payload.operations:
+        raise HTTPException(400, "No operations given")
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        # Row lock: concurrent batches on the same quotation apply one after the other
+        cur.execute("SELECT status FROM quotations WHERE quotation_id = %s FOR UPDATE", (quotation_id,))
+        quote = cur.fetchone()
+        if not quote:
+            raise HTTPException(404, "Quotation not found")
+
+        if quote[0] not in ['DRAFT', 'APPROVED'] and any(o.op != "add" for o in payload.operations):
+            raise HTTPException(400, "Only DRAFT or APPROVED quotations can be modified")
+
+        cur.execute("""
+            SELECT item_id FROM quotation_items
+            WHERE quotation_id = %s
+            ORDER BY item_id
+        """, (quotation_id,))
+        existing_ids = [r[0] for r in cur.fetchall()]
+
+        catalog_ids = {o.catalog_id for o in payload.operations if o.op == "add" and o.catalog_id is not None}
+        catalog = {}
+        if catalog_ids:
+            cur.execute("""
+                SELECT catalog_id, code, description, test_standard, unit_rate
+                FROM price_catalog
+                WHERE catalog_id = ANY(%s)
+            """, (list(catalog_ids),))
+            catalog = {r[0]: r[1:] for r in cur.fetchall()}
+
+        new_rows = []
+        updated, deleted = [], []
+        deleted_ids = set()
+
+        for position, o in enumerate(payload.operations):
+            def fail(message):
+                raise HTTPException(400, f"Operation {position} ({o.op}): {message}")
+
+            if o.quantity is not None and o.quantity <= 0:
+                fail("Quantity must be greater than zero")
+            if o.unit_rate is not None and o.unit_rate < 0:
+                fail("Unit rate cannot be negative")
+
+            if o.op == "add":
+                if o.catalog_id is not None:
+                    if o.catalog_id not in catalog:
+                        fail(f"Catalog item {o.catalog_id} not found")
+                    code, description, test_standard, unit_rate = catalog[o.catalog_id]
+                    new_rows.append((
+                        quotation_id, code,
+                        o.description or description,
+                        o.test_standard if o.test_standard is not None else test_standard,
+                        o.unit_rate if o.unit_rate is not None else unit_rate,
+                        o.quantity or 1,
+                    ))
+                else:
+                    if not o.description or o.unit_rate is None or o.quantity is None:
+                        fail("description, unit_rate and quantity are required without catalog_id")
+                    new_rows.append((quotation_id, None, o.description, o.test_standard, o.unit_rate, o.quantity))
+                continue
+
+            # update / delete address an existing item
+            if o.item_id is not None:
+                item_id = o.item_id
+                if item_id not in existing_ids:
+                    fail(f"Item {item_id} not found on this quotation")
+            elif o.item_index is not None:
+                if o.item_index < 0 or o.item_index >= len(existing_ids):
+                    fail(f"Invalid item index {o.item_index}")
+                item_id = existing_ids[o.item_index]
+            else:
+                fail("item_id or item_index is required")
+            if item_id in deleted_ids:
+                fail(f"Item {item_id} was deleted earlier in this batch")
+            if o.row_version is not None:
+                _lock_item(cur, quotation_id, item_id, o.row_version)
+
+            if o.op == "delete":
+                cur.execute("DELETE FROM quotation_items WHERE item_id = %s", (item_id,))
+                deleted_ids.add(item_id)
+                deleted.append(item_id)
+                continue
+
+            changes = {k: v for k, v in (("quantity", o.quantity), ("unit_rate", o.unit_rate),
+                                          ("test_standard", o.test_standard), ("description", o.description))
+                       if v is not None}
+            if not changes:
+                fail("Must provide quantity, unit_rate, test_standard or description")
+            assignments = ", ".join(f"{column} = %s" for column in changes)
+            cur.execute(f"""
+                UPDATE quotation_items SET {assignments}
+                WHERE item_id = %s
+                RETURNING amount
+            """, (*changes.values(), item_id))
+            updated.append({"item_id": item_id, "fields": list(changes), "new_amount": float(cur.fetchone()[0])})
+
+        added = []
+        if new_rows:
+            inserted = execute_values(cur, """
+                INSERT INTO quotation_items
+                    (quotation_id, item_code, description, test_standard, unit_rate, quantity)
+                VALUES %s
+                RETURNING item_id
+            """, new_rows, fetch=True)
+            added = sorted(r[0] for r in inserted)
+
+        totals = _quotation_totals(cur, quotation_id)
+        conn.commit()
+
+        return {
+            "message": f"{len(payload.operations)} operation(s) applied",
+            "quotation_id": quotation_id,
+            "added_item_ids": added,
+            "updated": updated,
+            "deleted_item_ids": deleted,
+            "totals": totals,
         }
 
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(500, str(e))
@@ -545,33 +695,15 @@ def create_revision(quotation_id: int):
             WHERE quotation_id = %s
         """, (new_qid, quotation_id))
 
-        # Recalculate totals
-        cur.execute("""
-            UPDATE quotations
-            SET total_amount = sub.total,
-                vat = sub.total * %s,
-                grand_total = sub.total * (1 + %s)
-            FROM (
-                SELECT SUM(amount) AS total
-                FROM quotation_items
-                WHERE quotation_id = %s
-            ) sub
-            WHERE quotation_id = %s
-            RETURNING total_amount, vat, grand_total
-        """, (VAT_RATE, VAT_RATE, new_qid, new_qid))
-
-        totals = cur.fetchone()
+        # Totals are maintained by the quotation_items triggers
+        totals = _quotation_totals(cur, new_qid)
         conn.commit()
 
         return {
             "message": "Revision created",
             "new_quotation_id": new_qid,
             "new_quotation_no": new_q_no,
-            "totals": {
-                "total_amount": float(totals[0]),
-                "vat": float(totals[1]),
-                "grand_total": float(totals[2]),
-            }
+            "totals": totals
         }
 
     except Exception as e:
@@ -638,6 +770,7 @@ def list_quotations(limit: int = 100, offset: int = 0):
 @router.get("/{quotation_id}/download", summary="Download Quotation as Word Document")
 def download_quotation(quotation_id: int):
     """Generate and download quotation from Supabase Cloud template"""
+    from template_processor import QuotationTemplateProcessor
     conn = get_connection()
     cur = conn.cursor()
 
@@ -702,13 +835,13 @@ def download_quotation(quotation_id: int):
         # 1. Select the correct URL
         template_url = TEMPLATE_URLS.get(division, TEMPLATE_URLS["DEFAULT"])
         
-        # 2. Download from Supabase
-        response = requests.get(template_url)
-        if response.status_code != 200:
+        # 2. Download from Supabase (cached per process, see template_cache.py)
+        template_bytes = template_cache.fetch(template_url, missing_ok=True)
+        if template_bytes is None:
             raise HTTPException(500, f"Cloud Template for {division} not found at {template_url}")
         
         # 3. Create a virtual file in memory
-        template_stream = BytesIO(response.content)
+        template_stream = BytesIO(template_bytes)
         
         # 4. Pass the stream to your processor
         template_processor = QuotationTemplateProcessor(template_stream)
@@ -758,7 +891,7 @@ def quotation_details(quotation_id: int):
 
         # Fetch items
         cur.execute("""
-            SELECT description, test_standard, unit_rate, quantity, amount
+            SELECT description, test_standard, unit_rate, quantity, amount, item_id, row_version
             FROM quotation_items
             WHERE quotation_id = %s
             ORDER BY item_id
@@ -770,7 +903,9 @@ def quotation_details(quotation_id: int):
                 "test_standard": r[1],
                 "unit_rate": float(r[2]),
                 "quantity": r[3],
-                "amount": float(r[4])
+                "amount": float(r[4]),
+                "item_id": r[5],
+                "row_version": r[6]
             }
             for r in cur.fetchall()
         ]
@@ -810,19 +945,24 @@ def quotation_details(quotation_id: int):
 
 @router.get("/price-catalog/", summary="Get Active Price Catalog Items")
 def get_price_catalog():
-    """Get all active items from price catalog for dropdown selection"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
+    """Get all active items from price catalog for dropdown selection (served from ref_cache)"""
+    def load():
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                SELECT catalog_id, code, description, test_standard, unit_rate, unit, active, group_name
+                FROM price_catalog 
+                WHERE active = true
+                ORDER BY code
+            """)
+            return tuple(cur.fetchall())
+        finally:
+            cur.close()
+            conn.close()
+
     try:
-        cur.execute("""
-            SELECT catalog_id, code, description, test_standard, unit_rate, unit, active, group_name
-            FROM price_catalog 
-            WHERE active = true
-            ORDER BY code
-        """)
-        
-        items = cur.fetchall()
+        items = ref_cache.price_catalog.get_or_load("active", load)
         
         return [
             {
@@ -840,21 +980,186 @@ def get_price_catalog():
         
     except Exception as e:
         raise HTTPException(500, f"Failed to fetch price catalog: {str(e)}")
+
+
+
+
+
+
+# Add to quotations.py after existing endpoints
+
+# ============================================================
+# UPDATE / DELETE ITEM BY ID (OPTIMISTIC CONCURRENCY)
+# ============================================================
+# Items are addressed by item_id. The client sends back the row_version it read
+# (GET /quotations/{id} lists it per item); if someone changed the line in the
+# meantime the edit is refused with 409 and the current row, instead of
+# silently overwriting it. Omitting row_version overwrites unconditionally.
+
+class ItemUpdateById(BaseModel):
+    quantity: Optional[int] = None
+    unit_rate: Optional[float] = None
+    test_standard: Optional[str] = None
+    row_version: Optional[int] = None
+
+
+def _check_quotation_editable(cur, quotation_id, message="Only DRAFT or APPROVED quotations can be modified"):
+    cur.execute("SELECT status FROM quotations WHERE quotation_id = %s", (quotation_id,))
+    quote = cur.fetchone()
+    if not quote:
+        raise HTTPException(404, "Quotation not found")
+    if quote[0] not in ['DRAFT', 'APPROVED']:
+        raise HTTPException(400, message)
+
+
+def _item_id_at(cur, quotation_id, item_index):
+    """item_id of the item_index-th (0-based) line, for the index-addressed wrappers."""
+    cur.execute("""
+        SELECT item_id
+        FROM quotation_items
+        WHERE quotation_id = %s
+        ORDER BY item_id
+        OFFSET %s LIMIT 1
+    """, (quotation_id, item_index))
+    item = cur.fetchone()
+    if not item:
+        raise HTTPException(404, "Item not found")
+    return item[0]
+
+
+def _lock_item(cur, quotation_id, item_id, row_version):
+    """Lock the item row and check its version. Returns (unit_rate, quantity, test_standard, amount, row_version)."""
+    cur.execute("""
+        SELECT unit_rate, quantity, test_standard, amount, row_version
+        FROM quotation_items
+        WHERE item_id = %s AND quotation_id = %s
+        FOR UPDATE
+    """, (item_id, quotation_id))
+    item = cur.fetchone()
+    if not item:
+        raise HTTPException(404, "Item not found")
+    if row_version is not None and item[4] != row_version:
+        raise HTTPException(409, {
+            "message": "Item was changed by someone else, reload and retry",
+            "item_id": item_id,
+            "current": {
+                "unit_rate": float(item[0]),
+                "quantity": item[1],
+                "test_standard": item[2],
+                "amount": float(item[3]),
+                "row_version": item[4],
+            },
+        })
+    return item
+
+
+def _update_item_by_id(cur, quotation_id, item_id, changes, row_version=None):
+    """
+    Apply {column: value} (quantity / unit_rate / test_standard) to one item.
+    Returns (old row, new row, totals).
+    """
+    if changes.get("quantity") is not None and changes["quantity"] <= 0:
+        raise HTTPException(400, "Quantity must be greater than zero")
+    if changes.get("unit_rate") is not None and changes["unit_rate"] < 0:
+        raise HTTPException(400, "Unit rate cannot be negative")
+    changes = {k: v for k, v in changes.items() if v is not None}
+    if not changes:
+        raise HTTPException(400, "Must provide quantity, unit_rate, or test_standard")
+
+    old = _lock_item(cur, quotation_id, item_id, row_version)
+
+    assignments = ", ".join(f"{column} = %s" for column in changes)
+    cur.execute(f"""
+        UPDATE quotation_items
+        SET {assignments}
+        WHERE item_id = %s
+        RETURNING unit_rate, quantity, test_standard, amount, row_version
+    """, (*changes.values(), item_id))
+    new = cur.fetchone()
+
+    return old, new, _quotation_totals(cur, quotation_id)
+
+
+def _delete_item_by_id(cur, quotation_id, item_id, row_version=None):
+    _lock_item(cur, quotation_id, item_id, row_version)
+    cur.execute("""
+        DELETE FROM quotation_items
+        WHERE item_id = %s
+    """, (item_id,))
+    return _quotation_totals(cur, quotation_id)
+
+
+@router.put("/{quotation_id}/items/by-id/{item_id}", summary="Update Item by ID")
+def update_item_by_id(quotation_id: int, item_id: int, payload: ItemUpdateById):
+    """Update any of quantity, unit_rate and test_standard of one item, guarded by row_version"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        _check_quotation_editable(cur, quotation_id)
+        old, new, totals = _update_item_by_id(cur, quotation_id, item_id, {
+            "quantity": payload.quantity,
+            "unit_rate": payload.unit_rate,
+            "test_standard": payload.test_standard,
+        }, payload.row_version)
+        conn.commit()
+
+        return {
+            "message": "Item updated",
+            "item_id": item_id,
+            "item": {
+                "unit_rate": float(new[0]),
+                "quantity": new[1],
+                "test_standard": new[2],
+                "amount": float(new[3]),
+                "row_version": new[4],
+            },
+            "totals": totals,
+        }
+
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, str(e))
     finally:
         cur.close()
         conn.close()
 
 
+@router.delete("/{quotation_id}/items/by-id/{item_id}", summary="Delete Item by ID")
+def delete_item_by_id(quotation_id: int, item_id: int, row_version: Optional[int] = None):
+    """Delete one item; with ?row_version= only if it has not changed since it was read"""
+    conn = get_connection()
+    cur = conn.cursor()
 
+    try:
+        _check_quotation_editable(cur, quotation_id, "Only DRAFT quotations can be modified")
+        totals = _delete_item_by_id(cur, quotation_id, item_id, row_version)
+        conn.commit()
 
+        return {
+            "message": "Item deleted",
+            "item_id": item_id,
+            "totals": totals,
+        }
 
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, str(e))
+    finally:
+        cur.close()
+        conn.close()
 
-# Add to quotations.py after existing endpoints
 
 # ============================================================
 # UPDATE ITEM QUANTITY
 # ============================================================
-# Update the UPDATE endpoint in quotations.py
+# Index-addressed wrapper kept for the existing screens; prefer /items/by-id/{item_id}
 @router.put("/{quotation_id}/items/{item_index}", summary="Update Item Quantity, Unit Rate, or Test Standard")
 def update_item(quotation_id: int, item_index: int, payload: dict):
     """Update quantity, unit rate, or test standard of a specific item in a quotation"""
@@ -862,135 +1167,27 @@ def update_item(quotation_id: int, item_index: int, payload: dict):
     cur = conn.cursor()
 
     try:
-        # Validate quotation exists and is in DRAFT/APPROVED status
-        cur.execute("""
-            SELECT status FROM quotations 
-            WHERE quotation_id = %s
-        """, (quotation_id,))
-        
-        quote = cur.fetchone()
-        
-        if not quote:
-            raise HTTPException(404, "Quotation not found")
-        
-        if quote[0] not in ['DRAFT', 'APPROVED']:
-            raise HTTPException(400, "Only DRAFT or APPROVED quotations can be modified")
-        
-        # Get the item_id for the given index
-        cur.execute("""
-            SELECT item_id, unit_rate, quantity, test_standard
-            FROM quotation_items
-            WHERE quotation_id = %s
-            ORDER BY item_id
-            OFFSET %s LIMIT 1
-        """, (quotation_id, item_index))
-        
-        item = cur.fetchone()
-        
-        if not item:
-            raise HTTPException(404, "Item not found")
-        
-        item_id, current_unit_rate, current_quantity, current_test_standard = item
-        
-        # Check what fields are being updated
-        quantity = payload.get('quantity')
-        unit_rate = payload.get('unit_rate')
-        test_standard = payload.get('test_standard')
-        
-        update_field = None
-        new_value = None
-        current_value = None
-        
-        if quantity is not None:
-            if quantity <= 0:
-                raise HTTPException(400, "Quantity must be greater than zero")
-            update_field = 'quantity'
-            new_value = quantity
-            current_value = current_quantity
-        elif unit_rate is not None:
-            if unit_rate < 0:
-                raise HTTPException(400, "Unit rate cannot be negative")
-            update_field = 'unit_rate'
-            new_value = unit_rate
-            current_value = current_unit_rate
-        elif test_standard is not None:
-            update_field = 'test_standard'
-            new_value = test_standard
-            current_value = current_test_standard
-        else:
+        _check_quotation_editable(cur, quotation_id)
+        item_id = _item_id_at(cur, quotation_id, item_index)
+
+        # One field per call, in this order of precedence
+        update_field = next((f for f in ('quantity', 'unit_rate', 'test_standard')
+                             if payload.get(f) is not None), None)
+        if update_field is None:
             raise HTTPException(400, "Must provide quantity, unit_rate, or test_standard")
-        
-        # Update the item
-        if update_field == 'quantity':
-            cur.execute("""
-                UPDATE quotation_items
-                SET quantity = %s
-                WHERE item_id = %s
-                RETURNING amount
-            """, (new_value, item_id))
-        elif update_field == 'unit_rate':
-            cur.execute("""
-                UPDATE quotation_items
-                SET unit_rate = %s
-                WHERE item_id = %s
-                RETURNING amount
-            """, (new_value, item_id))
-        elif update_field == 'test_standard':
-            cur.execute("""
-                UPDATE quotation_items
-                SET test_standard = %s
-                WHERE item_id = %s
-                RETURNING amount
-            """, (new_value, item_id))
-        
-        updated_amount = cur.fetchone()[0]
-        
-        # Only recalculate totals if quantity or unit rate changed
-        if update_field in ['quantity', 'unit_rate']:
-            cur.execute("""
-                UPDATE quotations
-                SET total_amount = COALESCE(sub.total, 0),
-                    vat = COALESCE(sub.total, 0) * %s,
-                    grand_total = COALESCE(sub.total, 0) * (1 + %s)
-                FROM (
-                    SELECT SUM(amount) AS total
-                    FROM quotation_items
-                    WHERE quotation_id = %s
-                ) sub
-                WHERE quotation_id = %s
-                RETURNING total_amount, vat, grand_total
-            """, (VAT_RATE, VAT_RATE, quotation_id, quotation_id))
-            
-            totals = cur.fetchone()
-            total_amount = float(totals[0])
-            vat = float(totals[1])
-            grand_total = float(totals[2])
-        else:
-            # For test_standard updates, fetch current totals
-            cur.execute("""
-                SELECT total_amount, vat, grand_total
-                FROM quotations
-                WHERE quotation_id = %s
-            """, (quotation_id,))
-            totals = cur.fetchone()
-            total_amount = float(totals[0])
-            vat = float(totals[1])
-            grand_total = float(totals[2])
-        
+
+        old, new, totals = _update_item_by_id(cur, quotation_id, item_id, {update_field: payload[update_field]})
         conn.commit()
-        
+
+        column = {'unit_rate': 0, 'quantity': 1, 'test_standard': 2}[update_field]
         return {
             "message": f"Item {update_field} updated",
             "item_id": item_id,
             "update_field": update_field,
-            "old_value": current_value if update_field != 'test_standard' else str(current_value),
-            "new_value": new_value if update_field != 'test_standard' else str(new_value),
-            "new_amount": float(updated_amount) if update_field in ['quantity', 'unit_rate'] else None,
-            "totals": {
-                "total_amount": total_amount,
-                "vat": vat,
-                "grand_total": grand_total,
-            }
+            "old_value": old[column] if update_field != 'test_standard' else str(old[column]),
+            "new_value": payload[update_field] if update_field != 'test_standard' else str(payload[update_field]),
+            "new_amount": float(new[3]) if update_field in ['quantity', 'unit_rate'] else None,
+            "totals": totals
         }
         
     except Exception as e:
@@ -1002,7 +1199,7 @@ def update_item(quotation_id: int, item_index: int, payload: dict):
 # ============================================================
 # DELETE ITEM
 # ============================================================
-
+# Index-addressed wrapper kept for the existing screens; prefer /items/by-id/{item_id}
 @router.delete("/{quotation_id}/items/{item_index}", summary="Delete Item from Quotation")
 def delete_item(quotation_id: int, item_index: int):
     """Delete a specific item from a quotation"""
@@ -1010,68 +1207,15 @@ def delete_item(quotation_id: int, item_index: int):
     cur = conn.cursor()
 
     try:
-        # Validate quotation exists and is in DRAFT status
-        cur.execute("""
-            SELECT status FROM quotations 
-            WHERE quotation_id = %s
-        """, (quotation_id,))
-        
-        quote = cur.fetchone()
-        
-        if not quote:
-            raise HTTPException(404, "Quotation not found")
-        
-        if quote[0] not in ['DRAFT', 'APPROVED']:
-            raise HTTPException(400, "Only DRAFT quotations can be modified")
-        
-        # Get the item_id for the given index
-        cur.execute("""
-            SELECT item_id
-            FROM quotation_items
-            WHERE quotation_id = %s
-            ORDER BY item_id
-            OFFSET %s LIMIT 1
-        """, (quotation_id, item_index))
-        
-        item = cur.fetchone()
-        
-        if not item:
-            raise HTTPException(404, "Item not found")
-        
-        item_id = item[0]
-        
-        # Delete the item
-        cur.execute("""
-            DELETE FROM quotation_items
-            WHERE item_id = %s
-        """, (item_id,))
-        
-        # Recalculate quotation totals
-        cur.execute("""
-            UPDATE quotations
-            SET total_amount = COALESCE(sub.total, 0),
-                vat = COALESCE(sub.total, 0) * %s,
-                grand_total = COALESCE(sub.total, 0) * (1 + %s)
-            FROM (
-                SELECT SUM(amount) AS total
-                FROM quotation_items
-                WHERE quotation_id = %s
-            ) sub
-            WHERE quotation_id = %s
-            RETURNING total_amount, vat, grand_total
-        """, (VAT_RATE, VAT_RATE, quotation_id, quotation_id))
-        
-        totals = cur.fetchone()
+        _check_quotation_editable(cur, quotation_id, "Only DRAFT quotations can be modified")
+        item_id = _item_id_at(cur, quotation_id, item_index)
+        totals = _delete_item_by_id(cur, quotation_id, item_id)
         conn.commit()
         
         return {
             "message": "Item deleted",
             "item_id": item_id,
-            "totals": {
-                "total_amount": float(totals[0]),
-                "vat": float(totals[1]),
-                "grand_total": float(totals[2]),
-            }
+            "totals": totals
         }
         
     except Exception as e:
@@ -1079,4 +1223,4 @@ def delete_item(quotation_id: int, item_index: int):
         raise HTTPException(500, str(e))
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
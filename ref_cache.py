@@ -0,0 +1,250 @@
+# ref_cache.py
+"""
+In-process cache for reference data.
+
+The price catalog, client list, user list and project/client headers are read
+on nearly every screen and document but change a few times a day. They are
+kept here for REF_CACHE_TTL_SEC seconds (default 300, 0 disables caching);
+endpoints that write them call invalidate() so this process never serves a
+value older than its own last write.
+
+Other processes (more API nodes, the EXE on other lab PCs, Supabase console
+edits) are covered by triggers (migrations/0006) that NOTIFY ref_cache on
+every write. start_listener() keeps one connection LISTENing and drops the
+matching entries as notifications arrive; after a lost connection it flushes
+everything, since notifications sent meanwhile are gone. REF_CACHE_LISTEN=0
+disables it, REF_CACHE_LISTEN_URL points it at a different (non-pooled)
+connection string.
+
+Hit/miss counters per cache and the listener state are served by
+GET /api/cache-stats.
+"""
+import os
+import select
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import psycopg2
+
+from db import connect
+
+DEFAULT_TTL = float(os.getenv("REF_CACHE_TTL_SEC", "300"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds."""
+
+    def __init__(self, name: str, maxsize: int = 128, ttl: float = DEFAULT_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(); a load that started before it is not stored
+        self._generation = 0
+        self.hits = self.misses = self.expired = self.evictions = self.invalidations = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Cached value for key, calling loader() on a miss. None results are not cached."""
+        if self.ttl <= 0:
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        if value is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or everything when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_sec": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+price_catalog = TTLCache("price_catalog", maxsize=1)
+clients = TTLCache("clients", maxsize=1)
+users = TTLCache("users", maxsize=1)
+project_headers = TTLCache("project_headers", maxsize=1024)
+
+CACHES = {cache.name: cache for cache in (price_catalog, clients, users, project_headers)}
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "caches": {name: cache.stats() for name, cache in CACHES.items()},
+        "listener": dict(listener_state),
+    }
+
+
+def flush_all() -> None:
+    for cache in CACHES.values():
+        cache.invalidate()
+
+
+# ----------------------------
+# Cross-process invalidation
+# ----------------------------
+CHANNEL = "ref_cache"
+KEEPALIVE_SEC = 30
+# NOTIFY payload "<topic>[:<key>]" -> caches it invalidates. A topic that is
+# not listed here but names a cache (publish(cur, "templates")) drops that cache.
+TOPIC_CACHES = {
+    "price_catalog": ("price_catalog",),
+    "clients": ("clients", "project_headers"),  # the header carries client name/address
+    "users": ("users",),
+    "projects": ("project_headers",),
+}
+
+listener_state: Dict[str, Any] = {
+    "enabled": False, "connected": False, "notifications": 0, "reconnects": 0, "last_error": None,
+}
+_listening = threading.Event()  # set once the first LISTEN (and its flush) is done
+
+
+def publish(cur, topic: str, key: Optional[Hashable] = None) -> None:
+    """Tell every process to drop a cache (delivered when cur's transaction commits)."""
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, topic if key is None else f"{topic}:{key}"))
+
+
+def apply_notification(payload: str) -> None:
+    topic, _, key = payload.partition(":")
+    key = int(key) if key.isdigit() else (key or None)
+    for name in TOPIC_CACHES.get(topic, (topic,)):
+        cache = CACHES.get(name)
+        if cache is not None:
+            cache.invalidate(key)
+
+
+def _listen_connection():
+    url = os.getenv("REF_CACHE_LISTEN_URL")
+    return psycopg2.connect(url) if url else connect()
+
+
+def _listen_forever() -> None:
+    delay = 1
+    while True:
+        conn = None
+        try:
+            conn = _listen_connection()
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CHANNEL}")
+            # Anything cached before this point may have missed a notification
+            flush_all()
+            listener_state.update(connected=True, last_error=None)
+            _listening.set()
+            delay = 1
+            while True:
+                if not select.select([conn], [], [], KEEPALIVE_SEC)[0]:
+                    cur.execute("SELECT 1")  # surfaces a dead connection
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    apply_notification(conn.notifies.pop(0).payload)
+                    listener_state["notifications"] += 1
+        except Exception as e:
+            listener_state.update(connected=False, last_error=str(e))
+            print(f"WARNING: ref_cache listener lost its connection ({e}), retrying in {delay}s")
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        flush_all()
+        time.sleep(delay)
+        delay = min(delay * 2, 60)
+        listener_state["reconnects"] += 1
+
+
+def wait_until_listening(timeout: float = 5) -> bool:
+    """For warm-up: entries loaded before the listener connects are flushed by it."""
+    if not listener_state["enabled"]:
+        return True
+    return _listening.wait(timeout)
+
+
+def start_listener() -> Optional[threading.Thread]:
+    """Start the LISTEN thread unless caching or REF_CACHE_LISTEN is off."""
+    if DEFAULT_TTL <= 0 or os.getenv("REF_CACHE_LISTEN", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    listener_state["enabled"] = True
+    thread = threading.Thread(target=_listen_forever, name="ref-cache-listener", daemon=True)
+    thread.start()
+    return thread
+
+
+# ----------------------------
+# Project / client header
+# ----------------------------
+# Same column order as the header SELECT the invoice endpoints used to run,
+# so project_data[0..12] keeps its meaning; quotation_id is appended.
+ProjectHeader = namedtuple("ProjectHeader", [
+    "project_id", "project_no", "project_name", "location", "lpo_no", "lpo_date",
+    "client_id", "client_name", "contact_person", "email", "address", "phone",
+    "quotation_no", "quotation_id",
+])
+
+
+def project_header(cur, project_id: int, require_quotation: bool = False) -> Optional[ProjectHeader]:
+    """
+    Project + client header used by the document endpoints, or None if the
+    project does not exist (or has no quotation when require_quotation).
+    """
+    def load():
+        cur.execute("""
+            SELECT p.project_id, p.project_no, p.project_name, p.location, p.lpo_no, p.lpo_date,
+                   c.client_id, c.name, c.contact_person, c.email, c.address, c.phone,
+                   q.quotation_no, q.quotation_id
+            FROM projects p
+            JOIN clients c ON p.client_id = c.client_id
+            LEFT JOIN quotations q ON p.quotation_id = q.quotation_id
+            WHERE p.project_id = %s
+        """, (project_id,))
+        row = cur.fetchone()
+        return ProjectHeader(*row) if row else None
+
+    header = project_headers.get_or_load(int(project_id), load)
+    if header is None or (require_quotation and header.quotation_id is None):
+        return None
+    return header
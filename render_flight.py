@@ -0,0 +1,104 @@
+# render_flight.py
+"""
+Single-flight document renders and atomic output files.
+
+When a supervisor and an accountant open the same invoice at once, or the
+frontend fires a download twice, the invoice was rendered twice (template
+load, openpyxl fill, save) and both requests wrote the same
+generated_invoices/{invoice_no}.xlsx - one could read or send the other's
+half-written file.
+
+renders.run(key, render) runs render() once per key at a time: requests
+arriving while it is in flight wait for it and get the same result (or the
+same exception). The key is (document kind, entity id, data version), the
+version being data_version() of the rows the document is built from, so a
+request made after an edit never receives the document of the older data.
+Nothing is kept once the render finishes; it is coalescing, not a cache.
+
+save_workbook() / write_atomic() write an output file under a temporary
+name in the same folder and rename it into place, so readers see either
+the previous file or the complete new one.
+
+Counters are under "renders" in GET /api/cache-stats.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from io import BytesIO
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.started = self.joined = self.failed = 0
+
+    def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.started += 1
+            else:
+                self.joined += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+                self.failed += 1
+            call.set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        call.set_result(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "started": self.started,
+                    "joined": self.joined, "failed": self.failed}
+
+
+renders = SingleFlight("renders")
+
+
+def data_version(*parts: Any) -> str:
+    """Short digest of the data a document is rendered from (dates, Decimals as str)."""
+    payload = json.dumps(parts, default=str, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Unique per writer, same folder (os.replace cannot cross file systems)
+    temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_workbook(wb, path: str) -> bytes:
+    """wb.save(path), atomically; returns the file's bytes."""
+    buffer = BytesIO()
+    wb.save(buffer)
+    data = buffer.getvalue()
+    write_atomic(path, data)
+    return data
@@ -1,5 +1,5 @@
 # reports.py - UPDATED VERSION FOR COMBINED REPORTS PER TEST TYPE EXCEL TEMPLATE SUPA
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Response
 from fastapi.responses import FileResponse
 from typing import Optional, List, Dict, Any
 from datetime import datetime
@@ -9,12 +9,16 @@ import shutil
 import secrets
 import sys
 
-import requests
 from utils import resource_path
+from storage import template_url
+import ref_cache
+import template_cache
+import render_flight
+from http_cache import not_modified, with_validators
+from fast_json import fast_response
+# openpyxl is imported inside the functions that use it (startup_report.py);
+# templates come through template_cache
 
-
-import openpyxl
-from openpyxl.styles import Font, Alignment
 import tempfile
 
 router = APIRouter(tags=["Reports"])
@@ -27,7 +31,7 @@ else:
 os.makedirs(REPORTS_UPLOAD_DIR, exist_ok=True)
 
 
-SUPABASE_STORAGE_URL = "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates"
+SUPABASE_STORAGE_URL = template_url("").rstrip("/")
 # ---------------------------
 # NEW: Helper to get test type distribution for a request
 # ---------------------------
@@ -38,11 +42,15 @@ SUPABASE_STORAGE_URL = "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/obje
 
 # Add this endpoint to allow the SearchBar to fetch all reports
 @router.get("/")
-def get_all_reports():
+def get_all_reports(request: Request, response: Response):
     """Get all reports for the search interface"""
     conn = get_connection()
     cur = conn.cursor()
     try:
+        cached = not_modified(request, response, cur, ("reports", "samples"))
+        if cached:
+            return cached
+
         cur.execute("""
             SELECT r.report_id, r.report_no, r.sample_id, r.status, 
                    r.created_at, r.uploaded_by, s.sample_no
@@ -86,9 +94,9 @@ def get_template_from_supabase(item_code: str, test_name: str):
         template_url = f"{SUPABASE_STORAGE_URL}/reports/{filename}"
         
         try:
-            # Check if the file exists by making a HEAD request
-            response = requests.head(template_url)
-            if response.status_code == 200:
+            # Existence check through the template cache: the hit is downloaded
+            # anyway right after, and misses are remembered
+            if template_cache.fetch(template_url, missing_ok=True) is not None:
                 return template_url, filename.split('.')[-1]
         except Exception:
             continue
@@ -478,14 +486,14 @@ def download_report_template_by_no(sample_no: str):
         
         # Download the template from Supabase
         try:
-            response = requests.get(template_path)
-            if response.status_code != 200:
+            content = template_cache.fetch(template_path, missing_ok=True)
+            if content is None:
                 raise HTTPException(404, f"Template not found in storage: {template_path}")
             
             # Return the file content
             filename = os.path.basename(template_path)
             return Response(
-                content=response.content,
+                content=content,
                 media_type='application/octet-stream',
                 headers={'Content-Disposition': f'attachment; filename="{filename}"'}
             )
@@ -696,17 +704,22 @@ async def upload_report(
 # ---------------------------
 # 6. Get Reports with New Format - FIXED
 # ---------------------------
+# Every table the get_reports query below reads; a change to any of them changes its ETag
+GET_REPORTS_TABLES = ("reports", "samples", "test_request_items", "quotation_items", "users")
+
+
 @router.get("")
-def get_reports(status: Optional[str] = None):
+def get_reports(request: Request, response: Response, status: Optional[str] = None):
     """Get reports with optional status filter - shows which test type they cover - FIXED VERSION"""
-    print(f"\n" + "="*50)
-    print(f"DEBUG: get_reports called with status={status}")
-    print(f"="*50 + "\n")
-    
     conn = get_connection()
     cur = conn.cursor()
     
     try:
+        # Polled by the review queue: answer 304 while nothing the query reads has changed
+        cached = not_modified(request, response, cur, GET_REPORTS_TABLES, key=f"status={status or 'ALL'}")
+        if cached:
+            return cached
+
         # IMPORTANT: Use DISTINCT to get unique report_no entries
         # Use covers_test_type from reports table instead of joining with quotation_items
         query = """
@@ -743,23 +756,15 @@ def get_reports(status: Optional[str] = None):
         
         query += " ORDER BY r.report_no, r.created_at DESC"
         
-        print(f"DEBUG: Executing query:\n{query}")
-        print(f"DEBUG: Query params: {params}")
-        
         cur.execute(query, tuple(params))
         
         columns = [desc[0] for desc in cur.description]
-        print(f"DEBUG: Query columns: {columns}")
-        
         all_rows = cur.fetchall()
-        print(f"DEBUG: Fetched {len(all_rows)} rows from database")
         
         reports = []
         
-        for i, row in enumerate(all_rows):
-            print(f"\nDEBUG: Row {i}: {row}")
+        for row in all_rows:
             report_dict = dict(zip(columns, row))
-            print(f"DEBUG: Report dict: {report_dict.get('report_no')}")
             
             # Get all samples covered by this report (same report_no)
             cur.execute("""
@@ -771,30 +776,20 @@ def get_reports(status: Optional[str] = None):
             """, (report_dict["report_no"],))
             
             covered_samples = [row[0] for row in cur.fetchall()]
-            print(f"DEBUG: Covered samples for {report_dict.get('report_no')}: {covered_samples}")
             
             report_dict["covered_samples"] = covered_samples
             report_dict["sample_count"] = len(covered_samples)
             
             reports.append(report_dict)
         
-        print(f"\n" + "="*50)
-        print(f"DEBUG: Returning {len(reports)} reports")
-        print(f"DEBUG: Reports: {reports}")
-        print(f"="*50 + "\n")
-        
-        # If empty, return a test structure
-        if len(reports) == 0:
-            print("WARNING: No reports found! Returning test data structure")
+        print(f"DEBUG: get_reports status={status}: {len(reports)} reports")
         
-        return reports
+        return with_validators(fast_response(reports), response)
         
     except Exception as e:
-        print(f"\n" + "!"*50)
         print(f"ERROR in get_reports: {str(e)}")
         import traceback
         traceback.print_exc()
-        print(f"!"*50 + "\n")
         raise HTTPException(500, f"Error fetching reports: {str(e)}")
     finally:
         cur.close()
@@ -1196,6 +1191,18 @@ async def replace_report_file(
 
 
 
+def report_download_name(report_no, original_filename, file_type):
+    """File name a report is downloaded under: report number plus the uploaded name."""
+    clean_report_no = report_no.replace(' ', '').replace('-', '_')
+    if original_filename:
+        clean_original = original_filename.rstrip('_ ')  # REMOVE TRAILING UNDERSCORE
+        filename = f"{clean_report_no}_{clean_original}"
+    else:
+        ext = f".{file_type}" if file_type else ""
+        filename = f"{clean_report_no}_report{ext}"
+    return filename.rstrip('_ ')
+
+
 # ---------------------------
 # 13. Download Report File - NEW ENDPOINT FOR VIEWREPORTS.JSX
 # ---------------------------
@@ -1234,17 +1241,7 @@ def download_report_file(report_id: int):
         
         media_type = content_types.get(file_type.lower(), 'application/octet-stream')
         
-        # Generate a clean filename
-        clean_report_no = report_no.replace(' ', '').replace('-', '_')  # FIXED LINE
-        if original_filename:
-            clean_original = original_filename.rstrip('_ ')  # REMOVE TRAILING UNDERSCORE
-            filename = f"{clean_report_no}_{clean_original}"
-        else:
-            ext = f".{file_type}" if file_type else ""
-            filename = f"{clean_report_no}_report{ext}"
-        
-        # Optional: final cleanup
-        filename = filename.rstrip('_ ')
+        filename = report_download_name(report_no, original_filename, file_type)
         
         return FileResponse(
             path=file_path,
@@ -1288,11 +1285,12 @@ def populate_report_template_from_url(template_url: str, report_data: dict) -> s
     Returns:
         Path to the populated Excel file
     """
+    import openpyxl
     temp_template_path = None
     try:
         # Download the template from URL
-        response = requests.get(template_url)
-        if response.status_code != 200:
+        content = template_cache.fetch(template_url, missing_ok=True)
+        if content is None:
             raise Exception(f"Failed to download template from {template_url}")
         
         temp_dir = tempfile.gettempdir()
@@ -1300,7 +1298,7 @@ def populate_report_template_from_url(template_url: str, report_data: dict) -> s
         temp_template_path = os.path.join(temp_dir, temp_template_filename)
         
         with open(temp_template_path, 'wb') as f:
-            f.write(response.content)
+            f.write(content)
         
         # Load the workbook
         wb = openpyxl.load_workbook(temp_template_path)
@@ -1336,7 +1334,7 @@ def populate_report_template_from_url(template_url: str, report_data: dict) -> s
         temp_filename = f"populated_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         temp_path = os.path.join(temp_dir, temp_filename)
         
-        wb.save(temp_path)
+        render_flight.save_workbook(wb, temp_path)
         wb.close()
         
         return temp_path
@@ -1430,19 +1428,11 @@ async def download_populated_template_by_sample(
                     break
         
         # Get project details
-        cur.execute("""
-            SELECT p.project_no, p.project_name, p.location,
-                   c.name as client_name
-            FROM projects p
-            JOIN clients c ON p.client_id = c.client_id
-            WHERE p.project_id = %s
-        """, (project_id,))
-        
-        project_data = cur.fetchone()
+        project_data = ref_cache.project_header(cur, project_id)
         if not project_data:
             raise HTTPException(404, "Project not found")
         
-        project_no, project_name, location, client_name = project_data
+        project_no, location, client_name = project_data.project_no, project_data.location, project_data.client_name
         
         # Get test item details
         cur.execute("""
@@ -1,12 +1,18 @@
 # samples_workflow.py - FIXED VERSION WITH CONSISTENT TEST ASSIGNMENT with excel template
 # Each sample gets ONE test at creation and keeps it forever
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 from db import get_connection
 from utils import resource_path
+from storage import template_url
+import template_cache
+import render_flight
+import jobs
+from http_cache import not_modified
+from fast_json import fast_response
 
 from fastapi import UploadFile, File
 import shutil
@@ -15,13 +21,12 @@ import sys
 import tempfile 
 import secrets
 from decimal import Decimal
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+import psycopg2
+from psycopg2.extras import execute_values
+from zip_stream import stream_zip
 
-import openpyxl
-from openpyxl import load_workbook
-
-# Add these imports for Supabase template downloading
-import requests
+# openpyxl and requests are imported inside the functions that use them (startup_report.py)
 import tempfile
 
 router = APIRouter(prefix="/samples-workflow", tags=["Samples Workflow"])
@@ -36,63 +41,61 @@ os.makedirs(WORKSHEET_TEMPLATES_DIR, exist_ok=True)
 # ---------------------------
 # NEW: Function to download worksheet templates from Supabase
 # ---------------------------
+def worksheet_template_urls(item_code: str):
+    """Storage URLs tried for an item's worksheet template, most specific first"""
+    return [
+        template_url(f"worksheets/{item_code}.xlsx"),
+        template_url(f"worksheets/{item_code}_Worksheet.xlsx"),
+        template_url(f"worksheets/{item_code}.xls")
+    ]
+
+
+GENERIC_WORKSHEET_TEMPLATES = ("worksheets/DEFAULT_Worksheet.xlsx", "worksheets/GENERIC_Worksheet.xlsx")
+
+
+def worksheet_template_bytes(item_code: str):
+    """
+    (url, bytes) of the worksheet template for item_code - its name variants,
+    as written, upper and lower case, then the generic template - or
+    (None, None). Downloads go through template_cache, misses included.
+    """
+    import requests
+    urls = []
+    for code in (item_code, item_code.upper(), item_code.lower()):
+        urls += [url for url in worksheet_template_urls(code) if url not in urls]
+    urls += [template_url(path) for path in GENERIC_WORKSHEET_TEMPLATES]
+
+    for url in urls:
+        try:
+            content = template_cache.fetch(url, missing_ok=True)
+        except requests.exceptions.RequestException as e:
+            print(f"DEBUG: Failed to download from {url}: {e}")
+            continue
+        if content is not None:
+            return url, content
+    return None, None
+
+
 def download_worksheet_template_from_supabase(item_code: str):
     """
     Download worksheet template from Supabase storage.
     item_code: The test item code (e.g., "RH", "SPT")
     """
     try:
-        # Check for worksheet templates in Supabase
-        template_urls = [
-            f"https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/worksheets/{item_code}.xlsx",
-            f"https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/worksheets/{item_code}_Worksheet.xlsx",
-            f"https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/worksheets/{item_code}.xls"
-        ]
-        
-        template_found = False
-        template_path = None
-        
-        for url in template_urls:
-            try:
-                print(f"DEBUG: Trying to download worksheet template from {url}")
-                response = requests.get(url, timeout=30)
-                if response.status_code == 200:
-                    template_found = True
-                    # Create a temporary file
-                    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_file:
-                        temp_file.write(response.content)
-                        template_path = temp_file.name
-                    print(f"DEBUG: Successfully downloaded {item_code} worksheet template from {url}")
-                    break
-            except requests.exceptions.RequestException as e:
-                print(f"DEBUG: Failed to download from {url}: {e}")
-                continue
-        
-        if not template_found:
+        url, content = worksheet_template_bytes(item_code)
+        if content is None:
             print(f"DEBUG: No worksheet template found for {item_code} in Supabase")
-            # Check for generic/default worksheet template
-            generic_urls = [
-                "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/worksheets/DEFAULT_Worksheet.xlsx",
-                "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/worksheets/GENERIC_Worksheet.xlsx"
-            ]
-            
-            for url in generic_urls:
-                try:
-                    response = requests.get(url, timeout=30)
-                    if response.status_code == 200:
-                        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_file:
-                            temp_file.write(response.content)
-                            template_path = temp_file.name
-                        print(f"DEBUG: Using generic worksheet template from {url}")
-                        break
-                except requests.exceptions.RequestException as e:
-                    continue
-        
-        if not template_path:
             raise HTTPException(status_code=404, detail=f"No worksheet template found for {item_code} in Supabase storage")
-        
+
+        # Create a temporary file
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_file:
+            temp_file.write(content)
+            template_path = temp_file.name
+        print(f"DEBUG: Using {item_code} worksheet template from {url}")
         return template_path
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR in download_worksheet_template_from_supabase: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to download worksheet template: {str(e)}")
@@ -150,6 +153,23 @@ def generate_sample_no(cur, request_id: int, sequence_num: int):
     return f"GS-{date_part}-{request_seq}-{sequence_num}"
 
 
+def allocate_worksheet_nos(cur, sample_ids):
+    """
+    Worksheet numbers for sample_ids, in order, from a single count of this
+    year's worksheets. The advisory lock is held until the caller's
+    transaction ends, so concurrent allocations cannot hand out a number twice.
+    """
+    year = datetime.utcnow().year
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('worksheet_no'))")
+    cur.execute("""
+        SELECT COUNT(*)
+        FROM worksheets
+        WHERE EXTRACT(YEAR FROM created_at) = %s
+    """, (year,))
+    seq = cur.fetchone()[0]
+    return [f"WKS-{year}-{sample_id:04d}-{seq + i:03d}" for i, sample_id in enumerate(sample_ids, 1)]
+
+
 def generate_worksheet_no(cur, sample_id: int):
     year = datetime.utcnow().year
     cur.execute("""
@@ -266,7 +286,8 @@ def generate_samples_by_request_no(request_no: str, payload: GenerateSamplesIn):
         test_assignments = []
 
         # Create samples with pre-assigned tests
-        for test_info in test_distribution:
+        for done, test_info in enumerate(test_distribution):
+            jobs.report_progress(done, len(test_distribution), "creating samples")
             sample_sequence = test_info["sample_sequence"]
             
             # Generate sample number
@@ -356,10 +377,11 @@ def accept_sample(sample_id: int, payload: AcceptSampleIn):
         sample_no = existing_sample_no or generate_sample_no(cur, request_id, 1)  # Default sequence
         barcode = generate_barcode()
 
+        # A barcode printed on a label before acceptance stays (see /requests/{request_no}/labels)
         cur.execute("""
             UPDATE samples
             SET sample_no = %s,
-                barcode = %s,
+                barcode = COALESCE(barcode, %s),
                 received_date = NOW(),
                 status = 'ACCEPTED',
                 storage_location = COALESCE(%s, storage_location)
@@ -477,29 +499,13 @@ def generate_worksheet(sample_id: int, payload: GenerateWorksheetIn):
             }
         
         # Generate worksheet number
-        year = datetime.utcnow().year
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM worksheets 
-            WHERE EXTRACT(YEAR FROM created_at) = %s
-        """, (year,))
-        seq = cur.fetchone()[0] + 1
-        worksheet_no = f"WKS-{year}-{sample_id:04d}-{seq:03d}"
-        
-        # Check if template exists in Supabase
-        template_available = False
-        template_path = None
+        worksheet_no = allocate_worksheet_nos(cur, [sample_id])[0]
         
+        # Check if template exists in Supabase (cached, no temp file)
+        template_available = bool(item_code) and worksheet_template_bytes(item_code)[1] is not None
         if item_code:
-            try:
-                # Try to download from Supabase
-                template_path = download_worksheet_template_from_supabase(item_code)
-                template_available = True
-                print(f"✅ Found template in Supabase for {item_code}")
-            except Exception as e:
-                # Don't fail if template not found - just mark as unavailable
-                template_available = False
-                print(f"⚠️ Template not found in Supabase for {item_code}: {e}")
+            print(f"✅ Found template in Supabase for {item_code}" if template_available
+                  else f"⚠️ Template not found in Supabase for {item_code}")
         
         # Create worksheet using the PRE-ASSIGNED test
         cur.execute("""
@@ -556,12 +562,16 @@ def generate_worksheet(sample_id: int, payload: GenerateWorksheetIn):
 # 5) Get pending samples - FIXED to use stored assignment
 # ---------------------------
 @router.get("/pending-samples")
-def get_pending_samples():
+def get_pending_samples(request: Request, response: Response):
     """Get all samples with PENDING status - USING STORED ASSIGNMENT"""
     conn = get_connection()
     cur = conn.cursor()
     
     try:
+        cached = not_modified(request, response, cur, ("samples", "test_requests", "quotation_items"))
+        if cached:
+            return cached
+
         # Get samples with their stored test assignments
         cur.execute("""
             SELECT 
@@ -721,21 +731,6 @@ def debug_worksheet_data(sample_id: int):
         conn.close()
 
 
-# ---------------------------
-# 7) Database migration SQL (Run this once to add the new columns)
-# ---------------------------
-"""
--- Run this SQL in your database to add the columns for storing test assignments:
-ALTER TABLE samples 
-ADD COLUMN IF NOT EXISTS assigned_tri_id INTEGER REFERENCES test_request_items(tri_id),
-ADD COLUMN IF NOT EXISTS assigned_quotation_item_id INTEGER REFERENCES quotation_items(item_id);
-
--- Create an index for faster lookups:
-CREATE INDEX IF NOT EXISTS idx_samples_assigned_test ON samples(assigned_quotation_item_id);
-CREATE INDEX IF NOT EXISTS idx_samples_assigned_tri ON samples(assigned_tri_id);
-"""
-
-
 # ---------------------------
 # Remaining endpoints (unchanged but will use stored assignment)
 # ---------------------------
@@ -861,12 +856,16 @@ def download_worksheet(worksheet_id: int):
 
 
 @router.get("/recent-samples")
-def get_recent_samples(limit: int = 5):
+def get_recent_samples(request: Request, response: Response, limit: int = 5):
     """Get most recent samples using stored test assignment"""
     conn = get_connection()
     cur = conn.cursor()
     
     try:
+        cached = not_modified(request, response, cur, ("samples", "test_requests", "quotation_items"))
+        if cached:
+            return cached
+
         cur.execute("""
             SELECT 
                 s.sample_id,
@@ -1040,7 +1039,7 @@ def get_all_samples():
                 "assigned_from_storage": assigned_quotation_item_id is not None
             })
         
-        return result
+        return fast_response(result)
         
     except Exception as e:
         raise HTTPException(500, f"Database error: {str(e)}")
@@ -1176,11 +1175,43 @@ def get_worksheet_data_for_sample(sample_id: int):
         conn.close()
 
 
+def fill_worksheet(sheet, request_no, project_no, collected_by, received_date, test_samples):
+    """Fill a worksheet template's header cells and its sample table (one column per sample)."""
+    from openpyxl.utils import get_column_letter
+
+    # Fill the fixed cells
+    # D7 = request_no
+    sheet['D7'] = request_no
+
+    # D8 = project_no
+    sheet['D8'] = project_no
+
+    # E39 = collected_by
+    sheet['E39'] = collected_by
+
+    # J9 = received_date (formatted)
+    sheet['J9'] = received_date
+
+    # Fill the sample table (starting from F14)
+    start_col = 6  # Column F = 6
+
+    for idx, sample in enumerate(test_samples):
+        # Calculate column (F=6, G=7, H=8, etc.)
+        col_letter = get_column_letter(start_col + idx)
+
+        # Fill sample_no in row 14 (F14, G14, H14...)
+        sheet[f'{col_letter}14'] = sample['sample_no']
+
+        # Fill SI.No in row 15 (F15, G15, H15...)
+        sheet[f'{col_letter}15'] = sample['sequence']
+
+
 def populate_worksheet_template(template_path: str, worksheet_id: int, output_path: str):
     """
     Populate an Excel worksheet template with data from database
     worksheet_id: The ID of the worksheet (not sample_id)
     """
+    from openpyxl import load_workbook
     conn = get_connection()
     cur = conn.cursor()
     
@@ -1331,38 +1362,12 @@ def populate_worksheet_template(template_path: str, worksheet_id: int, output_pa
         workbook = load_workbook(template_path)
         sheet = workbook.active
         
-        # Fill the fixed cells
-        # D7 = request_no
-        sheet['D7'] = data['test_request']['request_no']
-        
-        # D8 = project_no
-        sheet['D8'] = data['project']['project_no']
-        
-        # E39 = collected_by
-        sheet['E39'] = data['sample']['collected_by']
-        
-        # J9 = received_date (formatted)
-        sheet['J9'] = data['sample']['received_date_formatted']
-        
-        # Fill the sample table (starting from F14)
-        start_col = 6  # Column F = 6
-        start_row = 14  # Row 14
-        
-        for idx, sample in enumerate(data['test_samples']):
-            # Calculate column (F=6, G=7, H=8, etc.)
-            col = start_col + idx
-            
-            # Get column letter
-            col_letter = openpyxl.utils.get_column_letter(col)
-            
-            # Fill sample_no in row 14 (F14, G14, H14...)
-            sheet[f'{col_letter}14'] = sample['sample_no']
-            
-            # Fill SI.No in row 15 (F15, G15, H15...)
-            sheet[f'{col_letter}15'] = sample['sequence']
+        fill_worksheet(sheet, data['test_request']['request_no'], data['project']['project_no'],
+                       data['sample']['collected_by'], data['sample']['received_date_formatted'],
+                       data['test_samples'])
         
         # Save the populated worksheet
-        workbook.save(output_path)
+        render_flight.save_workbook(workbook, output_path)
         
         return {
             "output_path": output_path,
@@ -1452,4 +1457,291 @@ def download_filled_worksheet(worksheet_id: int):
         raise HTTPException(500, f"Error generating filled worksheet: {str(e)}")
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+
+# ---------------------------
+# Bulk worksheets for a whole test request
+# ---------------------------
+def load_request_worksheets(cur, request_no: str, lock: bool = False):
+    """
+    (header, samples) of a test request: header = {test_request_id, request_no,
+    project_no}; samples in sample_id order with their assigned test and
+    existing worksheet. lock=True locks the request row until commit.
+    """
+    cur.execute(f"""
+        SELECT tr.test_request_id, tr.request_no, p.project_no
+        FROM test_requests tr
+        LEFT JOIN projects p ON tr.project_id = p.project_id
+        WHERE tr.request_no = %s
+        {"FOR UPDATE OF tr" if lock else ""}
+    """, (request_no,))
+    row = cur.fetchone()
+    if not row:
+        raise HTTPException(404, f"Test request with number '{request_no}' not found")
+    header = {"test_request_id": row[0], "request_no": row[1], "project_no": row[2]}
+
+    cur.execute("""
+        SELECT s.sample_id, s.sample_no, s.status, s.collected_by,
+               TO_CHAR(s.received_date, 'DD-MM-YYYY'),
+               s.assigned_quotation_item_id, qi.item_code, qi.description,
+               qi.test_standard, qi.unit_rate,
+               w.worksheet_id, w.worksheet_no
+        FROM samples s
+        LEFT JOIN quotation_items qi ON s.assigned_quotation_item_id = qi.item_id
+        LEFT JOIN LATERAL (
+            SELECT worksheet_id, worksheet_no
+            FROM worksheets
+            WHERE sample_id = s.sample_id AND quotation_item_id = s.assigned_quotation_item_id
+            ORDER BY worksheet_id
+            LIMIT 1
+        ) w ON TRUE
+        WHERE s.request_id = %s
+        ORDER BY s.sample_id
+    """, (header["test_request_id"],))
+    columns = ("sample_id", "sample_no", "status", "collected_by", "received_date", "quotation_item_id",
+               "item_code", "test_name", "test_standard", "unit_rate", "worksheet_id", "worksheet_no")
+    return header, [dict(zip(columns, r)) for r in cur.fetchall()]
+
+
+def group_samples_by_test(samples):
+    """{quotation_item_id: [samples]} with each sample's SI.No ("sequence") within its test."""
+    groups = {}
+    for sample in samples:
+        if sample["quotation_item_id"] is None:
+            continue
+        group = groups.setdefault(sample["quotation_item_id"], [])
+        sample["sequence"] = len(group) + 1
+        group.append(sample)
+    return groups
+
+
+def create_request_worksheets(cur, request_no: str, technician: Optional[str]):
+    """
+    Insert the missing worksheets of every sample of a test request (not
+    rejected, with an assigned test). Worksheet numbers come from one
+    allocation; the caller commits. Returns (header, samples, created count).
+    """
+    header, samples = load_request_worksheets(cur, request_no, lock=True)
+    missing = [s for s in samples
+               if s["quotation_item_id"] is not None and s["worksheet_id"] is None and s["status"] != "REJECTED"]
+    if not missing:
+        return header, samples, 0
+
+    numbers = allocate_worksheet_nos(cur, [s["sample_id"] for s in missing])
+    inserted = execute_values(cur, """
+        INSERT INTO worksheets (
+            worksheet_no, sample_id, quotation_item_id, test_name,
+            standard, unit_rate, quantity, technician, status, created_at
+        )
+        VALUES %s
+        RETURNING worksheet_id, sample_id
+    """, [
+        (number, s["sample_id"], s["quotation_item_id"], s["test_name"], s["test_standard"],
+         float(s["unit_rate"]) if isinstance(s["unit_rate"], Decimal) else s["unit_rate"],
+         1, technician or "Lab Technician", "GENERATED")
+        for number, s in zip(numbers, missing)
+    ], template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())", fetch=True)
+
+    ids = {sample_id: worksheet_id for worksheet_id, sample_id in inserted}
+    for number, sample in zip(numbers, missing):
+        sample["worksheet_id"], sample["worksheet_no"], sample["created"] = ids[sample["sample_id"]], number, True
+    return header, samples, len(missing)
+
+
+def render_test_worksheet(header, test_samples):
+    """(file name, xlsx bytes) of one filled worksheet for all samples of one test; template loaded once."""
+    from io import BytesIO
+    from openpyxl import load_workbook
+
+    first = test_samples[0]
+    item_code = first["item_code"] or f"ITEM{first['quotation_item_id']}"
+    safe_code = item_code.replace("/", "-").replace("\\", "-")
+    _, template = worksheet_template_bytes(item_code) if first["item_code"] else (None, None)
+    if template is None:
+        raise HTTPException(404, f"No worksheet template found for {item_code}")
+
+    workbook = load_workbook(BytesIO(template))
+    fill_worksheet(workbook.active, header["request_no"], header["project_no"],
+                   first["collected_by"], first["received_date"], test_samples)
+    output = BytesIO()
+    workbook.save(output)
+    return f"{header['request_no']}_{safe_code}_WORKSHEET.xlsx", output.getvalue()
+
+
+def _worksheets_manifest(samples):
+    import csv
+    import io
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["sample_no", "item_code", "test_name", "si_no", "worksheet_no", "worksheet"])
+    for s in samples:
+        if s["quotation_item_id"] is None:
+            state = "no assigned test"
+        elif s["worksheet_id"] is None:
+            state = "rejected sample" if s["status"] == "REJECTED" else "not created"
+        else:
+            state = "created" if s.get("created") else "existing"
+        writer.writerow([s["sample_no"], s["item_code"], s["test_name"], s.get("sequence"), s["worksheet_no"], state])
+    return out.getvalue().encode("utf-8-sig")
+
+
+@router.post("/requests/{request_no}/generate-worksheets")
+def generate_request_worksheets(request_no: str, payload: GenerateWorksheetIn):
+    """
+    Create the worksheets of all samples of a test request in one transaction,
+    then download them as a ZIP: one filled workbook per assigned test (its
+    template loaded once) plus worksheets.csv, streamed as each is rendered.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        header, samples, created = create_request_worksheets(cur, request_no, payload.technician)
+        conn.commit()
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, f"Error generating worksheets: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+    groups = group_samples_by_test(samples)
+    if not groups:
+        raise HTTPException(400, f"Request {request_no} has no samples with an assigned test")
+
+    def parts():
+        for test_samples in groups.values():
+            try:
+                yield render_test_worksheet(header, test_samples)
+            except Exception as e:
+                # Headers are already sent; the problem goes into the archive
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                print(f"WARNING: worksheet for {test_samples[0]['item_code']} of {request_no}: {detail}")
+                yield f"{test_samples[0]['item_code']}_ERROR.txt", str(detail).encode()
+        yield "worksheets.csv", _worksheets_manifest(samples)
+
+    existing = sum(1 for s in samples if s["worksheet_id"] is not None) - created
+    return StreamingResponse(
+        stream_zip(parts()),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{request_no}_worksheets.zip"',
+            "X-Worksheets-Created": str(created),
+            "X-Worksheets-Existing": str(existing),
+        }
+    )
+
+
+# ---------------------------
+# Sample labels and scanner lookup
+# ---------------------------
+def assign_missing_barcodes(cur, sample_ids):
+    """Give the samples that have none a barcode (unique index idx_samples_barcode); returns how many."""
+    if not sample_ids:
+        return 0
+    for attempt in range(3):
+        cur.execute("SAVEPOINT assign_barcodes")
+        try:
+            assigned = execute_values(cur, """
+                UPDATE samples s SET barcode = v.barcode
+                FROM (VALUES %s) AS v(sample_id, barcode)
+                WHERE s.sample_id = v.sample_id AND s.barcode IS NULL
+                RETURNING s.sample_id
+            """, [(sample_id, generate_barcode()) for sample_id in sample_ids], fetch=True)
+            cur.execute("RELEASE SAVEPOINT assign_barcodes")
+            return len(assigned)
+        except psycopg2.IntegrityError:
+            # 64 random bits colliding with an existing code; draw again
+            cur.execute("ROLLBACK TO SAVEPOINT assign_barcodes")
+            print(f"WARNING: barcode collision assigning {len(sample_ids)} barcodes, attempt {attempt + 1}")
+    raise HTTPException(500, "Could not assign unique barcodes")
+
+
+@router.get("/requests/{request_no}/labels")
+def request_labels(request_no: str, layout: str = "a4", copies: int = 1, include_rejected: bool = False):
+    """
+    Barcode labels (Code 128) for all samples of a test request as one PDF,
+    to stick on the containers at intake. layout: a4 (3 x 8 sheet) or roll
+    (one label per page). Samples without a barcode yet get one now; it is
+    kept when they are accepted.
+    """
+    import labels
+
+    if layout not in labels.LAYOUTS:
+        raise HTTPException(400, f"Unknown layout '{layout}', expected one of {', '.join(labels.LAYOUTS)}")
+    if not 1 <= copies <= 10:
+        raise HTTPException(400, "copies must be between 1 and 10")
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        header, samples = load_request_worksheets(cur, request_no)
+        if not include_rejected:
+            samples = [s for s in samples if s["status"] != "REJECTED"]
+        if not samples:
+            raise HTTPException(400, f"Request {request_no} has no samples to label")
+
+        assigned = assign_missing_barcodes(cur, [s["sample_id"] for s in samples])
+        cur.execute("SELECT sample_id, barcode FROM samples WHERE sample_id = ANY(%s)",
+                    ([s["sample_id"] for s in samples],))
+        barcodes = dict(cur.fetchall())
+        conn.commit()
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, f"Error preparing labels: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+    entries = [{"barcode": barcodes[s["sample_id"]], "sample_no": s["sample_no"],
+                "request_no": header["request_no"], "item_code": s["item_code"]}
+               for s in samples for _ in range(copies)]
+    key = ("labels", request_no, layout, render_flight.data_version(entries))
+    pdf = render_flight.renders.run(
+        key, lambda: labels.render_labels_pdf(entries, layout, title=f"{request_no} sample labels"))
+
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'inline; filename="{request_no}_labels.pdf"',
+            "X-Labels": str(len(entries)),
+            "X-Barcodes-Assigned": str(assigned),
+        }
+    )
+
+
+@router.get("/samples/lookup-by-barcode/{barcode}")
+def lookup_sample_by_barcode(barcode: str):
+    """Sample behind a scanned label (one index probe on idx_samples_barcode)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT s.sample_id, s.sample_no, s.barcode, s.status, s.storage_location,
+                   s.collected_by, s.received_date, s.request_id, tr.request_no,
+                   p.project_no, qi.item_code, qi.description
+            FROM samples s
+            JOIN test_requests tr ON s.request_id = tr.test_request_id
+            LEFT JOIN projects p ON tr.project_id = p.project_id
+            LEFT JOIN quotation_items qi ON s.assigned_quotation_item_id = qi.item_id
+            WHERE s.barcode = %s
+        """, (barcode.strip().upper(),))
+        row = cur.fetchone()
+    except Exception as e:
+        raise HTTPException(500, f"Database error: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+    if not row:
+        raise HTTPException(404, f"No sample with barcode '{barcode}'")
+    columns = ("sample_id", "sample_no", "barcode", "status", "storage_location", "collected_by",
+               "received_date", "request_id", "request_no", "project_no", "assigned_test", "test_name")
+    return dict(zip(columns, row))
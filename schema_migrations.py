@@ -0,0 +1,378 @@
+# schema_migrations.py
+"""
+Versioned schema migrations.
+
+SQL files in migrations/ named NNNN_description.sql are applied in order, once,
+and recorded in the schema_migrations table. main.py runs them at startup
+(disable with AUTO_MIGRATE=0 in .env); several instances starting together
+serialise on an advisory lock. The code needs every bundled migration: while
+any is missing from the database (a failed or skipped startup run), the API
+answers 503 with the missing ones named (SchemaGuardMiddleware).
+
+A file whose header contains "-- migrate:no-transaction" is run statement by
+statement outside a transaction (needed for CREATE INDEX CONCURRENTLY); every
+other file runs in a single transaction.
+
+    python -m schema_migrations            apply pending migrations
+    python -m schema_migrations --status   list applied / pending
+    python -m schema_migrations --check    EXPLAIN the hot queries, exit 1 if one does not use an index
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from db import get_connection
+
+# Bundled next to the modules (sys._MEIPASS in the exe, see the .spec datas)
+MIGRATIONS_DIR = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__))), "migrations")
+ADVISORY_LOCK_KEY = 0x47454C  # "GEL"
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+FILE_PATTERN = re.compile(r"^(\d{4})_(.+)\.sql$")
+INDEX_NAME = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.I)
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] sorted by version."""
+    found = []
+    for filename in os.listdir(directory):
+        match = FILE_PATTERN.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(found)
+
+
+def split_statements(sql):
+    """Split a no-transaction file into statements (one per ';' at end of line)."""
+    statements, current = [], []
+    for line in sql.splitlines():
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip()
+            if any(l.strip() and not l.strip().startswith("--") for l in current):
+                statements.append(statement)
+            current = []
+    return statements
+
+
+def _ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            checksum VARCHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+
+
+def _dedupe_before_constraints(cur):
+    """
+    0003 adds UNIQUE constraints that older databases may already violate.
+    Duplicate link rows carry no information of their own and are dropped
+    (the first one is kept); two delivery notes with the same number are real
+    documents, so those stop the migration with the numbers to sort out.
+    """
+    for table, columns in (("delivery_note_reports", "delivery_note_no, report_no"),
+                           ("invoice_report_links", "invoice_id, report_no, invoice_type")):
+        cur.execute(f"""
+            DELETE FROM {table} t
+            USING (
+                SELECT ctid, ROW_NUMBER() OVER (PARTITION BY {columns} ORDER BY ctid) AS n
+                FROM {table}
+            ) d
+            WHERE t.ctid = d.ctid AND d.n > 1
+        """)
+        if cur.rowcount:
+            print(f"WARNING: removed {cur.rowcount} duplicate {table} row(s) before adding UNIQUE ({columns})")
+
+    cur.execute("""
+        SELECT delivery_note_no, COUNT(*) FROM delivery_notes
+        WHERE delivery_note_no IS NOT NULL
+        GROUP BY delivery_note_no HAVING COUNT(*) > 1
+        ORDER BY delivery_note_no
+    """)
+    duplicates = cur.fetchall()
+    if duplicates:
+        listed = ", ".join(f"{number} (x{count})" for number, count in duplicates)
+        raise RuntimeError(f"delivery_notes has duplicate delivery_note_no values: {listed}. "
+                           f"Renumber or remove the extra notes, then restart or run python -m schema_migrations")
+
+
+# Data fixes run in the migration's transaction, before its SQL
+BEFORE_APPLY = {3: _dedupe_before_constraints}
+
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR):
+    """Apply every pending migration. Returns the versions applied."""
+    conn.autocommit = True
+    cur = conn.cursor()
+    applied_now = []
+    cur.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+    try:
+        _ensure_table(cur)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        applied = dict(cur.fetchall())
+
+        for version, name, path in discover(directory):
+            with open(path, "r", encoding="utf-8") as f:
+                sql = f.read()
+            checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+            if version in applied:
+                if applied[version] != checksum:
+                    print(f"WARNING: migration {version:04d}_{name} changed after it was applied")
+                continue
+
+            print(f"Applying migration {version:04d}_{name}")
+            started = time.perf_counter()
+            if NO_TRANSACTION_MARKER in sql:
+                if version in BEFORE_APPLY:
+                    BEFORE_APPLY[version](cur)
+                for statement in split_statements(sql):
+                    try:
+                        cur.execute(statement)
+                    except Exception:
+                        # A failed CREATE INDEX CONCURRENTLY leaves an invalid index behind,
+                        # which IF NOT EXISTS would then skip forever
+                        index = INDEX_NAME.search(statement)
+                        if index:
+                            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index.group(1)}")
+                        raise
+                cur.execute("""
+                    INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)
+                """, (version, name, checksum, int((time.perf_counter() - started) * 1000)))
+            else:
+                try:
+                    cur.execute("BEGIN")
+                    if version in BEFORE_APPLY:
+                        BEFORE_APPLY[version](cur)
+                    cur.execute(sql)
+                    cur.execute("""
+                        INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)
+                    """, (version, name, checksum, int((time.perf_counter() - started) * 1000)))
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+            applied_now.append(version)
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+        cur.close()
+        conn.autocommit = False
+    return applied_now
+
+
+def pending_migrations(cur, directory=MIGRATIONS_DIR):
+    """[(version, name)] of the bundled migrations not applied to this database."""
+    _ensure_table(cur)
+    cur.execute("SELECT version FROM schema_migrations")
+    applied = {row[0] for row in cur.fetchall()}
+    return [(version, name) for version, name, _ in discover(directory) if version not in applied]
+
+
+# ----------------------------
+# Schema guard
+# ----------------------------
+# The code relies on every bundled migration (row_version columns from 0004,
+# trigger-maintained totals from 0005, ...). While some are not applied the
+# API answers 503 instead of half working; the database is looked at again
+# every SCHEMA_RECHECK_SEC, so applying them by hand
+# (python -m schema_migrations) lifts the guard without a restart.
+SCHEMA_RECHECK_SEC = float(os.getenv("SCHEMA_RECHECK_SEC", "10"))
+# Reachable while the schema is behind: health check and the front end's files
+GUARD_EXEMPT = ("/api/", "/assets/", "/docs", "/openapi.json")
+
+_schema = {"pending": None, "checked_at": 0.0}  # pending None: not known (database unreachable)
+
+
+def refresh_schema_state():
+    """Look up the pending migrations again. Returns them, or None if the database cannot be reached."""
+    try:
+        conn = get_connection()
+    except Exception as e:
+        print(f"ERROR: could not connect to check the schema version: {e}")
+        pending = None
+    else:
+        try:
+            cur = conn.cursor()
+            pending = pending_migrations(cur)
+            conn.commit()
+            cur.close()
+        except Exception as e:
+            conn.rollback()
+            print(f"ERROR: could not check the schema version: {e}")
+            pending = None
+        finally:
+            conn.close()
+    _schema.update(pending=pending, checked_at=time.monotonic())
+    return pending
+
+
+def _schema_behind_message(pending):
+    names = ", ".join(f"{version:04d}_{name}" for version, name in pending)
+    return (f"Database schema is behind this version of GEL LIMS: {len(pending)} migration(s) not applied "
+            f"({names}). See the server log for the migration error, then run python -m schema_migrations.")
+
+
+class SchemaGuardMiddleware:
+    """Answer 503 on the API while bundled migrations are missing from the database."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _schema["pending"] == [] or scope["path"].startswith(GUARD_EXEMPT):
+            await self.app(scope, receive, send)
+            return
+        if time.monotonic() - _schema["checked_at"] >= SCHEMA_RECHECK_SEC:
+            await run_in_threadpool(refresh_schema_state)
+        pending = _schema["pending"]
+        if not pending:
+            # Up to date, or unknown: the endpoint reports its own database error
+            await self.app(scope, receive, send)
+            return
+        response = JSONResponse({"detail": _schema_behind_message(pending)}, status_code=503,
+                                headers={"Retry-After": str(int(SCHEMA_RECHECK_SEC))})
+        await response(scope, receive, send)
+
+
+def run_startup_migrations():
+    """
+    Startup hook: apply pending migrations unless AUTO_MIGRATE=0. Never stops
+    the app from starting, but if migrations are left unapplied (failed, or
+    skipped) SchemaGuardMiddleware keeps the API at 503 until they are.
+    """
+    if os.getenv("AUTO_MIGRATE", "1").strip().lower() in ("0", "false", "no", "off"):
+        print("Schema migrations skipped (AUTO_MIGRATE=0)")
+    else:
+        try:
+            conn = get_connection()
+        except Exception as e:
+            print(f"ERROR: could not connect to apply migrations: {e}")
+            return []
+        try:
+            applied = apply_migrations(conn)
+            print(f"Schema up to date ({len(applied)} migration(s) applied)")
+            _schema.update(pending=[], checked_at=time.monotonic())
+            return applied
+        except Exception as e:
+            print(f"ERROR: migration failed: {e}")
+        finally:
+            conn.close()
+
+    pending = refresh_schema_state()
+    if pending:
+        print(f"ERROR: {_schema_behind_message(pending)} The API answers 503 until then.")
+    return []
+
+
+# ----------------------------
+# Index usage check
+# ----------------------------
+# (description, table that must be read through an index, query)
+HOT_QUERIES = [
+    ("samples by request", "samples", "SELECT sample_id FROM samples WHERE request_id = 1"),
+    ("sample by number", "samples", "SELECT sample_id FROM samples WHERE sample_no = 'GS-010100-01-1'"),
+    ("pending samples", "samples",
+     "SELECT sample_id FROM samples WHERE status = 'PENDING' ORDER BY sample_id DESC"),
+    ("recent open samples", "samples",
+     "SELECT sample_id FROM samples WHERE status IN ('PENDING', 'ACCEPTED') ORDER BY sample_id DESC LIMIT 50"),
+    ("samples by status", "samples", "SELECT sample_id FROM samples WHERE status = 'REJECTED'"),
+    ("sample by barcode", "samples", "SELECT sample_id FROM samples WHERE barcode = '0123456789ABCDEF'"),
+    ("report by number", "reports", "SELECT report_id FROM reports WHERE report_no = 'GR - 010100 - 001'"),
+    ("reports of sample", "reports", "SELECT report_id FROM reports WHERE sample_id = 1"),
+    ("reports by status", "reports",
+     "SELECT report_id FROM reports WHERE status = 'UNDER_REVIEW' ORDER BY created_at DESC"),
+    ("approved report by number", "reports",
+     "SELECT report_id FROM reports WHERE report_no = 'GR - 010100 - 001' AND status = 'APPROVED'"),
+    ("reports created today", "reports", "SELECT COUNT(*) FROM reports WHERE DATE(created_at) = CURRENT_DATE"),
+    ("requests created today", "test_requests",
+     "SELECT COUNT(*) FROM test_requests WHERE DATE(created_at) = CURRENT_DATE"),
+    ("invoice links by report", "invoice_report_links",
+     "SELECT invoice_id FROM invoice_report_links WHERE report_no = 'GR - 010100 - 001' AND invoice_type = 'TAX'"),
+    ("delivery note links by report", "delivery_note_reports",
+     "SELECT delivery_note_no FROM delivery_note_reports WHERE report_no = 'GR - 010100 - 001'"),
+    ("test request items", "test_request_items",
+     "SELECT tri_id FROM test_request_items WHERE test_request_id = 1"),
+    ("quotation items by index", "quotation_items",
+     "SELECT item_id FROM quotation_items WHERE quotation_id = 1 ORDER BY item_id OFFSET 2 LIMIT 1"),
+]
+
+
+def _plan_index_names(node, found):
+    if "Index Name" in node:
+        found.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        _plan_index_names(child, found)
+    return found
+
+
+def check_hot_queries(conn):
+    """EXPLAIN each hot query with sequential scans discouraged. Returns [(description, table, ok, indexes)]."""
+    results = []
+    cur = conn.cursor()
+    try:
+        # Small tables are cheaper to seq-scan; this asks "can an index serve it?"
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for description, table, sql in HOT_QUERIES:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            indexes = _plan_index_names(plan[0]["Plan"], set())
+            cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (table,))
+            table_indexes = {row[0] for row in cur.fetchall()}
+            used = sorted(indexes & table_indexes)
+            results.append((description, table, bool(used), used))
+    finally:
+        conn.rollback()
+        cur.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GEL LIMS schema migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--check", action="store_true", help="verify the hot queries use an index")
+    options = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        if options.status:
+            cur = conn.cursor()
+            _ensure_table(cur)
+            cur.execute("SELECT version, applied_at, duration_ms FROM schema_migrations")
+            applied = {row[0]: row[1:] for row in cur.fetchall()}
+            conn.commit()
+            for version, name, _ in discover():
+                state = f"applied {applied[version][0]:%Y-%m-%d %H:%M} ({applied[version][1]} ms)" \
+                    if version in applied else "pending"
+                print(f"{version:04d}_{name:<40} {state}")
+            return
+
+        if options.check:
+            failures = 0
+            for description, table, ok, used in check_hot_queries(conn):
+                failures += not ok
+                print(f"{'OK ' if ok else 'SEQ'} {description:<32} {table:<24} {', '.join(used) or '-'}")
+            if failures:
+                print(f"\n{failures} hot quer{'y' if failures == 1 else 'ies'} without a usable index")
+                sys.exit(1)
+            print("\nAll hot queries can use an index")
+            return
+
+        applied = apply_migrations(conn)
+        print(f"{len(applied)} migration(s) applied")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# server.py
+"""
+Production server mode: several uvicorn worker processes on one port.
+
+main.py's __main__ block runs a single process (the desktop EXE, and
+`python main.py` in development), so one CPU-heavy invoice or worksheet render
+holds up every other request. For the lab server:
+
+    python server.py --workers 4                 # 0.0.0.0:8000
+    python server.py --workers 8 --port 8080
+    kill -HUP <supervisor pid>                   # graceful reload (not on Windows)
+
+Each worker imports main:app on its own and shares nothing with the others:
+
+    - its own connection pool, sized so all workers together stay under the
+      server's max_connections (WEB_CONCURRENCY is exported for db.pool_size)
+    - its own ref_cache / template_cache, kept coherent by the NOTIFY listeners
+    - warm-up (warmup.py) before it takes requests: pool, price catalog,
+      clients and templates loaded (WARMUP=blocking)
+
+On SIGHUP uvicorn's supervisor replaces the workers one at a time, so the new
+code is loaded without dropping the port. The frozen EXE stays single-process:
+started as GEL_LIMS.exe it never goes through here, and --workers is ignored in
+a frozen build.
+"""
+import argparse
+import os
+import sys
+
+import uvicorn
+
+
+def default_workers():
+    return int(os.getenv("WEB_CONCURRENCY") or min(os.cpu_count() or 1, 8))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the GEL LIMS API with several worker processes")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="worker processes (default: WEB_CONCURRENCY, else CPU count up to 8)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-warmup", action="store_true", help="start workers without priming caches")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="seconds a stopping worker gets to finish its requests")
+    options = parser.parse_args(argv)
+
+    workers = max(1, options.workers)
+    if getattr(sys, "frozen", False) and workers > 1:
+        print("WARNING: frozen build, running a single process")
+        workers = 1
+
+    # Read by db.pool_size (per-worker pool) and warmup.mode() in every worker
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    os.environ["WARMUP"] = "off" if options.no_warmup else "blocking"
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    print(f"Starting {workers} worker(s) on {options.host}:{options.port}")
+    uvicorn.run("main:app", host=options.host, port=options.port, workers=workers,
+                timeout_graceful_shutdown=options.graceful_timeout)
+
+
+if __name__ == "__main__":
+    main()
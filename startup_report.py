@@ -0,0 +1,110 @@
+# startup_report.py
+"""
+Where startup time goes.
+
+Cold start on the lab PCs is dominated by imports: the one-file EXE unpacks,
+then main.py imports every router before uvicorn can answer. The routers keep
+their heavy dependencies out of module scope - openpyxl, docxtpl (jinja2,
+lxml), requests and the Supabase SDK are imported inside the functions that
+use them, and storage.get_supabase() builds the client on first upload - so
+none of them load until the first document, template download or upload.
+
+In the app, main.py calls mark() after the router imports and when the
+lifespan has finished; the summary is printed at startup and kept in timings().
+
+From the command line, the per-module import cost of `import main`, measured
+with python -X importtime in a fresh interpreter:
+
+    python -m startup_report              # direct imports of main + heaviest packages
+    python -m startup_report --top 30
+"""
+import os
+import re
+import sys
+import time
+
+_T0 = time.perf_counter()
+_marks = {}
+
+# Imported only on first use; loading any of these at startup is a regression
+DEFERRED = ("openpyxl", "docxtpl", "docx", "jinja2", "lxml", "requests", "supabase", "httpx")
+
+
+def mark(name):
+    """Milliseconds since this module was imported (the start of main.py), stored under name."""
+    _marks[name] = round((time.perf_counter() - _T0) * 1000, 1)
+    return _marks[name]
+
+
+def loaded_deferred():
+    return [name for name in DEFERRED if name in sys.modules]
+
+
+def timings():
+    return {"marks_ms": dict(_marks), "deferred_loaded": loaded_deferred()}
+
+
+def log_summary():
+    parts = ", ".join(f"{name} {ms:.0f} ms" for name, ms in _marks.items())
+    loaded = loaded_deferred()
+    print(f"DEBUG: startup: {parts}; deferred modules loaded: {', '.join(loaded) if loaded else 'none'}")
+
+
+# ---- offline report (-X importtime) ----
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def measure_imports(module="main", cwd=None):
+    """[(name, self_us, cumulative_us, depth)] for `import module` in a fresh interpreter."""
+    import subprocess
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def report(module="main", top=15, cwd=None):
+    rows = measure_imports(module, cwd)
+    # importtime lists children before their parent; keep only the rows of
+    # `import module` itself, not what site and the interpreter loaded first
+    end = max(i for i, r in enumerate(rows) if r[0] == module and r[3] == 0)
+    start = max((i for i, r in enumerate(rows[:end]) if r[3] == 0), default=-1) + 1
+    total, rows = rows[end], rows[start:end + 1]
+    print(f"import {module}: {total[2] / 1000:.0f} ms\n")
+
+    print(f"Imported directly by {module} (cumulative, includes their own imports):")
+    direct = sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])
+    for name, _, cumulative, _ in direct[:top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    print("\nHeaviest top-level packages (cumulative, wherever first imported):")
+    packages = {}
+    for name, _, cumulative, _ in rows:
+        if "." not in name:
+            packages[name] = max(packages.get(name, 0), cumulative)
+    for name, cumulative in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    loaded = sorted({name.split(".")[0] for name, *_ in rows} & set(DEFERRED))
+    print(f"\nDeferred dependencies loaded at import: {', '.join(loaded) if loaded else 'none'}")
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Per-module import cost of the app")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    options = parser.parse_args(argv)
+    report(options.module, options.top, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# static_assets.py
+"""
+Serving the React build (dist/).
+
+    /assets/*   PrecompressedStaticFiles. Vite names these name-<hash>.ext, so a
+                name never changes content: they are sent with
+                Cache-Control: public, max-age=31536000, immutable and the
+                browser does not ask again until a new build changes index.html.
+                If a precompressed sibling exists (X.br / X.gz) and the client
+                accepts it, that file is sent instead with Content-Encoding.
+    index.html  IndexPage: read once, kept in memory with its br/gzip forms,
+                sent with Cache-Control: no-cache and an ETag so a new build is
+                picked up on the next load.
+
+The .br/.gz files are written at build time by precompress_dir(), which the
+PyInstaller spec files call on dist/ before bundling it. By hand:
+
+    python -m static_assets dist
+"""
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import add_vary, brotli, choose_encoding
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+PRECOMPRESS_EXTENSIONS = (".js", ".css", ".html", ".svg", ".json", ".txt", ".map", ".ico")
+PRECOMPRESS_MIN_BYTES = 512
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers build-time .br/.gz files and marks hashed names immutable."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._variants = {}  # full path -> {encoding: (path, stat)}; the bundle does not change
+
+    def _variants_of(self, full_path):
+        variants = self._variants.get(full_path)
+        if variants is None:
+            variants = {}
+            for encoding, suffix in SUFFIXES.items():
+                try:
+                    variants[encoding] = (full_path + suffix, os.stat(full_path + suffix))
+                except OSError:
+                    pass
+            self._variants[full_path] = variants
+        return variants
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        variants = self._variants_of(full_path)
+
+        encoding = choose_encoding(request_headers.get("accept-encoding"), variants) if variants else None
+
+        if encoding is not None:
+            path, variant_stat = variants[encoding]
+            response = FileResponse(path, status_code=status_code, stat_result=variant_stat,
+                                    media_type=media_type, headers={"Content-Encoding": encoding})
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result,
+                                    media_type=media_type)
+        if variants:
+            add_vary(response.headers)
+        if HASHED_NAME.search(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class IndexPage:
+    """index.html held in memory with its compressed forms."""
+
+    def __init__(self, path):
+        self.path = path
+        self._loaded = False
+        self.bodies = {}
+        self.etag = None
+
+    def _load(self):
+        if not self._loaded:
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    body = f.read()
+                self.bodies = {None: body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    self.bodies["br"] = brotli.compress(body, quality=11)
+                self.etag = '"%s"' % hashlib.md5(body).hexdigest()
+            self._loaded = True
+        return bool(self.bodies)
+
+    @property
+    def available(self):
+        return self._load()
+
+    def response(self, request):
+        if not self._load():
+            return None
+        headers = {"Cache-Control": "no-cache", "ETag": self.etag, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        encoding = choose_encoding(request.headers.get("accept-encoding"), self.bodies)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type="text/html", headers=headers)
+
+
+def precompress_dir(directory, verbose=True):
+    """Write X.br (if brotli is installed) and X.gz next to every compressible file
+    under directory that is large enough and shrinks. Returns the number written."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                body = f.read()
+            if len(body) < PRECOMPRESS_MIN_BYTES:
+                continue
+            encodings = [("gzip", gzip.compress(body, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                encodings.append(("br", brotli.compress(body, quality=11)))
+            for encoding, data in encodings:
+                target = path + SUFFIXES[encoding]
+                if len(data) >= len(body):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, "wb") as f:
+                    f.write(data)
+                written += 1
+                if verbose:
+                    print(f"  {os.path.relpath(target, directory)}: {len(body) / 1024:.1f} KiB -> "
+                          f"{len(data) / 1024:.1f} KiB")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write .br/.gz files next to the built frontend assets")
+    parser.add_argument("directory", nargs="?", default="dist")
+    options = parser.parse_args(argv)
+    if not os.path.isdir(options.directory):
+        sys.exit(f"{options.directory} is not a directory")
+    if brotli is None:
+        print("WARNING: brotli not installed, writing .gz files only")
+    print(f"Precompressed {precompress_dir(options.directory)} files in {options.directory}")
+
+
+if __name__ == "__main__":
+    main()
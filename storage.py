@@ -0,0 +1,54 @@
+# storage.py
+"""
+Storage location settings.
+
+Every module used to hard-code the Supabase project host. The base URL now comes
+from SUPABASE_URL in .env (falling back to the production project), so the app,
+the benchmarks and offline tests can point at the local stand-in in
+benchmarks/storage_server.py:
+
+    SUPABASE_URL=http://127.0.0.1:54321
+
+get_supabase() returns the SDK client for uploads. It is created on first use:
+importing the SDK and building the client costs a few hundred ms that startup
+should not pay for an occasional LPO upload.
+"""
+import os
+import threading
+
+import db  # noqa: F401  - loads .env from the exe/script folder before the settings below are read
+
+DEFAULT_SUPABASE_URL = "https://hqwgkmbjmcxpxbwccclo.supabase.co"
+DEFAULT_SUPABASE_KEY = "sb_secret_-8uQCdQSiUgDFO_MUEsTWg_TPWtsyy3"
+
+SUPABASE_URL = (os.getenv("SUPABASE_URL") or DEFAULT_SUPABASE_URL).rstrip("/")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or DEFAULT_SUPABASE_KEY
+
+# Same layout the Supabase SDK uses: {SUPABASE_URL}/storage/v1/...
+STORAGE_BASE_URL = f"{SUPABASE_URL}/storage/v1"
+TEMPLATES_BUCKET = "templates"
+
+
+def public_object_url(bucket: str, path: str) -> str:
+    """Public (unauthenticated) URL of an object in a bucket"""
+    return f"{STORAGE_BASE_URL}/object/public/{bucket}/{path.lstrip('/')}"
+
+
+def template_url(path: str) -> str:
+    """Public URL of a file in the templates bucket, e.g. template_url("invoices/invoice.xlsx")"""
+    return public_object_url(TEMPLATES_BUCKET, path)
+
+
+_supabase_client = None
+_supabase_lock = threading.Lock()
+
+
+def get_supabase():
+    """The shared Supabase client, created on the first call"""
+    global _supabase_client
+    if _supabase_client is None:
+        with _supabase_lock:
+            if _supabase_client is None:
+                from supabase import create_client
+                _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase_client
@@ -0,0 +1,141 @@
+# template_cache.py
+"""
+Per-process cache of the document templates kept in storage.
+
+Every quotation, invoice, delivery note, test request, worksheet and report
+download fetched its template from Supabase storage first: one HTTP round
+trip, and up to five for a worksheet trying file name variants. fetch()
+keeps the bytes for TEMPLATE_CACHE_TTL_SEC (default 600, 0 disables) and
+also remembers 404s, so missing variants are not asked for again.
+
+Each process (each server worker) has its own copy. A template replaced in
+storage is picked up after the TTL, or at once everywhere with
+
+    SELECT pg_notify('ref_cache', 'templates');
+
+(the ref_cache listener drops the cache it names). Modules register the fixed
+templates they use with register(); prime() downloads those, and the startup
+warm-up (warmup.py) runs it.
+
+Downloads go through http_client (keep-alive, deadline, retries, circuit
+breaker). When storage cannot be reached, fetch() falls back to the last good
+copy of the template: kept in memory and written to TEMPLATE_CACHE_DIR (default
+<temp>/lab_app_template_cache), so it also survives a restart during an outage.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import ref_cache
+from render_flight import write_atomic
+
+MISSING = b""  # cached 404
+
+templates = ref_cache.TTLCache("templates", maxsize=256,
+                               ttl=float(os.getenv("TEMPLATE_CACHE_TTL_SEC", "600")))
+ref_cache.CACHES[templates.name] = templates
+
+_registered = []
+
+LAST_GOOD_DIR = os.getenv("TEMPLATE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "lab_app_template_cache")
+LAST_GOOD_IN_MEMORY = 64
+_last_good = OrderedDict()
+_last_good_lock = threading.Lock()
+fallback_stats = {"stale_served": 0, "stale_from_disk": 0, "unavailable": 0}
+
+
+def register(*urls: str) -> None:
+    """Templates prime() should download (fixed ones every install needs)."""
+    for url in urls:
+        if url not in _registered:
+            _registered.append(url)
+
+
+def _last_good_path(url: str) -> str:
+    return os.path.join(LAST_GOOD_DIR, hashlib.sha1(url.encode()).hexdigest() + os.path.splitext(url)[1])
+
+
+def _keep(url: str, content: bytes) -> None:
+    with _last_good_lock:
+        _last_good[url] = content
+        _last_good.move_to_end(url)
+        while len(_last_good) > LAST_GOOD_IN_MEMORY:
+            _last_good.popitem(last=False)
+    try:
+        # Workers and processes may keep the same template at once
+        write_atomic(_last_good_path(url), content)
+    except OSError as e:
+        print(f"WARNING: could not keep a copy of {url}: {e}")
+
+
+def _stale(url: str) -> Optional[bytes]:
+    with _last_good_lock:
+        content = _last_good.get(url)
+    if content is not None:
+        return content
+    try:
+        with open(_last_good_path(url), "rb") as f:
+            content = f.read()
+    except OSError:
+        return None
+    fallback_stats["stale_from_disk"] += 1
+    with _last_good_lock:
+        _last_good[url] = content
+    return content
+
+
+def _download(url: str, deadline: Optional[float]) -> bytes:
+    import http_client
+    response = http_client.get(url, deadline=deadline)
+    if response.status_code == 404:
+        return MISSING
+    response.raise_for_status()
+    _keep(url, response.content)
+    return response.content
+
+
+def fetch(url: str, deadline: Optional[float] = None, missing_ok: bool = False) -> Optional[bytes]:
+    """
+    Template bytes at url. A 404 returns None with missing_ok, otherwise it
+    raises requests.HTTPError, as raise_for_status() would. If storage fails
+    (or its circuit is open) the last good copy is returned; without one the
+    error is raised. Failures are not cached.
+    """
+    import requests
+    try:
+        content = templates.get_or_load(url, lambda: _download(url, deadline))
+    except requests.RequestException as e:
+        content = _stale(url)
+        if content is None:
+            fallback_stats["unavailable"] += 1
+            raise
+        fallback_stats["stale_served"] += 1
+        print(f"WARNING: storage unavailable ({e}), using the last good copy of {url}")
+        return content
+    if content == MISSING:
+        if missing_ok:
+            return None
+        raise requests.HTTPError(f"404 Client Error: Not Found for url: {url}")
+    return content
+
+
+def prime(urls=None, workers: int = 4) -> Dict[str, str]:
+    """Download the registered templates (or urls) into the cache; {url: ok | missing | error}."""
+    urls = list(urls if urls is not None else _registered)
+
+    def load(url):
+        try:
+            return url, "ok" if fetch(url, missing_ok=True) is not None else "missing"
+        except Exception as e:
+            return url, f"error: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        results = dict(pool.map(load, urls))
+    failed = {url: state for url, state in results.items() if state != "ok"}
+    print(f"DEBUG: primed {len(results) - len(failed)}/{len(results)} templates"
+          + (f", not cached: {failed}" if failed else ""))
+    return results
@@ -1,11 +1,10 @@
-from docxtpl import DocxTemplate
 from io import BytesIO
 from datetime import datetime
 import os
 from decimal import Decimal, ROUND_DOWN
 from typing import List, Dict, Any
 from utils import resource_path
-import requests  # Add this import
+import template_cache
 
 
 def download_template_from_supabase(url: str):
@@ -13,19 +12,19 @@ def download_template_from_supabase(url: str):
     Download template from Supabase storage and return as BytesIO.
     
     Args:
-        url: Supabase URL (e.g., https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/quotations/...)
+        url: Supabase URL (e.g., storage.template_url("quotations/QT.docx"))
     
     Returns:
         BytesIO object containing the template
     """
+    import requests
     try:
         print(f"DEBUG: Downloading template from Supabase: {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        content = template_cache.fetch(url)
         
         # Return the template as BytesIO
-        template_bytesio = BytesIO(response.content)
-        print(f"DEBUG: Successfully downloaded template ({len(response.content)} bytes)")
+        template_bytesio = BytesIO(content)
+        print(f"DEBUG: Successfully downloaded template ({len(content)} bytes)")
         
         return template_bytesio
         
@@ -67,6 +66,7 @@ class QuotationTemplateProcessor:
             print(f"DEBUG: Using provided template source (BytesIO)")
 
     def process_quotation(self, quotation_data, client_data, items):
+        from docxtpl import DocxTemplate
         # DocxTemplate can open both a file path and a memory stream
         doc = DocxTemplate(self.template_source)
         context = self._prepare_context(quotation_data, client_data, items)
@@ -1,21 +1,25 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from db import get_connection
-from psycopg2.extras import DictCursor
-from openpyxl import load_workbook
+from psycopg2.extras import DictCursor, execute_values
 from utils import resource_path
+from storage import template_url
+import template_cache
 
 import tempfile
 import os
 from fastapi.responses import FileResponse
-import requests  # For Supabase downloads
 from io import BytesIO  # For handling template bytes
 
 router = APIRouter(prefix="/test-requests", tags=["5. Test Requests"])
 
 
+DEFAULT_TEMPLATE_URL = template_url("test-requests/ST_Test_Request.xlsx")
+template_cache.register(DEFAULT_TEMPLATE_URL)
+
+
 def download_test_request_template_from_supabase(template_url: str = None):
     """
     Download test request template from Supabase storage.
@@ -26,19 +30,17 @@ def download_test_request_template_from_supabase(template_url: str = None):
     Returns:
         BytesIO object containing the template
     """
+    import requests
     try:
-        # Default template URL
-        default_url = "https://hqwgkmbjmcxpxbwccclo.supabase.co/storage/v1/object/public/templates/test-requests/ST_Test_Request.xlsx"
-        
-        url = template_url or default_url
+        # The parameter shadows storage.template_url, hence the module-level default
+        url = template_url or DEFAULT_TEMPLATE_URL
         print(f"DEBUG: Downloading test request template from Supabase: {url}")
         
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        content = template_cache.fetch(url)
         
         # Return the template as BytesIO
-        template_bytesio = BytesIO(response.content)
-        print(f"DEBUG: Successfully downloaded test request template ({len(response.content)} bytes)")
+        template_bytesio = BytesIO(content)
+        print(f"DEBUG: Successfully downloaded test request template ({len(content)} bytes)")
         
         return template_bytesio
         
@@ -87,6 +89,7 @@ class TestRequestExcelGenerator:
         """
         Fill the Excel template with test request data
         """
+        from openpyxl import load_workbook
         try:
             # Load the template from BytesIO or file path
             if isinstance(self.template_source, BytesIO):
@@ -162,6 +165,30 @@ class TestRequestStatusUpdate(BaseModel):
 class ItemQuantityUpdate(BaseModel):
     quantity: int
 
+class TestRequestItemAddById(BaseModel):
+    quotation_item_id: int   # Real quotation_items.item_id (not an index)
+    quantity: Optional[int] = None
+
+class ItemQuantityUpdateById(BaseModel):
+    quantity: int
+    row_version: Optional[int] = None  # Version last read; omit to overwrite
+
+class TestRequestItemOperation(BaseModel):
+    op: Literal["add", "update", "delete"]
+    # add: quotation item index (1,2,3) exactly as in TestRequestItemAdd
+    quotation_item_id: Optional[int] = None
+    # update/delete: tri_id, or item_index as used by PUT /items/{item_index}/quantity
+    # (resolved against the items as they were before the batch)
+    tri_id: Optional[int] = None
+    item_index: Optional[int] = None
+    row_version: Optional[int] = None  # refuse (409) if the item changed since it was read
+    quantity: Optional[int] = None
+
+class TestRequestItemBatch(BaseModel):
+    operations: List[TestRequestItemOperation]
+    # Copy updated quantities onto the quotation items, like PUT /items/{item_index}/quantity
+    sync_quotation: bool = True
+
 
 # ---------------------------
 # Helper - Generate Test Request No (NEW FORMAT)
@@ -324,69 +351,80 @@ def update_test_request_status(test_request_id: int, payload: TestRequestStatusU
 # ================================================================
 # ADD ITEM (WITH INDEX → ACTUAL ITEM ID MAPPING) - FIXED VERSION
 # ================================================================
-@router.post("/{test_request_id}/items")
-def add_test_item(test_request_id: int, payload: TestRequestItemAdd):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    try:
-        # 1️⃣ Get project for this test request
+def _add_test_item_by_id(cur, test_request_id, quotation_item_id, quantity=None):
+    """Insert one item; quotation_item_id must be on the project's quotation. Returns (tri_id, quantity used)."""
+    cur.execute("""
+        SELECT qi.quantity
+        FROM test_requests tr
+        JOIN projects p ON tr.project_id = p.project_id
+        JOIN quotation_items qi ON qi.quotation_id = p.quotation_id
+        WHERE tr.test_request_id = %s AND qi.item_id = %s
+    """, (test_request_id, quotation_item_id))
+    row = cur.fetchone()
+
+    if row is None:
         cur.execute("SELECT project_id FROM test_requests WHERE test_request_id = %s", (test_request_id,))
-        row = cur.fetchone()
-
-        if row is None:
+        if cur.fetchone() is None:
             raise HTTPException(404, "Test request not found")
+        raise HTTPException(404, f"Quotation item {quotation_item_id} is not on this project's quotation")
 
-        project_id = row[0]
-
-        # 2️⃣ Get quotation for that project
-        cur.execute("SELECT quotation_id FROM projects WHERE project_id = %s", (project_id,))
-        row = cur.fetchone()
-
-        if row is None:
-            raise HTTPException(404, "Project not found")
+    # Use user-provided quantity OR quotation quantity
+    quantity_to_use = quantity if quantity is not None else (row[0] or 1)
 
-        quotation_id = row[0]
+    cur.execute("""
+        INSERT INTO test_request_items (test_request_id, quotation_item_id, quantity)
+        VALUES (%s, %s, %s)
+        RETURNING tri_id
+    """, (test_request_id, quotation_item_id, quantity_to_use))
 
-        # 3️⃣ Fetch all items for this quotation WITH THEIR QUANTITIES
-        cur.execute("""
-            SELECT item_id, quantity
-            FROM quotation_items
-            WHERE quotation_id = %s
-            ORDER BY item_id
-        """, (quotation_id,))
+    return cur.fetchone()[0], quantity_to_use
 
-        items = cur.fetchall()  # Now each item is (item_id, quantity)
 
-        if not items:
-            raise HTTPException(404, "No quotation items found!")
+# Index-addressed wrapper kept for the existing screens; prefer POST /items/by-id
+@router.post("/{test_request_id}/items")
+def add_test_item(test_request_id: int, payload: TestRequestItemAdd):
+    conn = get_connection()
+    cur = conn.cursor()
 
-        # 4️⃣ User enters INDEX — convert to REAL item_id and get quotation quantity
+    try:
+        # User enters INDEX (1-based) — convert to REAL item_id with a single indexed lookup
         user_index = payload.quotation_item_id
 
-        if user_index < 1 or user_index > len(items):
-            raise HTTPException(404, f"Invalid test index: {user_index}. Must be between 1 and {len(items)}")
-
-        actual_item_id = items[user_index - 1][0]
-        quotation_quantity = items[user_index - 1][1] or 1  # Default to 1 if null
-
-        # 5️⃣ Use user-provided quantity OR quotation quantity
-        quantity_to_use = payload.quantity if payload.quantity is not None else quotation_quantity
-
-        # 6️⃣ Insert with the proper quantity
         cur.execute("""
-            INSERT INTO test_request_items (test_request_id, quotation_item_id, quantity)
-            VALUES (%s, %s, %s)
-            RETURNING tri_id
-        """, (test_request_id, actual_item_id, quantity_to_use))
+            SELECT qi.item_id
+            FROM test_requests tr
+            JOIN projects p ON tr.project_id = p.project_id
+            JOIN quotation_items qi ON qi.quotation_id = p.quotation_id
+            WHERE tr.test_request_id = %s
+            ORDER BY qi.item_id
+            OFFSET %s LIMIT 1
+        """, (test_request_id, max(user_index - 1, 0)))
+        row = cur.fetchone()
 
-        tri_id = cur.fetchone()[0]
+        if row is None or user_index < 1:
+            cur.execute("""
+                SELECT tr.project_id, p.project_id,
+                       (SELECT COUNT(*) FROM quotation_items qi WHERE qi.quotation_id = p.quotation_id)
+                FROM test_requests tr
+                LEFT JOIN projects p ON tr.project_id = p.project_id
+                WHERE tr.test_request_id = %s
+            """, (test_request_id,))
+            check = cur.fetchone()
+            if check is None:
+                raise HTTPException(404, "Test request not found")
+            if check[1] is None:
+                raise HTTPException(404, "Project not found")
+            if not check[2]:
+                raise HTTPException(404, "No quotation items found!")
+            raise HTTPException(404, f"Invalid test index: {user_index}. Must be between 1 and {check[2]}")
+
+        tri_id, quantity_to_use = _add_test_item_by_id(cur, test_request_id, row[0], payload.quantity)
         conn.commit()
 
         return {
             "message": "Item added",
             "tri_id": tri_id,
-            "actual_item_id": actual_item_id,
+            "actual_item_id": row[0],
             "quantity_used": quantity_to_use,
             "source": "user_input" if payload.quantity is not None else "quotation"
         }
@@ -485,6 +523,165 @@ def add_multiple_items(test_request_id: int, payload: TestRequestMultiItem):
         conn.close()
 
 
+# ================================================================
+# BATCH ITEM CHANGES (ONE TRANSACTION)
+# ================================================================
+@router.post("/{test_request_id}/items/batch")
+def batch_test_items(test_request_id: int, payload: TestRequestItemBatch):
+    """
+    Add, update and delete test request items atomically. Adds go in with one
+    INSERT; quantity changes are synced to the quotation with one UPDATE, whose
+    totals the quotation_items triggers adjust. A failing operation is reported as
+    400 with its position in the list and nothing is applied.
+    """
+    if not payload.operations:
+        raise HTTPException(400, "No operations given")
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT tr.status, p.quotation_id
+            FROM test_requests tr
+            LEFT JOIN projects p ON tr.project_id = p.project_id
+            WHERE tr.test_request_id = %s
+            FOR UPDATE OF tr
+        """, (test_request_id,))
+        row = cur.fetchone()
+        if row is None:
+            raise HTTPException(404, "Test request not found")
+        status, quotation_id = row
+
+        if status not in ['PENDING_SAMPLES', 'SAMPLES_RECEIVED'] and any(o.op != "add" for o in payload.operations):
+            raise HTTPException(400, f"Cannot modify items in {status} status")
+
+        cur.execute("""
+            SELECT item_id, quantity
+            FROM quotation_items
+            WHERE quotation_id = %s
+            ORDER BY item_id
+        """, (quotation_id,))
+        quotation_items = cur.fetchall()
+
+        cur.execute("""
+            SELECT tri_id, quotation_item_id
+            FROM test_request_items
+            WHERE test_request_id = %s
+            ORDER BY tri_id
+        """, (test_request_id,))
+        existing = cur.fetchall()
+        existing_ids = [r[0] for r in existing]
+        quotation_item_of = dict(existing)
+
+        new_rows = []
+        updated, deleted = [], []
+        deleted_ids = set()
+        quotation_quantities = {}
+
+        for position, o in enumerate(payload.operations):
+            def fail(message):
+                raise HTTPException(400, f"Operation {position} ({o.op}): {message}")
+
+            if o.quantity is not None and o.quantity <= 0:
+                fail("Quantity must be greater than zero")
+
+            if o.op == "add":
+                if o.quotation_item_id is None:
+                    fail("quotation_item_id is required")
+                if o.quotation_item_id < 1 or o.quotation_item_id > len(quotation_items):
+                    fail(f"Invalid test index: {o.quotation_item_id}. Must be between 1 and {len(quotation_items)}")
+                actual_item_id, quotation_quantity = quotation_items[o.quotation_item_id - 1]
+                new_rows.append((test_request_id, actual_item_id,
+                                 o.quantity if o.quantity is not None else (quotation_quantity or 1)))
+                continue
+
+            if o.tri_id is not None:
+                tri_id = o.tri_id
+                if tri_id not in quotation_item_of:
+                    fail(f"Item {tri_id} not found on this test request")
+            elif o.item_index is not None:
+                if o.item_index < 0 or o.item_index >= len(existing_ids):
+                    fail(f"Invalid item index {o.item_index}")
+                tri_id = existing_ids[o.item_index]
+            else:
+                fail("tri_id or item_index is required")
+            if tri_id in deleted_ids:
+                fail(f"Item {tri_id} was deleted earlier in this batch")
+            if o.row_version is not None:
+                cur.execute("SELECT row_version FROM test_request_items WHERE tri_id = %s FOR UPDATE", (tri_id,))
+                current_version = cur.fetchone()[0]
+                if current_version != o.row_version:
+                    raise HTTPException(409, {
+                        "message": f"Operation {position} ({o.op}): item was changed by someone else, reload and retry",
+                        "tri_id": tri_id,
+                        "current": {"row_version": current_version},
+                    })
+
+            if o.op == "delete":
+                cur.execute("SELECT COUNT(*) FROM samples WHERE assigned_tri_id = %s", (tri_id,))
+                if cur.fetchone()[0]:
+                    fail(f"Item {tri_id} has samples assigned to it")
+                cur.execute("DELETE FROM test_request_items WHERE tri_id = %s", (tri_id,))
+                deleted_ids.add(tri_id)
+                deleted.append(tri_id)
+                continue
+
+            if o.quantity is None:
+                fail("quantity is required")
+            cur.execute("UPDATE test_request_items SET quantity = %s WHERE tri_id = %s", (o.quantity, tri_id))
+            updated.append({"tri_id": tri_id, "new_quantity": o.quantity})
+            if quotation_item_of[tri_id] is not None:
+                quotation_quantities[quotation_item_of[tri_id]] = o.quantity
+
+        added = []
+        if new_rows:
+            inserted = execute_values(cur, """
+                INSERT INTO test_request_items (test_request_id, quotation_item_id, quantity)
+                VALUES %s
+                RETURNING tri_id
+            """, new_rows, fetch=True)
+            added = sorted(r[0] for r in inserted)
+
+        totals = None
+        if payload.sync_quotation and quotation_quantities and quotation_id is not None:
+            # execute_values takes a single %s, so the (int) quotation_id is inlined
+            execute_values(cur, f"""
+                UPDATE quotation_items qi
+                SET quantity = v.quantity
+                FROM (VALUES %s) AS v(item_id, quantity)
+                WHERE qi.item_id = v.item_id AND qi.quotation_id = {int(quotation_id)}
+            """, list(quotation_quantities.items()))
+            # Quotation totals follow from the item change (quotation_items triggers)
+            cur.execute("""
+                SELECT total_amount, vat, grand_total FROM quotations WHERE quotation_id = %s
+            """, (quotation_id,))
+            row = cur.fetchone()
+            totals = {"total_amount": float(row[0]), "vat": float(row[1]), "grand_total": float(row[2])}
+
+        conn.commit()
+
+        return {
+            "message": f"{len(payload.operations)} operation(s) applied",
+            "test_request_id": test_request_id,
+            "added_item_ids": added,
+            "updated": updated,
+            "deleted_item_ids": deleted,
+            "quotation_updated": totals is not None,
+            "totals": totals
+        }
+
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, f"Error applying item batch: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+
 # ================================================================
 # COPY ALL ITEMS FROM QUOTATION WITH QUANTITIES
 # ================================================================
@@ -595,10 +792,12 @@ def get_test_request(test_request_id: int):
         # Items
         cur.execute("""
             SELECT tri.tri_id, tri.quantity,
-                   qi.description, qi.test_standard, qi.unit_rate, qi.item_id
+                   qi.description, qi.test_standard, qi.unit_rate, qi.item_id,
+                   tri.row_version
             FROM test_request_items tri
             JOIN quotation_items qi ON tri.quotation_item_id = qi.item_id
             WHERE tri.test_request_id = %s
+            ORDER BY tri.tri_id
         """, (test_request_id,))
 
         items = []
@@ -613,7 +812,8 @@ def get_test_request(test_request_id: int):
                 "test_standard": r[3],
                 "unit_rate": unit_rate,
                 "amount": unit_rate * quantity,
-                "item_id": r[5]  # Include actual item_id for reference
+                "item_id": r[5],  # Include actual item_id for reference
+                "row_version": r[6]
             })
 
         return {
@@ -1030,7 +1230,158 @@ def get_projects_with_remaining_tests():
         conn.close()
 
 
-# Add to tests.py after the existing endpoints
+# ================================================================
+# ITEMS BY ID (OPTIMISTIC CONCURRENCY)
+# ================================================================
+# tri_id / item_id addressing. Quantity edits carry the row_version the client
+# read (GET /test-requests/{id} lists it per item); a stale version gets 409 and
+# the current row instead of overwriting someone else's change.
+
+def _update_test_item_quantity(cur, test_request_id, tri_id, quantity, row_version=None):
+    """Set one item's quantity and sync it to the quotation. Returns (new quantity, row_version, totals or None)."""
+    cur.execute("""
+        SELECT tri.quotation_item_id, tri.quantity, tri.row_version
+        FROM test_request_items tri
+        WHERE tri.tri_id = %s AND tri.test_request_id = %s
+        FOR UPDATE
+    """, (tri_id, test_request_id))
+
+    item = cur.fetchone()
+
+    if not item:
+        raise HTTPException(404, "Test request item not found")
+
+    quotation_item_id, old_quantity, current_version = item
+
+    if row_version is not None and current_version != row_version:
+        raise HTTPException(409, {
+            "message": "Item was changed by someone else, reload and retry",
+            "tri_id": tri_id,
+            "current": {"quantity": old_quantity, "row_version": current_version},
+        })
+
+    # Validate test request status allows changes
+    cur.execute("""
+        SELECT status FROM test_requests 
+        WHERE test_request_id = %s
+    """, (test_request_id,))
+
+    test_request = cur.fetchone()
+    if not test_request:
+        raise HTTPException(404, "Test request not found")
+
+    # Only allow updates if status is PENDING_SAMPLES or SAMPLES_RECEIVED
+    if test_request[0] not in ['PENDING_SAMPLES', 'SAMPLES_RECEIVED']:
+        raise HTTPException(400, f"Cannot modify items in {test_request[0]} status")
+
+    if quantity <= 0:
+        raise HTTPException(400, "Quantity must be greater than zero")
+
+    cur.execute("""
+        UPDATE test_request_items
+        SET quantity = %s
+        WHERE tri_id = %s
+        RETURNING quantity, row_version
+    """, (quantity, tri_id))
+
+    updated = cur.fetchone()
+
+    # Sync to quotation item
+    cur.execute("""
+        SELECT q.quotation_id
+        FROM test_requests tr
+        JOIN projects p ON tr.project_id = p.project_id
+        JOIN quotations q ON p.quotation_id = q.quotation_id
+        WHERE tr.test_request_id = %s
+    """, (test_request_id,))
+
+    quotation_result = cur.fetchone()
+    totals = None
+    if quotation_result:
+        quotation_id = quotation_result[0]
+
+        cur.execute("""
+            UPDATE quotation_items
+            SET quantity = %s
+            WHERE item_id = %s AND quotation_id = %s
+        """, (quantity, quotation_item_id, quotation_id))
+
+        # Quotation totals follow from the item change (quotation_items triggers)
+        cur.execute("""
+            SELECT total_amount, vat, grand_total FROM quotations WHERE quotation_id = %s
+        """, (quotation_id,))
+
+        row = cur.fetchone()
+        totals = {
+            "total_amount": float(row[0]),
+            "vat": float(row[1]),
+            "grand_total": float(row[2]),
+        }
+
+    return updated[0], updated[1], totals
+
+
+@router.post("/{test_request_id}/items/by-id")
+def add_test_item_by_id(test_request_id: int, payload: TestRequestItemAddById):
+    """Add a quotation item (by its real item_id) to a test request"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        tri_id, quantity_used = _add_test_item_by_id(cur, test_request_id, payload.quotation_item_id, payload.quantity)
+        conn.commit()
+
+        return {
+            "message": "Item added",
+            "tri_id": tri_id,
+            "actual_item_id": payload.quotation_item_id,
+            "quantity_used": quantity_used,
+            "source": "user_input" if payload.quantity is not None else "quotation"
+        }
+
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, f"Error adding item: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+@router.put("/{test_request_id}/items/by-id/{tri_id}/quantity")
+def update_test_item_quantity_by_id(test_request_id: int, tri_id: int, payload: ItemQuantityUpdateById):
+    """Update one item's quantity (synced to the quotation), guarded by row_version"""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        new_quantity, row_version, totals = _update_test_item_quantity(
+            cur, test_request_id, tri_id, payload.quantity, payload.row_version)
+        conn.commit()
+
+        return {
+            "message": "Quantity updated and synced to quotation",
+            "tri_id": tri_id,
+            "new_quantity": new_quantity,
+            "row_version": row_version,
+            "quotation_updated": totals is not None,
+            "totals": totals
+        }
+
+    except HTTPException:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(500, f"Error updating quantity: {str(e)}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Index-addressed wrapper kept for the existing screens; prefer /items/by-id/{tri_id}/quantity
 @router.put("/{test_request_id}/items/{item_index}/quantity")
 def update_test_item_quantity(test_request_id: int, item_index: int, payload: ItemQuantityUpdate):
     """Update quantity of a test request item AND sync to quotation"""
@@ -1038,9 +1389,8 @@ def update_test_item_quantity(test_request_id: int, item_index: int, payload: It
     cur = conn.cursor()
 
     try:
-        # 1. Get test request item details including quotation_item_id
         cur.execute("""
-            SELECT tri.tri_id, tri.quotation_item_id, tri.quantity
+            SELECT tri.tri_id
             FROM test_request_items tri
             WHERE tri.test_request_id = %s
             ORDER BY tri.tri_id
@@ -1051,87 +1401,16 @@ def update_test_item_quantity(test_request_id: int, item_index: int, payload: It
         
         if not item:
             raise HTTPException(404, "Test request item not found")
-        
-        tri_id, quotation_item_id, old_quantity = item
-        
-        # 2. Validate test request status allows changes
-        cur.execute("""
-            SELECT status FROM test_requests 
-            WHERE test_request_id = %s
-        """, (test_request_id,))
-        
-        test_request = cur.fetchone()
-        if not test_request:
-            raise HTTPException(404, "Test request not found")
-        
-        # Only allow updates if status is PENDING_SAMPLES or SAMPLES_RECEIVED
-        if test_request[0] not in ['PENDING_SAMPLES', 'SAMPLES_RECEIVED']:
-            raise HTTPException(400, f"Cannot modify items in {test_request[0]} status")
-        
-        if payload.quantity <= 0:
-            raise HTTPException(400, "Quantity must be greater than zero")
-        
-        # 3. Update test request item quantity
-        cur.execute("""
-            UPDATE test_request_items
-            SET quantity = %s
-            WHERE tri_id = %s
-            RETURNING tri_id, quantity
-        """, (payload.quantity, tri_id))
-        
-        updated = cur.fetchone()
-        
-        # 4. Sync to quotation item (if needed)
-        # Get the quotation_id from the project
-        cur.execute("""
-            SELECT q.quotation_id
-            FROM test_requests tr
-            JOIN projects p ON tr.project_id = p.project_id
-            JOIN quotations q ON p.quotation_id = q.quotation_id
-            WHERE tr.test_request_id = %s
-        """, (test_request_id,))
-        
-        quotation_result = cur.fetchone()
-        if quotation_result:
-            quotation_id = quotation_result[0]
-            
-            # Update quotation item quantity
-            cur.execute("""
-                UPDATE quotation_items
-                SET quantity = %s
-                WHERE item_id = %s AND quotation_id = %s
-                RETURNING amount
-            """, (payload.quantity, quotation_item_id, quotation_id))
-            
-            # Recalculate quotation totals
-            cur.execute("""
-                UPDATE quotations
-                SET total_amount = sub.total,
-                    vat = sub.total * 0.05,
-                    grand_total = sub.total * 1.05
-                FROM (
-                    SELECT SUM(unit_rate * quantity) as total
-                    FROM quotation_items
-                    WHERE quotation_id = %s
-                ) sub
-                WHERE quotation_id = %s
-                RETURNING total_amount, vat, grand_total
-            """, (quotation_id, quotation_id))
-            
-            totals = cur.fetchone()
-        
+
+        new_quantity, _, totals = _update_test_item_quantity(cur, test_request_id, item[0], payload.quantity)
         conn.commit()
         
         return {
             "message": "Quantity updated and synced to quotation",
-            "tri_id": updated[0],
-            "new_quantity": updated[1],
-            "quotation_updated": bool(quotation_result),
-            "totals": {
-                "total_amount": float(totals[0]) if quotation_result else 0,
-                "vat": float(totals[1]) if quotation_result else 0,
-                "grand_total": float(totals[2]) if quotation_result else 0,
-            } if quotation_result else None
+            "tri_id": item[0],
+            "new_quantity": new_quantity,
+            "quotation_updated": totals is not None,
+            "totals": totals
         }
         
     except Exception as e:
@@ -1139,4 +1418,4 @@ def update_test_item_quantity(test_request_id: int, item_index: int, payload: It
         raise HTTPException(500, f"Error updating quantity: {str(e)}")
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
@@ -0,0 +1,198 @@
+# totals_consistency.py
+"""
+Consistency check for the trigger-maintained totals (migrations/0005, 0012).
+
+quotations.total_amount/vat/grand_total, invoices.subtotal/vat/total,
+invoices.linked_subtotal and invoice_items.linked are kept up to date by
+triggers applying deltas. This module re-derives them from the items and
+reports any row that disagrees. Derived figures (quotation totals, linked
+flags and linked subtotals) can be repaired; an invoice's own subtotal is an
+issued amount and is only rewritten on explicit request.
+
+main.py runs check_totals(repair_derived=True) every TOTALS_CHECK_INTERVAL_MIN minutes
+(default 60, 0 disables) on a background thread.
+
+    python -m totals_consistency                     report drift, exit 1 if any
+    python -m totals_consistency --repair            also fix derived figures
+    python -m totals_consistency --repair-invoices   also rewrite invoice subtotal/vat/total
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from db import get_connection
+
+QUOTATION_DRIFT = """
+    SELECT q.quotation_id, q.total_amount, sub.total
+    FROM quotations q
+    JOIN (
+        SELECT q2.quotation_id, COALESCE(SUM(qi.amount), 0) AS total
+        FROM quotations q2
+        LEFT JOIN quotation_items qi ON qi.quotation_id = q2.quotation_id
+        GROUP BY q2.quotation_id
+    ) sub ON sub.quotation_id = q.quotation_id
+    WHERE q.total_amount IS DISTINCT FROM sub.total
+       OR q.vat IS DISTINCT FROM ROUND(sub.total * 0.05, 2)
+       OR q.grand_total IS DISTINCT FROM ROUND(sub.total * 1.05, 2)
+    ORDER BY q.quotation_id
+"""
+
+INVOICE_DRIFT = """
+    SELECT i.invoice_id, i.subtotal, sub.total
+    FROM invoices i
+    JOIN (
+        SELECT i2.invoice_id, COALESCE(SUM(ii.amount), 0) AS total
+        FROM invoices i2
+        LEFT JOIN invoice_items ii ON ii.invoice_id = i2.invoice_id
+        GROUP BY i2.invoice_id
+    ) sub ON sub.invoice_id = i.invoice_id
+    WHERE i.subtotal IS DISTINCT FROM sub.total
+    ORDER BY i.invoice_id
+"""
+
+LINKED_FLAG_DRIFT = """
+    SELECT ii.invoice_id, ii.item_id
+    FROM invoice_items ii
+    WHERE ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description)
+    ORDER BY ii.invoice_id, ii.item_id
+"""
+
+LINKED_SUBTOTAL_DRIFT = """
+    SELECT i.invoice_id, i.linked_subtotal, sub.total
+    FROM invoices i
+    JOIN (
+        SELECT i2.invoice_id, COALESCE(SUM(ii.amount) FILTER (WHERE ii.linked), 0) AS total
+        FROM invoices i2
+        LEFT JOIN invoice_items ii ON ii.invoice_id = i2.invoice_id
+        GROUP BY i2.invoice_id
+    ) sub ON sub.invoice_id = i.invoice_id
+    WHERE i.linked_subtotal IS DISTINCT FROM sub.total
+    ORDER BY i.invoice_id
+"""
+
+
+def find_drift(cur):
+    """{check name: [rows]} for every figure that disagrees with its items."""
+    drift = {}
+    for name, sql in (("quotation_totals", QUOTATION_DRIFT), ("invoice_totals", INVOICE_DRIFT),
+                      ("linked_flags", LINKED_FLAG_DRIFT), ("linked_subtotals", LINKED_SUBTOTAL_DRIFT)):
+        cur.execute(sql)
+        drift[name] = cur.fetchall()
+    return drift
+
+
+def repair(cur, invoices=False):
+    """Re-derive the drifted figures. Invoice subtotal/vat/total only with invoices=True."""
+    cur.execute("""
+        UPDATE quotations q
+        SET total_amount = sub.total,
+            vat = sub.total * 0.05,
+            grand_total = sub.total * 1.05
+        FROM (""" + QUOTATION_DRIFT.replace("ORDER BY q.quotation_id", "") + """) sub
+        WHERE q.quotation_id = sub.quotation_id
+    """)
+    # Flags first: the UPDATE moves linked_subtotal through the invoice_items trigger
+    cur.execute("""
+        UPDATE invoice_items ii
+        SET linked = invoice_item_is_linked(ii.invoice_id, ii.description)
+        WHERE ii.linked IS DISTINCT FROM invoice_item_is_linked(ii.invoice_id, ii.description)
+    """)
+    cur.execute("""
+        UPDATE invoices i
+        SET linked_subtotal = sub.total
+        FROM (""" + LINKED_SUBTOTAL_DRIFT.replace("ORDER BY i.invoice_id", "") + """) sub
+        WHERE i.invoice_id = sub.invoice_id
+    """)
+    if invoices:
+        cur.execute("""
+            UPDATE invoices i
+            SET subtotal = sub.total,
+                vat = sub.total * 0.05,
+                total = sub.total * 1.05
+            FROM (""" + INVOICE_DRIFT.replace("ORDER BY i.invoice_id", "") + """) sub
+            WHERE i.invoice_id = sub.invoice_id
+        """)
+
+
+def check_totals(conn, repair_derived=False, repair_invoices=False):
+    """Report drift (and optionally repair it). Returns the drift found before repairing."""
+    cur = conn.cursor()
+    try:
+        drift = find_drift(cur)
+        if repair_derived or repair_invoices:
+            repair(cur, invoices=repair_invoices)
+        conn.commit()
+        return drift
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _describe(drift):
+    parts = [f"{len(rows)} {name.replace('_', ' ')}" for name, rows in drift.items() if rows]
+    return ", ".join(parts) if parts else "no drift"
+
+
+def _run_periodically(interval_minutes):
+    while True:
+        time.sleep(interval_minutes * 60)
+        try:
+            conn = get_connection()
+        except Exception as e:
+            print(f"ERROR: totals check could not connect: {e}")
+            continue
+        try:
+            drift = check_totals(conn, repair_derived=True)
+            if any(drift.values()):
+                print(f"WARNING: totals check found {_describe(drift)} (derived figures repaired)")
+                for invoice_id, stored, expected in drift["invoice_totals"][:20]:
+                    print(f"WARNING:   invoice {invoice_id} subtotal {stored} but items sum to {expected}")
+        except Exception as e:
+            print(f"ERROR: totals check failed: {e}")
+        finally:
+            conn.close()
+
+
+def start_consistency_job():
+    """Start the periodic check on a daemon thread unless TOTALS_CHECK_INTERVAL_MIN=0."""
+    interval = float(os.getenv("TOTALS_CHECK_INTERVAL_MIN", "60"))
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=_run_periodically, args=(interval,), name="totals-check", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check trigger-maintained quotation and invoice totals")
+    parser.add_argument("--repair", action="store_true", help="re-derive quotation totals and linked figures")
+    parser.add_argument("--repair-invoices", action="store_true",
+                        help="also rewrite invoice subtotal/vat/total from their items")
+    options = parser.parse_args(argv)
+
+    conn = get_connection()
+    try:
+        drift = check_totals(conn, repair_derived=options.repair, repair_invoices=options.repair_invoices)
+    finally:
+        conn.close()
+
+    for quotation_id, stored, expected in drift["quotation_totals"]:
+        print(f"quotation {quotation_id:<8} total_amount {stored} != items {expected}")
+    for invoice_id, stored, expected in drift["invoice_totals"]:
+        print(f"invoice   {invoice_id:<8} subtotal {stored} != items {expected}")
+    for invoice_id, item_id in drift["linked_flags"]:
+        print(f"invoice   {invoice_id:<8} item {item_id} linked flag out of date")
+    for invoice_id, stored, expected in drift["linked_subtotals"]:
+        print(f"invoice   {invoice_id:<8} linked_subtotal {stored} != linked items {expected}")
+
+    print(f"\n{_describe(drift)}" + (" (repaired)" if any(drift.values()) and (options.repair or options.repair_invoices) else ""))
+    if any(drift.values()) and not (options.repair or options.repair_invoices):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
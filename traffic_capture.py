@@ -0,0 +1,211 @@
+# traffic_capture.py
+"""
+Opt-in capture of API traffic metadata for load testing.
+
+With TRAFFIC_CAPTURE=1 in .env every API request is appended as one JSON line
+to logs/traffic/traffic-YYYY-MM-DD-NNN.jsonl (next to the exe/script). A line holds
+the method, route template, path/query params, the *shape* of the JSON body,
+status, duration and response size - never header values, uploaded files or
+free-text strings. benchmarks/replay.py re-issues a captured day against a test
+instance.
+
+Settings (.env):
+    TRAFFIC_CAPTURE=1                 enable
+    TRAFFIC_CAPTURE_DIR=...           output folder (default <exe dir>/logs/traffic)
+    TRAFFIC_CAPTURE_MAX_MB=50         start a new segment file after this size
+    TRAFFIC_CAPTURE_KEEP_DAYS=14      delete segments older than this
+    TRAFFIC_CAPTURE_SAMPLE=1.0        fraction of requests recorded
+"""
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import db  # noqa: F401  - loads .env before the settings below are read
+
+SENSITIVE_KEYS = re.compile(r"pass|token|secret|auth|email|phone|address|contact|note|remark|search|^q$", re.I)
+ENUM_VALUE = re.compile(r"^[A-Z][A-Z0-9_]{1,24}$")
+DATE_VALUE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+MAX_BODY_BYTES = 256 * 1024
+SKIPPED_ROUTES = {"/{full_path:path}"}
+
+
+def body_shape(value, key=""):
+    """
+    Replace a JSON value with its shape.
+
+    Numbers, booleans and nulls are kept (ids, quantities); strings become "$str"
+    or "$date" unless they look like an enum ("TAX", "MAT"); lists become
+    {"$list": length, "$item": shape of the first element}.
+    """
+    if isinstance(value, dict):
+        return {k: body_shape(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return {"$list": len(value), "$item": body_shape(value[0], key) if value else None}
+    if isinstance(value, str):
+        if SENSITIVE_KEYS.search(key):
+            return "$str"
+        if ENUM_VALUE.match(value):
+            return value
+        if DATE_VALUE.match(value):
+            return "$date"
+        return "$str"
+    return value
+
+
+def _sanitize_params(params):
+    clean = {}
+    for key, value in params.items():
+        value = str(value)
+        clean[key] = "$str" if SENSITIVE_KEYS.search(key) or len(value) > 64 else value
+    return clean
+
+
+class TrafficLog:
+    """Appends records from a queue on a background thread, one segment file per day/size."""
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024, keep_days=14):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep_days = keep_days
+        self._queue = queue.Queue(maxsize=10000)
+        self._file = None
+        self._day = None
+        self._segment = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=self._run, name="traffic-capture", daemon=True).start()
+
+    def write(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Never slow a request down for the sake of capture
+            self.dropped += 1
+
+    def _segment_path(self, day, segment):
+        return os.path.join(self.directory, f"traffic-{day.isoformat()}-{segment:03d}.jsonl")
+
+    def _open(self):
+        today = date.today()
+        if self._file and self._day == today and self._file.tell() < self.max_bytes:
+            return
+        if self._file:
+            self._file.close()
+        if self._day != today:
+            self._day, self._segment = today, 0
+            self._purge_old()
+        while os.path.exists(self._segment_path(today, self._segment)) and \
+                os.path.getsize(self._segment_path(today, self._segment)) >= self.max_bytes:
+            self._segment += 1
+        self._file = open(self._segment_path(today, self._segment), "a", encoding="utf-8")
+
+    def _purge_old(self):
+        cutoff = (date.today() - timedelta(days=self.keep_days)).isoformat()
+        for name in os.listdir(self.directory):
+            if name.startswith("traffic-") and name[8:18] < cutoff:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self._open()
+                self._file.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                print(f"ERROR: traffic capture write failed: {e}")
+
+
+class TrafficCaptureMiddleware:
+    """Pure ASGI middleware, so request bodies stream through untouched."""
+
+    def __init__(self, app, log, sample_rate=1.0):
+        self.app = app
+        self.log = log
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        headers = dict(scope.get("headers") or [])
+        content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0]
+        keep_body = content_type == "application/json"
+        body = bytearray()
+        body_bytes = 0
+        response = {"status": 500, "bytes": 0}
+
+        async def receive_wrapper():
+            nonlocal body_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_bytes += len(chunk)
+                if keep_body and len(body) < MAX_BODY_BYTES:
+                    body.extend(chunk)
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None)
+            if route_path and route_path not in SKIPPED_ROUTES:
+                shape = None
+                if keep_body and body and len(body) < MAX_BODY_BYTES:
+                    try:
+                        shape = body_shape(json.loads(body))
+                    except ValueError:
+                        shape = "$invalid"
+                query = {}
+                for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+                    if pair:
+                        key, _, value = pair.partition("=")
+                        query[key] = value
+                self.log.write({
+                    "ts": round(time.time(), 3),
+                    "method": scope["method"],
+                    "route": route_path,
+                    "path_params": _sanitize_params(scope.get("path_params") or {}),
+                    "query": _sanitize_params(query),
+                    "content_type": content_type or None,
+                    "body": shape,
+                    "body_bytes": body_bytes,
+                    "status": response["status"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "response_bytes": response["bytes"],
+                })
+
+
+def install_traffic_capture(app, base_dir):
+    """Add the capture middleware when TRAFFIC_CAPTURE is enabled. Returns the TrafficLog or None."""
+    if os.getenv("TRAFFIC_CAPTURE", "").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    directory = os.getenv("TRAFFIC_CAPTURE_DIR") or os.path.join(base_dir, "logs", "traffic")
+    log = TrafficLog(
+        directory,
+        max_bytes=int(float(os.getenv("TRAFFIC_CAPTURE_MAX_MB", "50")) * 1024 * 1024),
+        keep_days=int(os.getenv("TRAFFIC_CAPTURE_KEEP_DAYS", "14")),
+    )
+    app.add_middleware(TrafficCaptureMiddleware, log=log,
+                       sample_rate=float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "1.0")))
+    print(f"Traffic capture enabled -> {directory} ({datetime.now():%Y-%m-%d})")
+    return log
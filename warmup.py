@@ -0,0 +1,187 @@
+# warmup.py
+"""
+Warm-up phase run from the lifespan.
+
+After a restart the first quotation, invoice and worksheet downloads each paid
+for the template download, the first openpyxl/docxtpl import and parse, new
+database connections and the reference queries. The warm-up does that work
+up front, as steps:
+
+    pool        open DB_POOL_MIN (default 2) pooled connections
+    catalog     load the active price catalog into ref_cache
+    clients     load the client list into ref_cache
+    templates   download the registered templates (quotation TEMPLATE_URLS,
+                invoice / delivery note, test request) into template_cache and
+                parse each once - imports openpyxl / docxtpl, shows broken files
+    worksheets  worksheet and report templates of the WARMUP_TOP_ITEMS (default
+                10) item codes most used by recent samples
+
+Settings (.env):
+    WARMUP=background   run after startup in a thread; the app answers at once
+                        (default - the desktop window opens as early as before)
+    WARMUP=blocking     finish before taking requests (server.py workers; 1/on)
+    WARMUP=off          skip (0/false)
+    WARMUP_STEPS=pool,catalog,...   subset of the steps above
+
+Progress and per-step timings are in GET /api/health under "warmup".
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import db
+import ref_cache
+import template_cache
+
+STEPS = ("pool", "catalog", "clients", "templates", "worksheets")
+RECENT_SAMPLES = 2000  # "most used" = among the latest samples
+
+state = {"mode": None, "state": "pending", "total_ms": None, "steps": {}}
+
+
+def mode():
+    value = os.getenv("WARMUP", "background").strip().lower()
+    if value in ("1", "true", "yes", "on", "blocking"):
+        return "blocking"
+    if value in ("0", "false", "no", "off"):
+        return "off"
+    return "background"
+
+
+def _selected_steps():
+    names = [s.strip() for s in os.getenv("WARMUP_STEPS", ",".join(STEPS)).split(",") if s.strip()]
+    unknown = [name for name in names if name not in STEPS]
+    if unknown:
+        print(f"WARNING: unknown WARMUP_STEPS entries ignored: {', '.join(unknown)}")
+    return [name for name in STEPS if name in names]
+
+
+# ---- steps: each returns a short detail for /api/health ----
+def warm_pool():
+    if not db.POOL_ENABLED:
+        return "pooling disabled"
+    pool = db.get_pool()
+    conns = [db.get_connection()]
+    wanted = min(int(os.getenv("DB_POOL_MIN", "2")), pool.maxconn)
+    conns += [db.get_connection() for _ in range(wanted - 1)]
+    for conn in conns:
+        conn.close()
+    return f"{len(conns)} of {pool.maxconn} connections open"
+
+
+def warm_catalog():
+    from quotations import get_price_catalog
+    return f"{len(get_price_catalog())} items"
+
+
+def warm_clients():
+    from enquiries import get_clients
+    return f"{len(get_clients())} clients"
+
+
+def _parse(url, content):
+    if url.endswith(".docx"):
+        from docxtpl import DocxTemplate
+        DocxTemplate(BytesIO(content)).get_docx()
+    elif url.endswith(".xlsx"):
+        import openpyxl
+        openpyxl.load_workbook(BytesIO(content)).close()
+
+
+def warm_templates():
+    results = template_cache.prime()
+    problems = {url: result for url, result in results.items() if result != "ok"}
+    for url, result in results.items():
+        if result == "ok":
+            try:
+                _parse(url, template_cache.fetch(url))
+            except Exception as e:
+                problems[url] = f"parse failed: {e}"
+    if problems:
+        raise RuntimeError(f"{len(problems)} of {len(results)} templates not ready: {problems}")
+    return f"{len(results)} templates cached and parsed"
+
+
+def most_used_items(limit):
+    conn = db.get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT qi.item_code, MAX(qi.description)
+            FROM (SELECT assigned_quotation_item_id FROM samples ORDER BY sample_id DESC LIMIT %s) s
+            JOIN quotation_items qi ON qi.item_id = s.assigned_quotation_item_id
+            WHERE qi.item_code IS NOT NULL
+            GROUP BY qi.item_code
+            ORDER BY COUNT(*) DESC
+            LIMIT %s
+        """, (RECENT_SAMPLES, limit))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def warm_worksheets():
+    from reports import get_template_from_supabase
+    from samples_workflow import worksheet_template_urls
+
+    def warm_item(item):
+        # Same lookups the downloads make; hits and misses both end up cached
+        item_code, test_name = item
+        worksheet = any(template_cache.fetch(url, missing_ok=True) is not None
+                        for url in worksheet_template_urls(item_code))
+        report = get_template_from_supabase(item_code, test_name or "")[0] is not None
+        return worksheet, report
+
+    items = most_used_items(int(os.getenv("WARMUP_TOP_ITEMS", "10")))
+    if not items:
+        return "no samples yet"
+    with ThreadPoolExecutor(max_workers=min(8, len(items))) as pool:
+        found = list(pool.map(warm_item, items))
+    return (f"{len(items)} item codes: {sum(w for w, _ in found)} worksheet, "
+            f"{sum(r for _, r in found)} report templates")
+
+
+STEP_FUNCTIONS = {
+    "pool": warm_pool,
+    "catalog": warm_catalog,
+    "clients": warm_clients,
+    "templates": warm_templates,
+    "worksheets": warm_worksheets,
+}
+
+
+def run():
+    """Run the selected steps in order; a failing step is recorded and the rest still run."""
+    started = time.perf_counter()
+    state.update(state="running", steps={})
+    # The ref_cache listener flushes every cache when it connects; warm after that
+    ref_cache.wait_until_listening()
+    failed = 0
+    for name in _selected_steps():
+        step_started = time.perf_counter()
+        try:
+            detail, ok = STEP_FUNCTIONS[name](), True
+        except Exception as e:
+            detail, ok = str(e), False
+            failed += 1
+        ms = round((time.perf_counter() - step_started) * 1000, 1)
+        state["steps"][name] = {"ok": ok, "ms": ms, "detail": detail}
+        print(f"DEBUG: warm-up {name}: {ms:.0f} ms, {detail}" if ok else f"WARNING: warm-up {name} failed: {detail}")
+    state.update(state="done" if not failed else "done_with_errors",
+                 total_ms=round((time.perf_counter() - started) * 1000, 1))
+    print(f"DEBUG: warm-up {state['state']} in {state['total_ms']:.0f} ms (pid {os.getpid()})")
+    return state
+
+
+def start():
+    """Called from the lifespan: run now, in a thread, or not at all, as WARMUP says."""
+    state["mode"] = mode()
+    if state["mode"] == "off":
+        state["state"] = "off"
+    elif state["mode"] == "blocking":
+        run()
+    else:
+        threading.Thread(target=run, name="warmup", daemon=True).start()
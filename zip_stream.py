@@ -0,0 +1,81 @@
+# zip_stream.py
+"""
+ZIP archives streamed while they are being built.
+
+stream_zip(parts) takes (name, content) pairs - content being bytes or the
+path of a file - and yields the archive in chunks as each part is added, so
+a StreamingResponse can start sending the first file while later ones are
+still being rendered. Nothing but the part being added is held in memory
+and nothing is written to disk: zipfile writes to a non-seekable sink using
+data descriptors.
+
+Parts that are already compressed (xlsx, docx, pdf, images) are stored, the
+rest deflated.
+"""
+import io
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple, Union
+
+CHUNK_SIZE = 256 * 1024
+STORED_EXTENSIONS = {".xlsx", ".xlsm", ".docx", ".pdf", ".png", ".jpg", ".jpeg", ".zip", ".gz"}
+
+
+class _Sink(io.RawIOBase):
+    """Write-only stream that keeps what was written until drain()."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _compression(name):
+    return zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def stream_zip(parts: Iterable[Tuple[str, Union[bytes, str]]]) -> Iterator[bytes]:
+    """Yield a ZIP of parts chunk by chunk; duplicate names get a (2), (3)... suffix."""
+    sink = _Sink()
+    seen = set()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in parts:
+            base, ext = os.path.splitext(name)
+            n = 2
+            while name in seen:
+                name = f"{base} ({n}){ext}"
+                n += 1
+            seen.add(name)
+
+            if isinstance(content, str):
+                info = zipfile.ZipInfo.from_file(content, name)
+            else:
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = _compression(name)
+            if isinstance(content, str):
+                with open(content, "rb") as source, archive.open(info, "w", force_zip64=True) as target:
+                    while True:
+                        block = source.read(CHUNK_SIZE)
+                        if not block:
+                            break
+                        target.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            else:
+                archive.writestr(info, content)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()